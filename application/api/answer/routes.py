@@ -5,6 +5,7 @@ import logging
 import os
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from bson.dbref import DBRef
 from bson.objectid import ObjectId
@@ -12,13 +13,17 @@ from flask import Blueprint, current_app, make_response, request, Response
 from flask_restx import fields, Namespace, Resource
 
 
+from application.cache import cached_metadata
 from application.core.mongo_db import MongoDB
 from application.core.settings import settings
 from application.error import bad_request
 from application.extensions import api
 from application.llm.llm_creator import LLMCreator
+from application.retriever.history_summary import update_history_summary
 from application.retriever.retriever_creator import RetrieverCreator
-from application.utils import check_required_fields
+from application.retriever.semantic_cache import CachedAnswerRetriever, SemanticCache
+from application.utils import check_required_fields, num_tokens_from_string
+from application.write_behind import run_in_background, writer
 
 logger = logging.getLogger(__name__)
 
@@ -53,15 +58,15 @@ current_dir = os.path.dirname(
 with open(os.path.join(current_dir, "prompts", "chat_combine_default.txt"), "r") as f:
     chat_combine_template = f.read()
 
-with open(os.path.join(current_dir, "prompts", "chat_reduce_prompt.txt"), "r") as f:
-    chat_reduce_template = f.read()
-
 with open(os.path.join(current_dir, "prompts", "chat_combine_creative.txt"), "r") as f:
     chat_combine_creative = f.read()
 
 with open(os.path.join(current_dir, "prompts", "chat_combine_strict.txt"), "r") as f:
     chat_combine_strict = f.read()
 
+# Stop proxies (nginx, ingress) from buffering the stream until it completes
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 api_key_set = settings.API_KEY is not None
 embeddings_key_set = settings.EMBEDDINGS_KEY is not None
 
@@ -84,6 +89,11 @@ def run_async_chain(chain, question, chat_history):
 
 
 def get_data_from_api_key(api_key):
+    # copied so callers can't modify the cached record
+    return dict(cached_metadata("api_key", api_key, lambda: _load_data_from_api_key(api_key)))
+
+
+def _load_data_from_api_key(api_key):
     data = api_key_collection.find_one({"key": api_key})
     # # Raise custom exception if the API key is not found
     if data is None:
@@ -103,6 +113,10 @@ def get_data_from_api_key(api_key):
 
 
 def get_retriever(source_id: str):
+    return cached_metadata("source", source_id, lambda: _load_retriever(source_id))
+
+
+def _load_retriever(source_id: str):
     doc = sources_collection.find_one({"_id": ObjectId(source_id)})
     if doc is None:
         raise Exception("Source document does not exist", 404)
@@ -118,84 +132,119 @@ def is_azure_configured():
     )
 
 
-def save_conversation(conversation_id, question, response, source_log_docs, llm,index=None):
+def save_conversation(conversation_id, question, response, source_log_docs, user_api_key=None, index=None):
+    """
+    Queue the conversation write and return the conversation id right away.
+    New conversations get their id up front; the title is generated in the
+    background and replaces the placeholder name.
+    """
+    query = {
+        "prompt": question,
+        "response": response,
+        "sources": source_log_docs,
+    }
     if conversation_id is not None and index is not None:
-        conversations_collection.update_one(
-            {"_id": ObjectId(conversation_id), f"queries.{index}": {"$exists": True}},
-            {
-                "$set": {
-                    f"queries.{index}.prompt": question,
-                    f"queries.{index}.response": response,
-                    f"queries.{index}.sources": source_log_docs,
-                }
-            }
-        )
-        ##remove following queries from the array
-        conversations_collection.update_one(
-            {"_id": ObjectId(conversation_id), f"queries.{index}": {"$exists": True}},
-            {
-                "$push":{
-                    "queries":{
-                        "$each":[],
-                        "$slice":index+1
-                    }
-                }
-            }
-        )
+        writer.call(_update_query, conversation_id, index, query)
     elif conversation_id is not None and conversation_id != "None":
-        conversations_collection.update_one(
-            {"_id": ObjectId(conversation_id)},
-            {
-                "$push": {
-                    "queries": {
-                        "prompt": question,
-                        "response": response,
-                        "sources": source_log_docs,
-                    }
-                }
-            },
-        )
-
+        writer.call(_append_query, ObjectId(conversation_id), query)
+        if settings.HISTORY_SUMMARY_ENABLED:
+            # scheduled from the writer so it runs once the query is stored
+            writer.call(run_in_background, update_history_summary, conversation_id, gpt_model, user_api_key)
     else:
         # create new conversation
-        # generate summary
-        messages_summary = [
-            {
-                "role": "assistant",
-                "content": "Summarise following conversation in no more than 3 "
-                "words, respond ONLY with the summary, use the same "
-                "language as the system",
-            },
-            {
-                "role": "user",
-                "content": "Summarise following conversation in no more than 3 words, "
-                "respond ONLY with the summary, use the same language as the "
-                "system \n\nUser: "
-                + question
-                + "\n\n"
-                + "AI: "
-                + response,
-            },
-        ]
-
-        completion = llm.gen(model=gpt_model, messages=messages_summary, max_tokens=30)
-        conversation_id = conversations_collection.insert_one(
-            {
-                "user": "local",
-                "date": datetime.datetime.utcnow(),
-                "name": completion,
-                "queries": [
-                    {
-                        "prompt": question,
-                        "response": response,
-                        "sources": source_log_docs,
-                    }
-                ],
-            }
-        ).inserted_id
+        conversation_id = ObjectId()
+        writer.call(_create_conversation, conversation_id, query)
+        run_in_background(_generate_title, conversation_id, question, response, user_api_key)
     return conversation_id
 
 
+def _with_token_counts(query):
+    # stored with the query so history packing never re-tokenizes it
+    query["prompt_tokens"] = num_tokens_from_string(query["prompt"])
+    query["response_tokens"] = num_tokens_from_string(query["response"])
+    return query
+
+
+def _update_query(conversation_id, index, query):
+    _with_token_counts(query)
+    conversations_collection.update_one(
+        {"_id": ObjectId(conversation_id), f"queries.{index}": {"$exists": True}},
+        {
+            "$set": {f"queries.{index}.{field}": value for field, value in query.items()},
+            # the summary may cover the queries removed below
+            "$unset": {"summary": ""},
+        },
+    )
+    ##remove following queries from the array
+    conversations_collection.update_one(
+        {"_id": ObjectId(conversation_id), f"queries.{index}": {"$exists": True}},
+        {
+            "$push":{
+                "queries":{
+                    "$each":[],
+                    "$slice":index+1
+                }
+            }
+        }
+    )
+
+
+def _append_query(conversation_id, query):
+    # only existing conversations: an unknown or stale id creates nothing
+    _with_token_counts(query)
+    conversations_collection.update_one(
+        {"_id": conversation_id},
+        {"$push": {"queries": query}},
+    )
+
+
+def _create_conversation(conversation_id, query):
+    # named after the question until the generated title is written
+    _with_token_counts(query)
+    conversations_collection.insert_one(
+        {
+            "_id": conversation_id,
+            "user": "local",
+            "date": datetime.datetime.utcnow(),
+            "name": query["prompt"][:50],
+            "queries": [query],
+        }
+    )
+
+
+def _generate_title(conversation_id, question, response, user_api_key=None):
+    # generate summary
+    messages_summary = [
+        {
+            "role": "assistant",
+            "content": "Summarise following conversation in no more than 3 "
+            "words, respond ONLY with the summary, use the same "
+            "language as the system",
+        },
+        {
+            "role": "user",
+            "content": "Summarise following conversation in no more than 3 words, "
+            "respond ONLY with the summary, use the same language as the "
+            "system \n\nUser: "
+            + question
+            + "\n\n"
+            + "AI: "
+            + response,
+        },
+    ]
+
+    llm = LLMCreator.create_llm(
+        settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=user_api_key
+    )
+    completion = llm.gen(model=gpt_model, messages=messages_summary, max_tokens=30)
+    # queued behind the conversation's first write
+    writer.call(
+        conversations_collection.update_one,
+        {"_id": conversation_id},
+        {"$set": {"name": completion}},
+    )
+
+
 def get_prompt(prompt_id):
     if prompt_id == "default":
         prompt = chat_combine_template
@@ -204,26 +253,88 @@ def get_prompt(prompt_id):
     elif prompt_id == "strict":
         prompt = chat_combine_strict
     else:
-        prompt = prompts_collection.find_one({"_id": ObjectId(prompt_id)})["content"]
+        prompt = cached_metadata(
+            "prompt",
+            prompt_id,
+            lambda: prompts_collection.find_one({"_id": ObjectId(prompt_id)})["content"],
+        )
     return prompt
 
 
+TOKEN_COUNT_FIELDS = ("prompt_tokens", "response_tokens")
+
+
+def load_conversation_context(conversation_id, history, index=None):
+    """
+    Read the conversation once per request. Returns the client's history (which
+    only has prompt and response) with the token counts stored with the
+    matching queries, so history packing does not have to estimate them, and
+    the conversation's rolling summary.
+    """
+    if not history or not conversation_id or not ObjectId.is_valid(str(conversation_id)):
+        return history, None
+    fields = {f"queries.{field}": 1 for field in ("prompt", "response", *TOKEN_COUNT_FIELDS)}
+    # edits (index) may rewrite turns the stored summary already covers
+    use_summary = settings.HISTORY_SUMMARY_ENABLED and index is None
+    if use_summary:
+        fields["summary"] = 1
+    conversation = conversations_collection.find_one({"_id": ObjectId(conversation_id)}, fields)
+    if not conversation:
+        return history, None
+    stored = {
+        (query.get("prompt"), query.get("response")): query
+        for query in conversation.get("queries", [])
+    }
+    packed = []
+    for item in history:
+        query = stored.get((item.get("prompt"), item.get("response"))) if isinstance(item, dict) else None
+        if query is not None:
+            item = {**item, **{field: query[field] for field in TOKEN_COUNT_FIELDS if field in query}}
+        packed.append(item)
+    return packed, conversation.get("summary") if use_summary else None
+
+
+def semantic_cache_lookup(question, source, prompt_id, chunks, history, index=None):
+    """
+    Look up an answer to a near-duplicate question asked against the same
+    sources. Returns (cached retriever, None) on a hit and (None, cache) on a
+    miss, so the new answer can be stored once it is generated. Follow-up
+    questions depend on the history and are never served from the cache.
+    """
+    if not settings.SEMANTIC_CACHE_ENABLED or history or index is not None:
+        return None, None
+    semantic_cache = SemanticCache(source, prompt_id, gpt_model, chunks)
+    entry = semantic_cache.lookup(question)
+    if entry:
+        params = {"source": source, "prompt_id": prompt_id, "chunks": chunks, "gpt_model": gpt_model}
+        return CachedAnswerRetriever(question, entry, params), None
+    return None, semantic_cache
+
+
 def complete_stream(
-    question, retriever, conversation_id, user_api_key, isNoneDoc=False,index=None
+    question, retriever, conversation_id, user_api_key, isNoneDoc=False,index=None,
+    semantic_cache=None,
 ):
 
     try:
         response_full = ""
         source_log_docs = []
+        sources_sent = False
+        search_docs = []
         answer = retriever.gen()
-        sources = retriever.search()
-        for source in sources:
-            if "text" in source:
-                source["text"] = source["text"][:100].strip() + "..."
-        if len(sources) > 0:
-            data = json.dumps({"type": "source", "source": sources})
-            yield f"data: {data}\n\n"
         for line in answer:
+            if not sources_sent:
+                # search() returns the docs gen() already retrieved, so the source
+                # event and source_log_docs come from the same retrieval pass
+                sources_sent = True
+                sources = retriever.search()
+                search_docs = [dict(source) for source in sources]
+                for source in sources:
+                    if "text" in source:
+                        source["text"] = source["text"][:100].strip() + "..."
+                if len(sources) > 0:
+                    data = json.dumps({"type": "source", "source": sources})
+                    yield f"data: {data}\n\n"
             if "answer" in line:
                 response_full += str(line["answer"])
                 data = json.dumps(line)
@@ -231,23 +342,30 @@ def complete_stream(
             elif "source" in line:
                 source_log_docs.append(line["source"])
 
+        if semantic_cache is not None:
+            run_in_background(
+                semantic_cache.store,
+                question,
+                response_full,
+                [dict(doc) for doc in source_log_docs],
+                search_docs,
+            )
+
         if isNoneDoc:
             for doc in source_log_docs:
                 doc["source"] = "None"
 
-        llm = LLMCreator.create_llm(
-            settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=user_api_key
-        )
         if user_api_key is None:
             conversation_id = save_conversation(
-                conversation_id, question, response_full, source_log_docs, llm,index
+                conversation_id, question, response_full, source_log_docs, index=index
             )
             # send data.type = "end" to indicate that the stream has ended as json
             data = json.dumps({"type": "id", "id": str(conversation_id)})
             yield f"data: {data}\n\n"
 
         retriever_params = retriever.get_params()
-        user_logs_collection.insert_one(
+        writer.insert(
+            user_logs_collection,
             {
                 "action": "stream_answer",
                 "level": "info",
@@ -325,12 +443,14 @@ class Stream(Resource):
 
         try:
             question = data["question"]
-            history = str(data.get("history", []))
-            history = str(json.loads(history))
+            history = data.get("history", [])
+            if isinstance(history, str):
+                history = json.loads(history)
             conversation_id = data.get("conversation_id")
             prompt_id = data.get("prompt_id", "default")
             
             index=data.get("index",None)
+            history, history_summary = load_conversation_context(conversation_id, history, index)
             chunks = int(data.get("chunks", 2))
             token_limit = data.get("token_limit", settings.DEFAULT_MAX_HISTORY)
             retriever_name = data.get("retriever", "classic")
@@ -342,16 +462,19 @@ class Stream(Resource):
                 source = {"active_docs": data_key.get("source")}
                 retriever_name = data_key.get("retriever", retriever_name)
                 user_api_key = data["api_key"]
+                cache_replay = data_key.get("cache_replay")
 
             elif "active_docs" in data:
                 source = {"active_docs": data["active_docs"], "guide_docs": data["guide_docs"]}
 
                 retriever_name = get_retriever(data["active_docs"]) or retriever_name
                 user_api_key = None
+                cache_replay = None
 
             else:
                 source = {}
                 user_api_key = None
+                cache_replay = None
 
             current_app.logger.info(
                 f"/stream - request_data: {data}, source: {source}",
@@ -361,17 +484,23 @@ class Stream(Resource):
             prompt = get_prompt(prompt_id)
             if "isNoneDoc" in data and data["isNoneDoc"] is True:
                 chunks = 0
-            retriever = RetrieverCreator.create_retriever(
-                retriever_name,
-                question=question,
-                source=source,
-                chat_history=history,
-                prompt=prompt,
-                chunks=chunks,
-                token_limit=token_limit,
-                gpt_model=gpt_model,
-                user_api_key=user_api_key,
+            retriever, semantic_cache = semantic_cache_lookup(
+                question, source, prompt_id, chunks, history, index
             )
+            if retriever is None:
+                retriever = RetrieverCreator.create_retriever(
+                    retriever_name,
+                    question=question,
+                    source=source,
+                    chat_history=history,
+                    prompt=prompt,
+                    chunks=chunks,
+                    token_limit=token_limit,
+                    gpt_model=gpt_model,
+                    user_api_key=user_api_key,
+                    history_summary=history_summary,
+                    cache_replay=cache_replay,
+                )
             
             return Response(
                 complete_stream(
@@ -381,8 +510,10 @@ class Stream(Resource):
                     user_api_key=user_api_key,
                     isNoneDoc=data.get("isNoneDoc"),
                     index=index,
+                    semantic_cache=semantic_cache,
                 ),
                 mimetype="text/event-stream",
+                headers=SSE_HEADERS,
             )
 
         except ValueError:
@@ -410,6 +541,89 @@ class Stream(Resource):
             )
 
 
+def collect_answer(retriever):
+    source_log_docs = []
+    response_full = ""
+    for line in retriever.gen():
+        if "source" in line:
+            source_log_docs.append(line["source"])
+        elif "answer" in line:
+            response_full += line["answer"]
+    return response_full, source_log_docs
+
+
+def complete_batch(questions, create_retrievers, user_api_key, isNoneDoc=False, concurrency=None):
+    """
+    Answer a batch of questions, streaming each result as soon as it is ready.
+    Retrieval is done once for the batch by create_retrievers(); the LLM calls
+    run on a bounded pool.
+    """
+    executor = None
+    try:
+        executor = ThreadPoolExecutor(max_workers=concurrency or settings.BATCH_MAX_CONCURRENCY)
+        retrievers = create_retrievers()
+        futures = {
+            executor.submit(collect_answer, retriever): index
+            for index, retriever in enumerate(retrievers)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                response_full, source_log_docs = future.result()
+            except Exception as e:
+                print("\033[91merr", str(e), file=sys.stderr)
+                data = json.dumps({"type": "error", "index": index, "question": questions[index], "error": str(e)})
+                yield f"data: {data}\n\n"
+                continue
+
+            if isNoneDoc:
+                for doc in source_log_docs:
+                    doc["source"] = "None"
+
+            writer.insert(
+                user_logs_collection,
+                {
+                    "action": "api_answer_batch",
+                    "level": "info",
+                    "user": "local",
+                    "api_key": user_api_key,
+                    "question": questions[index],
+                    "response": response_full,
+                    "sources": source_log_docs,
+                    "retriever_params": retrievers[index].get_params(),
+                    "timestamp": datetime.datetime.now(datetime.timezone.utc),
+                }
+            )
+            data = json.dumps(
+                {
+                    "type": "answer",
+                    "index": index,
+                    "question": questions[index],
+                    "answer": response_full,
+                    "sources": source_log_docs,
+                }
+            )
+            yield f"data: {data}\n\n"
+
+        data = json.dumps({"type": "end"})
+        yield f"data: {data}\n\n"
+    except Exception as e:
+        print("\033[91merr", str(e), file=sys.stderr)
+        traceback.print_exc()
+        data = json.dumps(
+            {
+                "type": "error",
+                "error": "Please try again later. We apologize for any inconvenience.",
+                "error_exception": str(e),
+            }
+        )
+        yield f"data: {data}\n\n"
+    finally:
+        # also reached when the client disconnects mid-batch
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
 def error_stream_generate(err_response):
     data = json.dumps({"type": "error", "error": err_response})
     yield f"data: {data}\n\n"
@@ -460,6 +674,7 @@ class Answer(Resource):
             question = data["question"]
             history = data.get("history", [])
             conversation_id = data.get("conversation_id")
+            history, history_summary = load_conversation_context(conversation_id, history)
             prompt_id = data.get("prompt_id", "default")
             chunks = int(data.get("chunks", 2))
             token_limit = data.get("token_limit", settings.DEFAULT_MAX_HISTORY)
@@ -487,42 +702,46 @@ class Answer(Resource):
                 extra={"data": json.dumps({"request_data": data, "source": source})},
             )
 
-            retriever = RetrieverCreator.create_retriever(
-                retriever_name,
-                question=question,
-                source=source,
-                chat_history=history,
-                prompt=prompt,
-                chunks=chunks,
-                token_limit=token_limit,
-                gpt_model=gpt_model,
-                user_api_key=user_api_key,
+            retriever, semantic_cache = semantic_cache_lookup(
+                question, source, prompt_id, chunks, history
             )
+            if retriever is None:
+                retriever = RetrieverCreator.create_retriever(
+                    retriever_name,
+                    question=question,
+                    source=source,
+                    chat_history=history,
+                    prompt=prompt,
+                    chunks=chunks,
+                    token_limit=token_limit,
+                    gpt_model=gpt_model,
+                    user_api_key=user_api_key,
+                    history_summary=history_summary,
+                    # the answer is returned whole, so cached streams need no pacing
+                    cache_replay="instant",
+                )
 
-            source_log_docs = []
-            response_full = ""
-            for line in retriever.gen():
-                if "source" in line:
-                    source_log_docs.append(line["source"])
-                elif "answer" in line:
-                    response_full += line["answer"]
+            response_full, source_log_docs = collect_answer(retriever)
+
+            if semantic_cache is not None:
+                cached_docs = [dict(doc) for doc in source_log_docs]
+                run_in_background(
+                    semantic_cache.store, question, response_full, cached_docs, cached_docs
+                )
 
             if data.get("isNoneDoc"):
                 for doc in source_log_docs:
                     doc["source"] = "None"
 
-            llm = LLMCreator.create_llm(
-                settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=user_api_key
-            )
-
             result = {"answer": response_full, "sources": source_log_docs}
             result["conversation_id"] = str(
                 save_conversation(
-                    conversation_id, question, response_full, source_log_docs, llm
+                    conversation_id, question, response_full, source_log_docs, user_api_key
                 )
             )
             retriever_params = retriever.get_params()
-            user_logs_collection.insert_one(
+            writer.insert(
+                user_logs_collection,
                 {
                     "action": "api_answer",
                     "level": "info",
@@ -546,6 +765,138 @@ class Answer(Resource):
         return make_response(result, 200)
 
 
+@answer_ns.route("/api/answer/batch")
+class AnswerBatch(Resource):
+    answer_batch_model = api.model(
+        "AnswerBatchModel",
+        {
+            "questions": fields.List(
+                fields.String, required=True, description="Questions to answer"
+            ),
+            "prompt_id": fields.String(
+                required=False, default="default", description="Prompt ID"
+            ),
+            "chunks": fields.Integer(
+                required=False, default=2, description="Number of chunks"
+            ),
+            "token_limit": fields.Integer(required=False, description="Token limit"),
+            "retriever": fields.String(required=False, description="Retriever type"),
+            "api_key": fields.String(required=False, description="API key"),
+            "active_docs": fields.String(
+                required=False, description="Active documents"
+            ),
+            "guide_docs": fields.String(
+                required=False, description="Guideline documents"
+            ),
+            "isNoneDoc": fields.Boolean(
+                required=False, description="Flag indicating if no document is used"
+            ),
+            "concurrency": fields.Integer(
+                required=False, description="Maximum LLM calls in flight"
+            ),
+        },
+    )
+
+    @api.expect(answer_batch_model)
+    @api.doc(
+        description=(
+            "Answer a list of questions against the same sources, streaming results as they complete. "
+            "Questions are embedded once for the batch; FAISS searches them in one call, other "
+            "vector stores search question by question. RETRIEVAL_ADAPTIVE_K applies per question."
+        )
+    )
+    def post(self):
+        data = request.get_json()
+        required_fields = ["questions"]
+        missing_fields = check_required_fields(data, required_fields)
+        if missing_fields:
+            return missing_fields
+
+        questions = data["questions"]
+        if (
+            not isinstance(questions, list)
+            or not questions
+            or not all(isinstance(question, str) for question in questions)
+        ):
+            return bad_request(400, "questions must be a non-empty list of strings")
+        if len(questions) > settings.BATCH_MAX_QUESTIONS:
+            return bad_request(
+                400, f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch"
+            )
+        try:
+            concurrency = int(data.get("concurrency", settings.BATCH_MAX_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = 0
+        if concurrency < 1:
+            return bad_request(400, "concurrency must be a positive integer")
+        concurrency = min(concurrency, settings.BATCH_MAX_CONCURRENCY)
+
+        try:
+            prompt_id = data.get("prompt_id", "default")
+            chunks = int(data.get("chunks", 2))
+            token_limit = data.get("token_limit", settings.DEFAULT_MAX_HISTORY)
+            retriever_name = data.get("retriever", "classic")
+
+            if "api_key" in data:
+                data_key = get_data_from_api_key(data["api_key"])
+                chunks = int(data_key.get("chunks", 2))
+                prompt_id = data_key.get("prompt_id", "default")
+                source = {"active_docs": data_key.get("source")}
+                retriever_name = data_key.get("retriever", retriever_name)
+                user_api_key = data["api_key"]
+            elif "active_docs" in data:
+                source = {"active_docs": data["active_docs"], "guide_docs": data.get("guide_docs")}
+                retriever_name = get_retriever(data["active_docs"]) or retriever_name
+                user_api_key = None
+            else:
+                source = {}
+                user_api_key = None
+
+            current_app.logger.info(
+                f"/api/answer/batch - {len(questions)} questions, source: {source}",
+                extra={"data": json.dumps({"request_data": data, "source": source})},
+            )
+
+            prompt = get_prompt(prompt_id)
+            if data.get("isNoneDoc"):
+                chunks = 0
+            retriever_class = RetrieverCreator.get_retriever_class(retriever_name)
+            retriever_kwargs = {
+                "source": source,
+                "chat_history": [],
+                "prompt": prompt,
+                "chunks": chunks,
+                "token_limit": token_limit,
+                "gpt_model": gpt_model,
+                "user_api_key": user_api_key,
+                "cache_replay": "instant",
+            }
+
+            def create_retrievers():
+                if hasattr(retriever_class, "create_batch"):
+                    return retriever_class.create_batch(questions, **retriever_kwargs)
+                return [retriever_class(question, **retriever_kwargs) for question in questions]
+
+        except Exception as e:
+            current_app.logger.error(
+                f"/api/answer/batch - error: {str(e)} - traceback: {traceback.format_exc()}",
+                extra={"error": str(e), "traceback": traceback.format_exc()},
+            )
+            return bad_request(500, str(e))
+
+        return Response(
+            complete_batch(
+                questions,
+                create_retrievers,
+                user_api_key,
+                isNoneDoc=data.get("isNoneDoc"),
+                concurrency=concurrency,
+            ),
+            mimetype="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+
 @answer_ns.route("/api/search")
 class Search(Resource):
     search_model = api.model(
@@ -622,14 +973,15 @@ class Search(Resource):
             docs = retriever.search()
             retriever_params = retriever.get_params()
 
-            user_logs_collection.insert_one(
+            writer.insert(
+                user_logs_collection,
                 {
                     "action": "api_search",
                     "level": "info",
                     "user": "local",
                     "api_key": user_api_key,
                     "question": question,
-                    "sources": docs,
+                    "sources": [dict(doc) for doc in docs],
                     "retriever_params": retriever_params,
                     "timestamp": datetime.datetime.now(datetime.timezone.utc),
                 }
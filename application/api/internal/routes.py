@@ -1,9 +1,11 @@
 import os
 import datetime
+import json
 from flask import Blueprint, request, send_from_directory
 from werkzeug.utils import secure_filename
 from bson.objectid import ObjectId
 
+from application.cache import bump_source_version, invalidate_metadata
 from application.core.mongo_db import MongoDB
 from application.core.settings import settings
 
@@ -45,6 +47,12 @@ def upload_index_files():
     remote_data = request.form["remote_data"] if "remote_data" in request.form else None
     sync_frequency = secure_filename(request.form["sync_frequency"]) if "sync_frequency" in request.form else None
     doc_type = request.form["doc_type"]
+    # built at ingest for guide sources, see application/parser/guideline_summaries.py
+    guideline_summaries = (
+        json.loads(request.form["guideline_summaries"])
+        if "guideline_summaries" in request.form
+        else None
+    )
 
     save_dir = os.path.join(current_dir, "indexes", str(id))
     if settings.VECTOR_STORE == "faiss":
@@ -84,6 +92,7 @@ def upload_index_files():
                     "remote_data": remote_data,
                     "sync_frequency": sync_frequency,
                     "doc_type": doc_type,
+                    "guideline_summaries": guideline_summaries,
                 }
             },
         )
@@ -102,6 +111,12 @@ def upload_index_files():
                 "remote_data": remote_data,
                 "sync_frequency": sync_frequency,
                 "doc_type": doc_type,
+                "guideline_summaries": guideline_summaries,
             }
         )
+    # re-uploads and syncs invalidate cached guideline summaries for this source
+    bump_source_version(id)
+    invalidate_metadata("source", id)
+    invalidate_metadata("guideline_summaries", id)
+    invalidate_metadata("api_key")
     return {"status": "ok"}
@@ -13,6 +13,12 @@ from werkzeug.utils import secure_filename
 
 from application.api.user.tasks import ingest, ingest_remote
 
+from application.cache import (
+    REPLAY_MODES,
+    bump_source_version,
+    invalidate_metadata,
+    llm_cache_metrics,
+)
 from application.core.mongo_db import MongoDB
 from application.core.settings import settings
 from application.extensions import api
@@ -269,6 +275,9 @@ class DeleteOldIndexes(Resource):
             return make_response(jsonify({"success": False, "error": str(err)}), 400)
         
         sources_collection.delete_one({"_id": ObjectId(source_id)})
+        bump_source_version(source_id)
+        invalidate_metadata("source", source_id)
+        invalidate_metadata("api_key")  # keys resolve their source's retriever
         return make_response(jsonify({"success": True}), 200)
 
 
@@ -399,6 +408,7 @@ class UploadRemote(Resource):
                 "name": fields.String(required=True, description="Job name"),
                 "data": fields.String(required=True, description="Data to process"),
                 "repo_url": fields.String(description="GitHub repository URL"),
+                "type": fields.String(description="Document type, \"user\" (default) or \"guide\""),
             },
         )
     )
@@ -425,6 +435,7 @@ class UploadRemote(Resource):
                 job_name=data["name"],
                 user=data["user"],
                 loader=loader,
+                doc_type=secure_filename(data.get("type", "user")),
             )
         except Exception as err:
             return make_response(jsonify({"success": False, "error": str(err)}), 400)
@@ -723,6 +734,7 @@ class DeletePrompt(Resource):
 
         try:
             prompts_collection.delete_one({"_id": ObjectId(data["id"])})
+            invalidate_metadata("prompt", data["id"])
         except Exception as err:
             return make_response(jsonify({"success": False, "error": str(err)}), 400)
 
@@ -756,6 +768,7 @@ class UpdatePrompt(Resource):
                 {"_id": ObjectId(data["id"])},
                 {"$set": {"name": data["name"], "content": data["content"]}},
             )
+            invalidate_metadata("prompt", data["id"])
         except Exception as err:
             return make_response(jsonify({"success": False, "error": str(err)}), 400)
 
@@ -806,6 +819,10 @@ class CreateApiKey(Resource):
             "chunks": fields.Integer(required=True, description="Chunks count"),
             "source": fields.String(description="Source ID (optional)"),
             "retriever": fields.String(description="Retriever (optional)"),
+            "cache_replay": fields.String(
+                description="How cached answers are streamed (optional)",
+                enum=list(REPLAY_MODES),
+            ),
         },
     )
 
@@ -832,6 +849,8 @@ class CreateApiKey(Resource):
                 new_api_key["source"] = DBRef("sources", ObjectId(data["source"]))
             if "retriever" in data:
                 new_api_key["retriever"] = data["retriever"]
+            if data.get("cache_replay") in REPLAY_MODES:
+                new_api_key["cache_replay"] = data["cache_replay"]
 
             resp = api_key_collection.insert_one(new_api_key)
             new_id = str(resp.inserted_id)
@@ -859,6 +878,8 @@ class DeleteApiKey(Resource):
 
         try:
             result = api_key_collection.delete_one({"_id": ObjectId(data["id"])})
+            # cached by key, not id, so drop all cached keys
+            invalidate_metadata("api_key")
             if result.deleted_count == 0:
                 return {"success": False, "message": "API Key not found"}, 404
         except Exception as err:
@@ -1627,6 +1648,17 @@ class GetFeedbackAnalytics(Resource):
         )
 
 
+@user_ns.route("/api/get_cache_metrics")
+class GetCacheMetrics(Resource):
+    @api.doc(description="LLM response cache hit/miss and byte counters, summed over all workers")
+    def get(self):
+        try:
+            metrics = llm_cache_metrics.totals()
+        except Exception as err:
+            return make_response(jsonify({"success": False, "error": str(err)}), 400)
+        return make_response(jsonify({"success": True, "metrics": metrics}), 200)
+
+
 @user_ns.route("/api/get_user_logs")
 class GetUserLogs(Resource):
     get_user_logs_model = api.model(
@@ -1745,6 +1777,7 @@ class ManageSync(Resource):
                 },
                 update_data,
             )
+            invalidate_metadata("source", source_id)
         except Exception as err:
             return make_response(jsonify({"success": False, "error": str(err)}), 400)
 
@@ -1,23 +1,31 @@
 from datetime import timedelta
 
 from application.celery_init import celery
-from application.worker import ingest_worker, remote_worker, sync_worker
+
+# The worker functions pull in every file parser and remote loader, so they are
+# imported inside the tasks: the API process only needs the task signatures.
 
 
 @celery.task(bind=True)
 def ingest(self, directory, formats, name_job, filename, user, doc_type):
+    from application.worker import ingest_worker
+
     resp = ingest_worker(self, directory, formats, name_job, filename, user, doc_type)
     return resp
 
 
 @celery.task(bind=True)
-def ingest_remote(self, source_data, job_name, user, loader):
-    resp = remote_worker(self, source_data, job_name, user, loader)
+def ingest_remote(self, source_data, job_name, user, loader, doc_type="user"):
+    from application.worker import remote_worker
+
+    resp = remote_worker(self, source_data, job_name, user, loader, doc_type=doc_type)
     return resp
 
 
 @celery.task(bind=True)
 def schedule_syncs(self, frequency):
+    from application.worker import sync_worker
+
     resp = sync_worker(self, frequency)
     return resp
 
@@ -2,10 +2,17 @@ import redis
 import time
 import json
 import logging
+import threading
+from collections import OrderedDict
 from threading import Lock
 from application.core.settings import settings
 from application.utils import get_hash
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
 _redis_instance = None
@@ -23,34 +30,337 @@ def get_redis_instance():
                     _redis_instance = None
     return _redis_instance
 
-def gen_cache_key(*messages, model="docgpt"):
+class LocalCache:
+    """Small thread-safe in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def get_source_version(source_id):
+    """Current version of a source; bumped whenever the source is re-indexed."""
+    redis_client = get_redis_instance()
+    if redis_client and source_id:
+        try:
+            version = redis_client.get(f"source_version:{source_id}")
+            return int(version) if version else 0
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+    return 0
+
+
+def bump_source_version(source_id):
+    """Invalidate everything cached for a source by moving it to a new version."""
+    redis_client = get_redis_instance()
+    if redis_client and source_id:
+        try:
+            return redis_client.incr(f"source_version:{source_id}")
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+    return None
+
+
+# Read-through cache for per-request Mongo metadata (API keys, source
+# records, prompts). Entries live in each process for METADATA_CACHE_TTL and
+# are dropped in every worker when invalidate_metadata() is called.
+METADATA_INVALIDATION_CHANNEL = "metadata_invalidation"
+_MISSING = object()
+_metadata_caches = {}
+_metadata_lock = Lock()
+_listener_started = False
+
+
+def _metadata_cache(kind):
+    with _metadata_lock:
+        cache = _metadata_caches.get(kind)
+        if cache is None:
+            cache = LocalCache(maxsize=settings.METADATA_CACHE_SIZE, ttl=settings.METADATA_CACHE_TTL)
+            _metadata_caches[kind] = cache
+        return cache
+
+
+def _invalidate_local(kind, key=None):
+    if key:
+        _metadata_cache(kind).delete(key)
+    else:
+        _metadata_cache(kind).clear()
+
+
+def _clear_all_metadata():
+    with _metadata_lock:
+        caches = list(_metadata_caches.values())
+    for cache in caches:
+        cache.clear()
+
+
+def _listen_for_invalidations():
+    while True:
+        redis_client = get_redis_instance()
+        try:
+            if redis_client:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(METADATA_INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    kind, _, key = message["data"].decode("utf-8").partition(":")
+                    _invalidate_local(kind, key or None)
+        except redis.RedisError as e:
+            logger.error(f"Redis connection error: {e}")
+        # invalidations may have been missed while disconnected
+        _clear_all_metadata()
+        time.sleep(5)
+
+
+def _start_invalidation_listener():
+    # started lazily so each (forked) worker process gets its own subscriber
+    global _listener_started
+    if _listener_started:
+        return
+    with _metadata_lock:
+        if _listener_started:
+            return
+        _listener_started = True
+    threading.Thread(
+        target=_listen_for_invalidations, name="metadata-invalidation", daemon=True
+    ).start()
+
+
+def cached_metadata(kind, key, loader):
+    """Return the cached value for (kind, key), calling loader() on a miss."""
+    if not settings.METADATA_CACHE_TTL:
+        return loader()
+    _start_invalidation_listener()
+    cache = _metadata_cache(kind)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = loader()
+        cache.set(key, value)
+    return value
+
+
+def invalidate_metadata(kind, key=None):
+    """Drop one entry (or every entry of a kind when key is None) in all workers."""
+    _invalidate_local(kind, key)
+    redis_client = get_redis_instance()
+    if redis_client:
+        try:
+            message = f"{kind}:{key}" if key else kind
+            redis_client.publish(METADATA_INVALIDATION_CHANNEL, message)
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+
+
+# LLM response cache: an in-process LRU tier in front of Redis. Keys cover the
+# provider, model, messages and sampling params; Redis values are zstd
+# compressed and entries over LLM_CACHE_MAX_ENTRY_BYTES are not stored.
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_llm_local_cache = LocalCache(maxsize=settings.LLM_CACHE_LOCAL_SIZE, ttl=settings.LLM_CACHE_LOCAL_TTL)
+
+
+class CacheMetrics:
+    """
+    Hit/miss/byte counters for the LLM cache. Counted in process and added to
+    the LLM_CACHE_METRICS_KEY hash in Redis every LLM_CACHE_METRICS_FLUSH_INTERVAL
+    seconds, so the totals cover all workers.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = Lock()
+        self._last_flush = time.monotonic()
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] = self._counts.get(field, 0) + amount
+
+    def maybe_flush(self, redis_client):
+        if time.monotonic() - self._last_flush >= settings.LLM_CACHE_METRICS_FLUSH_INTERVAL:
+            self.flush(redis_client)
+
+    def flush(self, redis_client):
+        if not redis_client:
+            return
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._last_flush = time.monotonic()
+        if not counts:
+            return
+        try:
+            pipe = redis_client.pipeline()
+            for field, amount in counts.items():
+                pipe.hincrby(settings.LLM_CACHE_METRICS_KEY, field, amount)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Redis connection error: {e}")
+
+    def totals(self):
+        """Counters of all workers (as of their last flush), including this one's."""
+        redis_client = get_redis_instance()
+        if not redis_client:
+            return {}
+        self.flush(redis_client)
+        try:
+            raw = redis_client.hgetall(settings.LLM_CACHE_METRICS_KEY)
+        except redis.RedisError as e:
+            logger.error(f"Redis connection error: {e}")
+            return {}
+        return {field.decode("utf-8"): int(value) for field, value in raw.items()}
+
+
+llm_cache_metrics = CacheMetrics()
+
+
+def _compress(data):
+    if zstandard is None:
+        return data
+    # compressor objects are not thread safe and cheap to create
+    return zstandard.ZstdCompressor(level=settings.LLM_CACHE_ZSTD_LEVEL).compress(data)
+
+
+def _decompress(data):
+    if data.startswith(ZSTD_MAGIC):
+        return zstandard.ZstdDecompressor().decompress(data)
+    # stored uncompressed (zstandard not installed)
+    return data
+
+
+def gen_cache_key(*messages, model="docgpt", provider=None, params=None):
     if not all(isinstance(msg, dict) for msg in messages):
         raise ValueError("All messages must be dictionaries.")
     messages_str = json.dumps(list(messages), sort_keys=True)
     combined = f"{model}_{messages_str}"
+    if provider is not None or params:
+        combined += f"_{provider}_{json.dumps(params or {}, sort_keys=True, default=str)}"
     cache_key = get_hash(combined)
     return cache_key
 
+
+def llm_cache_key(endpoint, llm, model, messages, kwargs):
+    params = {k: v for k, v in kwargs.items() if k != "stream"}
+    key = gen_cache_key(*messages, model=model, provider=type(llm).__name__, params=params)
+    return f"llm_cache:{endpoint}:{key}"
+
+
+def llm_cache_get(endpoint, cache_key, redis_client):
+    """Cached value (a str for "gen", a list of chunks for "stream") or None."""
+    llm_cache_metrics.maybe_flush(redis_client)
+    value = _llm_local_cache.get(cache_key)
+    if value is not None:
+        llm_cache_metrics.incr(f"{endpoint}_local_hits")
+        return value
+    if redis_client:
+        try:
+            cached = redis_client.get(cache_key)
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+            cached = None
+        if cached:
+            data = _decompress(cached)
+            value = data.decode("utf-8") if endpoint == "gen" else json.loads(data)
+            _llm_local_cache.set(cache_key, value)
+            llm_cache_metrics.incr(f"{endpoint}_redis_hits")
+            llm_cache_metrics.incr(f"{endpoint}_bytes_read", len(cached))
+            return value
+    llm_cache_metrics.incr(f"{endpoint}_misses")
+    return None
+
+
+def llm_cache_set(endpoint, cache_key, value, redis_client):
+    data = (value if endpoint == "gen" else json.dumps(value)).encode("utf-8")
+    compressed = _compress(data)
+    if len(compressed) > settings.LLM_CACHE_MAX_ENTRY_BYTES:
+        llm_cache_metrics.incr(f"{endpoint}_oversized")
+        return
+    ttl = settings.LLM_CACHE_TTL.get(endpoint, settings.LLM_CACHE_DEFAULT_TTL)
+    _llm_local_cache.set(cache_key, value, ttl=min(ttl, settings.LLM_CACHE_LOCAL_TTL))
+    if redis_client:
+        try:
+            redis_client.set(cache_key, compressed, ex=ttl)
+            llm_cache_metrics.incr(f"{endpoint}_stores")
+            llm_cache_metrics.incr(f"{endpoint}_bytes_raw", len(data))
+            llm_cache_metrics.incr(f"{endpoint}_bytes_stored", len(compressed))
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+
+
+REPLAY_MODES = ("instant", "coalesced", "paced")
+REPLAY_MIN_INTERVAL = 0.05  # seconds between paced frames
+
+
+def _frames(chunks, count):
+    size = -(-len(chunks) // max(count, 1))
+    return ["".join(chunks[i:i + size]) for i in range(0, len(chunks), size)]
+
+
+def replay_chunks(chunks, mode=None):
+    """
+    Yield a cached stream back to the client:
+    - "instant": the original chunks, no delay
+    - "coalesced": joined into LLM_CACHE_REPLAY_FRAMES larger frames, no delay
+    - "paced": frames spread over LLM_CACHE_REPLAY_DURATION seconds in total
+    """
+    mode = mode or settings.LLM_CACHE_REPLAY
+    if mode not in REPLAY_MODES:
+        logger.warning(f"Unknown cache replay mode {mode}, using {settings.LLM_CACHE_REPLAY}")
+        mode = settings.LLM_CACHE_REPLAY
+    if mode == "instant":
+        yield from chunks
+    elif mode == "coalesced":
+        yield from _frames(chunks, settings.LLM_CACHE_REPLAY_FRAMES)
+    else:
+        duration = settings.LLM_CACHE_REPLAY_DURATION
+        frames = _frames(chunks, min(len(chunks), int(duration / REPLAY_MIN_INTERVAL) or 1))
+        interval = duration / len(frames) if frames else 0
+        for i, frame in enumerate(frames):
+            if i:
+                time.sleep(interval)
+            yield frame
+
+
 def gen_cache(func):
     def wrapper(self, model, messages, *args, **kwargs):
+        if not settings.LLM_CACHE_ENABLED:
+            return func(self, model, messages, *args, **kwargs)
         try:
-            cache_key = gen_cache_key(*messages)
+            cache_key = llm_cache_key("gen", self, model, messages, kwargs)
             redis_client = get_redis_instance()
-            if redis_client:
-                try:
-                    cached_response = redis_client.get(cache_key)
-                    if cached_response:
-                        return cached_response.decode('utf-8')
-                except redis.ConnectionError as e:
-                    logger.error(f"Redis connection error: {e}")
+            cached_response = llm_cache_get("gen", cache_key, redis_client)
+            if cached_response is not None:
+                return cached_response
 
             result = func(self, model, messages, *args, **kwargs)
-            if redis_client:
-                try:
-                    redis_client.set(cache_key, result, ex=1800)
-                except redis.ConnectionError as e:
-                    logger.error(f"Redis connection error: {e}")
-
+            llm_cache_set("gen", cache_key, result, redis_client)
             return result
         except ValueError as e:
             logger.error(e)
@@ -59,22 +369,18 @@ def gen_cache(func):
 
 def stream_cache(func):
     def wrapper(self, model, messages, stream, *args, **kwargs):
-        cache_key = gen_cache_key(*messages)
+        if not settings.LLM_CACHE_ENABLED:
+            yield from func(self, model, messages, stream, *args, **kwargs)
+            return
+        cache_key = llm_cache_key("stream", self, model, messages, kwargs)
         logger.info(f"Stream cache key: {cache_key}")
-        
+
         redis_client = get_redis_instance()
-        if redis_client:
-            try:
-                cached_response = redis_client.get(cache_key)
-                if cached_response:
-                    logger.info(f"Cache hit for stream key: {cache_key}")
-                    cached_response = json.loads(cached_response.decode('utf-8'))
-                    for chunk in cached_response:
-                        yield chunk
-                        time.sleep(0.03)
-                    return
-            except redis.ConnectionError as e:
-                logger.error(f"Redis connection error: {e}")
+        cached_response = llm_cache_get("stream", cache_key, redis_client)
+        if cached_response is not None:
+            logger.info(f"Cache hit for stream key: {cache_key}")
+            yield from replay_chunks(cached_response, getattr(self, "cache_replay", None))
+            return
 
         result = func(self, model, messages, stream, *args, **kwargs)
         stream_cache_data = []
@@ -83,11 +389,7 @@ def stream_cache(func):
             stream_cache_data.append(chunk)
             yield chunk
         
-        if redis_client:
-            try:
-                redis_client.set(cache_key, json.dumps(stream_cache_data), ex=1800)
-                logger.info(f"Stream cache saved for key: {cache_key}")
-            except redis.ConnectionError as e:
-                logger.error(f"Redis connection error: {e}")
+        llm_cache_set("stream", cache_key, stream_cache_data, redis_client)
+        logger.info(f"Stream cache saved for key: {cache_key}")
         
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -11,19 +11,130 @@ class Settings(BaseSettings):
     LLM_NAME: str = "docsgpt"
     MODEL_NAME: Optional[str] = None # if LLM_NAME is openai, MODEL_NAME can be gpt-4 or gpt-3.5-turbo
     EMBEDDINGS_NAME: str = "huggingface_sentence-transformers/all-mpnet-base-v2"
+    EMBEDDINGS_SERVER_URL: Optional[str] = None  # e.g. http://localhost:7092, shared local embeddings server
+    EMBEDDINGS_SERVER_BATCH_SIZE: int = 64  # texts per request sent by the embeddings client
+    EMBEDDINGS_SERVER_MAX_BATCH: int = 128  # texts encoded together by the server
+    EMBEDDINGS_SERVER_MAX_WAIT_MS: int = 5  # how long the server waits to fill a batch
+    EMBEDDINGS_SERVER_TIMEOUT: float = 30.0
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/1"
     MONGO_URI: str = "mongodb://localhost:27017/docsgpt"
     MODEL_PATH: str = os.path.join(current_dir, "models/docsgpt-7b-f16.gguf")
+    # llama.cpp local inference (LLM_NAME=llama.cpp)
+    LLAMA_CPP_POOL_SIZE: int = 1  # model instances per model file; each holds its own weights and KV cache
+    LLAMA_CPP_MAX_QUEUE: int = 16  # requests waiting for a free instance before new ones are refused
+    LLAMA_CPP_QUEUE_TIMEOUT: float = 30.0  # seconds a request waits for a free instance
+    LLAMA_CPP_N_CTX: int = 2048
+    LLAMA_CPP_N_THREADS: Optional[int] = None  # None lets llama.cpp pick
+    LLAMA_CPP_MAX_TOKENS: int = 150
+    LLAMA_CPP_PREFIX_CACHE_BYTES: int = 0  # RAM for saved KV states per instance; 0 disables
+    LLAMA_CPP_CONTEXT_FIRST: bool = False  # prompt starts with the context, so its KV state is reused
+    # HuggingFace local inference (LLM_NAME=huggingface)
+    HF_TORCH_THREADS: Optional[int] = None  # torch intra-op threads on CPU; None keeps the torch default
+    HF_TORCH_DTYPE: str = "auto"  # "auto", "float32", "bfloat16", ...; bfloat16 halves memory on recent CPUs
+    HF_MAX_NEW_TOKENS: int = 2000
+    HF_STREAM_TIMEOUT: float = 120.0  # seconds to wait for the next streamed token
+    # Fake LLM for load and latency testing (LLM_NAME=fake)
+    FAKE_LLM_TTFT: float = 0.3  # seconds to the first token
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50.0
+    FAKE_LLM_JITTER: float = 0.1  # +/- fraction applied to TTFT and tokens per second
+    FAKE_LLM_ERROR_RATE: float = 0.0  # share of calls that fail
+    FAKE_LLM_TOKENS: int = 100  # tokens per answer
+    FAKE_LLM_SEED: int = 0
     DEFAULT_MAX_HISTORY: int = 150
-    MODEL_TOKEN_LIMITS: dict = {"gpt-3.5-turbo": 4096, "claude-2": 1e5}
+    MODEL_TOKEN_LIMITS: dict = {"gpt-3.5-turbo": 4096, "gpt-4o": 128000, "gpt-4o-mini": 128000, "claude-2": 1e5}
+    DEFAULT_CONTEXT_LIMIT: int = 8192  # context window for models missing from MODEL_TOKEN_LIMITS
+    RESPONSE_TOKEN_RESERVE: int = 1024
+    # Extractive compression of primary docs: keep the sentences closest to the question
+    CONTEXT_COMPRESSION_ENABLED: bool = False
+    CONTEXT_COMPRESSION_TOKENS: int = 1500  # token budget for the compressed primary docs
+    CONTEXT_COMPRESSION_WINDOW: int = 1  # neighbouring sentences kept around each match
+    # Adaptive k: the number of primary chunks follows their similarity scores
+    RETRIEVAL_ADAPTIVE_K: bool = False
+    RETRIEVAL_MAX_K: int = 8  # upper bound on the chunks a request asks for
+    RETRIEVAL_MIN_SCORE: float = 0.35  # cosine similarity
+    RETRIEVAL_SCORE_GAP: float = 0.1  # stop at a larger drop between consecutive chunks
     UPLOAD_FOLDER: str = "inputs"
     PARSE_PDF_AS_IMAGE: bool = False
     VECTOR_STORE: str = "faiss" #  "faiss" or "elasticsearch" or "qdrant" or "milvus" or "lancedb"
     RETRIEVERS_ENABLED: list = ["classic_rag"]
+    RETRIEVER_MAX_WORKERS: int = 8  # threads shared by concurrent retrieval stages
+    RETRIEVER_SUMMARY_WORKERS: int = 4  # threads for the guideline summary LLM calls
+    # Shared LLM client connection pools (per process)
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_HTTP_TIMEOUT: float = 120.0
+    OPENAI_STREAM_USAGE: bool = True  # disable for OpenAI compatible servers without stream_options
+    # LLM_NAME=router: route between several backends (see application/llm/router.py)
+    LLM_ROUTER_BACKENDS: list = []  # e.g. [{"llm": "openai", "model": "gpt-4o-mini"}, {"llm": "groq", ...}]
+    LLM_ROUTER_HEDGE_AFTER: float = 0  # seconds without a first token before a second backend starts; 0 disables
+    LLM_ROUTER_EXPECTED_TOKENS: int = 200  # answer length used to rank backends
+    LLM_ROUTER_EWMA_ALPHA: float = 0.2
+    LLM_ROUTER_FAILURE_THRESHOLD: int = 3  # consecutive failures that open the circuit
+    LLM_ROUTER_COOLDOWN: float = 30.0  # seconds a backend is skipped once its circuit is open
+    # /api/answer/batch
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8  # LLM calls in flight per batch
+    BATCH_GUIDELINE_CHUNKS: int = 4  # guideline chunks in the batch's shared summary
 
     # LLM Cache
     CACHE_REDIS_URL: str = "redis://localhost:6379/2"
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: dict = {"gen": 1800, "stream": 1800}  # seconds, per cache endpoint
+    LLM_CACHE_DEFAULT_TTL: int = 1800
+    LLM_CACHE_LOCAL_SIZE: int = 512  # entries in the in-process tier
+    LLM_CACHE_LOCAL_TTL: int = 300
+    LLM_CACHE_MAX_ENTRY_BYTES: int = 256 * 1024  # compressed; larger answers are not cached
+    LLM_CACHE_ZSTD_LEVEL: int = 3
+    LLM_CACHE_METRICS_KEY: str = "llm_cache:metrics"
+    LLM_CACHE_METRICS_FLUSH_INTERVAL: float = 10.0
+    # How cached streams are replayed: "instant", "coalesced" or "paced"
+    # (API keys can override it with their "cache_replay" field)
+    LLM_CACHE_REPLAY: str = "coalesced"
+    LLM_CACHE_REPLAY_FRAMES: int = 8  # frames per coalesced replay
+    LLM_CACHE_REPLAY_DURATION: float = 1.0  # seconds for a paced replay
+    # single-flight: identical LLM calls in flight at the same time share one provider call
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+    LLM_SINGLE_FLIGHT_LOCK_TTL: int = 120  # seconds; renewed while the leader publishes
+    LLM_SINGLE_FLIGHT_DONE_TTL: int = 10  # seconds a finished flight stays readable by other workers
+    LLM_SINGLE_FLIGHT_FLUSH_INTERVAL: float = 0.05  # seconds between chunk frames sent to other workers
+
+    # Guideline summaries built at ingest for doc_type "guide" sources
+    GUIDELINE_SECTION_CHUNKS: int = 4  # chunks per summarized section
+    GUIDELINE_SUMMARY_MAX_TOKENS: int = 500
+    GUIDELINE_SUMMARY_WORKERS: int = 4
+    GUIDELINE_SUMMARY_DOCS: int = 2  # stored summaries sent with the retrieved guideline chunks
+
+    # Guideline summary cache (Redis with an in-process front)
+    GUIDELINE_SUMMARY_CACHE_TTL: int = 7 * 24 * 3600
+    GUIDELINE_SUMMARY_LOCAL_TTL: int = 300
+    GUIDELINE_SUMMARY_CACHE_SIZE: int = 256
+
+    # In-process cache for API key, source and prompt lookups (0 disables it)
+    METADATA_CACHE_TTL: int = 60
+    METADATA_CACHE_SIZE: int = 1024
+
+    # Rolling summary of turns older than the recent window
+    HISTORY_SUMMARY_ENABLED: bool = True
+    HISTORY_RECENT_TURNS: int = 4
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300
+    HISTORY_SUMMARY_BATCH_TURNS: int = 10  # turns folded per summarization call
+
+    # Write-behind persistence of conversations and logs
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000
+    WRITE_BEHIND_BATCH_SIZE: int = 100
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.2  # seconds a batch waits to fill up
+    WRITE_BEHIND_PUT_TIMEOUT: float = 0.1  # then the write runs inline
+    WRITE_BEHIND_FLUSH_TIMEOUT: float = 10.0  # on shutdown
+    BACKGROUND_WORKERS: int = 4
+
+    # Semantic answer cache (near-duplicate questions against the same sources)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL: int = 24 * 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 200
+    SEMANTIC_CACHE_LOCAL_TTL: int = 30
 
     API_URL: str = "http://localhost:7091"  # backend url for celery worker
 
@@ -0,0 +1,58 @@
+"""
+Gunicorn configuration for the backend.
+
+    gunicorn -c application/gunicorn.conf.py application.wsgi:app
+
+/stream keeps a request open for the whole LLM generation, so with the sync
+worker class each worker holds exactly one stream. The worker class is chosen
+with GUNICORN_WORKER_CLASS:
+
+- "gevent": cooperative workers. Redis, pymongo, requests and the httpx
+  based LLM clients all use patched sockets, so one worker holds hundreds of
+  concurrent streams while they wait on the LLM.
+- "gthread": a thread per open stream, GUNICORN_THREADS per worker.
+- "sync": one request per worker, same as the old `gunicorn -w 2` setup.
+
+The same Flask handlers run unchanged under all three. CPU bound work
+(in-process embeddings, llama.cpp, huggingface) blocks every greenlet of a
+gevent worker, so the default is gevent only when embeddings come from the
+shared server (EMBEDDINGS_SERVER_URL) or a hosted API and the LLM is not
+local; otherwise it is gthread. Choosing gevent explicitly with CPU bound
+work in the worker logs a warning at startup.
+"""
+import os
+
+from application.core.settings import settings
+
+LOCAL_LLMS = ("llama.cpp", "huggingface")
+
+
+def _cpu_bound_in_worker():
+    local_embeddings = (
+        not settings.EMBEDDINGS_SERVER_URL
+        and settings.EMBEDDINGS_NAME != "openai_text-embedding-ada-002"
+    )
+    return local_embeddings or settings.LLM_NAME.lower() in LOCAL_LLMS
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:7091")
+worker_class = os.getenv(
+    "GUNICORN_WORKER_CLASS", "gthread" if _cpu_bound_in_worker() else "gevent"
+)
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+# concurrent streams per worker: greenlets for gevent, threads for gthread
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+threads = int(os.getenv("GUNICORN_THREADS", 64 if worker_class == "gthread" else 1))
+# for sync workers this bounds a whole request (including a stream); for
+# gevent/gthread it only applies to the worker heartbeat
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+
+def on_starting(server):
+    if worker_class == "gevent" and _cpu_bound_in_worker():
+        server.log.warning(
+            "gevent workers with in-process embeddings or a local LLM: CPU bound work "
+            "blocks every stream of the worker. Set EMBEDDINGS_SERVER_URL or use gthread."
+        )
@@ -1,18 +1,26 @@
 from application.llm.base import BaseLLM
+from application.llm.clients import LLMClients, client_key, http_limits
 from application.core.settings import settings
 
 
 class AnthropicLLM(BaseLLM):
 
     def __init__(self, api_key=None, user_api_key=None, *args, **kwargs):
-        from anthropic import Anthropic, HUMAN_PROMPT, AI_PROMPT
+        from anthropic import Anthropic, DefaultHttpxClient, HUMAN_PROMPT, AI_PROMPT
 
         super().__init__(*args, **kwargs)
         self.api_key = (
             api_key or settings.ANTHROPIC_API_KEY
         )  # If not provided, use a default from settings
         self.user_api_key = user_api_key
-        self.anthropic = Anthropic(api_key=self.api_key)
+        self.anthropic = LLMClients.get_instance(
+            client_key("anthropic", self.api_key),
+            lambda: Anthropic(
+                api_key=self.api_key,
+                timeout=settings.LLM_HTTP_TIMEOUT,
+                http_client=DefaultHttpxClient(limits=http_limits()),
+            ),
+        )
         self.HUMAN_PROMPT = HUMAN_PROMPT
         self.AI_PROMPT = AI_PROMPT
 
@@ -1,11 +1,14 @@
 from abc import ABC, abstractmethod
 from application.usage import gen_token_usage, stream_token_usage
 from application.cache import stream_cache, gen_cache
+from application.single_flight import gen_single_flight, stream_single_flight
 
 
 class BaseLLM(ABC):
-    def __init__(self):
+    def __init__(self, cache_replay=None):
         self.token_usage = {"prompt_tokens": 0, "generated_tokens": 0}
+        # replay mode for cached streams (see application.cache.replay_chunks)
+        self.cache_replay = cache_replay
 
     def _apply_decorator(self, method, decorators, *args, **kwargs):
         for decorator in decorators:
@@ -16,8 +19,11 @@ class BaseLLM(ABC):
     def _raw_gen(self, model, messages, stream, *args, **kwargs):
         pass
 
+    # Decorators are listed innermost first. Usage is recorded innermost, around
+    # the provider call itself: cache hits and single-flight followers made no
+    # provider call and record nothing.
     def gen(self, model, messages, stream=False, *args, **kwargs):
-        decorators = [gen_token_usage, gen_cache]
+        decorators = [gen_token_usage, gen_single_flight, gen_cache]
         return self._apply_decorator(self._raw_gen, decorators=decorators, model=model, messages=messages, stream=stream, *args, **kwargs)
 
     @abstractmethod
@@ -25,5 +31,5 @@ class BaseLLM(ABC):
         pass
 
     def gen_stream(self, model, messages, stream=True, *args, **kwargs):
-        decorators = [stream_cache, stream_token_usage]
+        decorators = [stream_token_usage, stream_single_flight, stream_cache]
         return self._apply_decorator(self._raw_gen_stream, decorators=decorators, model=model, messages=messages, stream=stream, *args, **kwargs)
\ No newline at end of file
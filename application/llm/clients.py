@@ -0,0 +1,88 @@
+"""
+Process-wide registry of LLM provider clients.
+
+SDK clients (HTTP connection pools, boto3 clients, loaded model weights) are
+expensive to build and safe to share between threads, while the BaseLLM
+wrappers hold per-request state (token usage, the user's api key). The
+wrappers are still created per request by LLMCreator but take their client
+from here, so connections stay open and models are loaded once.
+
+Clients are created lazily, so each forked worker process builds its own.
+"""
+import threading
+
+from application.core.settings import settings
+from application.utils import get_hash
+
+
+class LLMClients:
+    _instances = {}
+    _locks = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, key, factory):
+        client = cls._instances.get(key)
+        if client is not None:
+            return client
+        # one lock per key, so loading a model does not hold up other clients
+        with cls._lock:
+            key_lock = cls._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            client = cls._instances.get(key)
+            if client is None:
+                client = factory()
+                cls._instances[key] = client
+        return client
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._instances.clear()
+
+
+def client_key(provider, api_key=None, *extra):
+    # api keys are hashed so they do not sit in the registry in plain text
+    return (provider, get_hash(api_key) if api_key else None, *extra)
+
+
+def http_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def openai_client(api_key, base_url=None):
+    from openai import DefaultHttpxClient, OpenAI
+
+    def create():
+        return OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=settings.LLM_HTTP_TIMEOUT,
+            http_client=DefaultHttpxClient(limits=http_limits()),
+        )
+
+    return LLMClients.get_instance(client_key("openai", api_key, base_url), create)
+
+
+def requests_session(name):
+    """A keep-alive requests.Session with a connection pool sized like the SDK clients."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    def create():
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            pool_maxsize=settings.LLM_HTTP_MAX_CONNECTIONS,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    return LLMClients.get_instance(client_key("requests", None, name), create)
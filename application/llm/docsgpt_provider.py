@@ -1,6 +1,6 @@
 from application.llm.base import BaseLLM
+from application.llm.clients import requests_session
 import json
-import requests
 
 
 class DocsGPTAPILLM(BaseLLM):
@@ -10,9 +10,10 @@ class DocsGPTAPILLM(BaseLLM):
         self.api_key = api_key
         self.user_api_key = user_api_key
         self.endpoint = "https://llm.arc53.com"
+        self.session = requests_session("docsgpt")
 
     def _raw_gen(self, baseself, model, messages, stream=False, *args, **kwargs):
-        response = requests.post(
+        response = self.session.post(
             f"{self.endpoint}/answer", json={"messages": messages, "max_new_tokens": 30}
         )
         response_clean = response.json()["a"].replace("###", "")
@@ -20,7 +21,7 @@ class DocsGPTAPILLM(BaseLLM):
         return response_clean
 
     def _raw_gen_stream(self, baseself, model, messages, stream=True, *args, **kwargs):
-        response = requests.post(
+        response = self.session.post(
             f"{self.endpoint}/stream",
             json={"messages": messages, "max_new_tokens": 256},
             stream=True,
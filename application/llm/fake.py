@@ -0,0 +1,96 @@
+"""
+Local fake LLM for load and latency testing (LLM_NAME=fake).
+
+Streams deterministic text without any network service, so the cost of
+retrieval, caching and persistence around the LLM can be measured on their
+own. The answer depends only on FAKE_LLM_SEED and the messages; timing
+follows FAKE_LLM_TTFT (time to first token) and FAKE_LLM_TOKENS_PER_SECOND,
+each varied by up to +/- FAKE_LLM_JITTER (a fraction). With FAKE_LLM_ERROR_RATE
+a share of the calls fails with FakeLLMError, before or during the stream.
+"""
+import json
+import random
+import threading
+import time
+
+from application.core.settings import settings
+from application.llm.base import BaseLLM
+from application.utils import get_hash
+
+WORDS = (
+    "the document describes how to configure deploy and monitor a service "
+    "with clear steps examples and notes about security performance and limits"
+).split()
+
+# timing and failures draw from one seeded sequence per process
+_random = random.Random(settings.FAKE_LLM_SEED)
+_random_lock = threading.Lock()
+
+
+class FakeLLMError(RuntimeError):
+    """Failure injected by FakeLLM."""
+
+
+class FakeLLM(BaseLLM):
+
+    def __init__(
+        self,
+        api_key=None,
+        user_api_key=None,
+        ttft=None,
+        tokens_per_second=None,
+        jitter=None,
+        error_rate=None,
+        tokens=None,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.api_key = api_key
+        self.user_api_key = user_api_key
+        self.ttft = settings.FAKE_LLM_TTFT if ttft is None else ttft
+        self.tokens_per_second = (
+            settings.FAKE_LLM_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+        )
+        self.jitter = settings.FAKE_LLM_JITTER if jitter is None else jitter
+        self.error_rate = settings.FAKE_LLM_ERROR_RATE if error_rate is None else error_rate
+        self.tokens = settings.FAKE_LLM_TOKENS if tokens is None else tokens
+
+    def answer_tokens(self, messages):
+        seed = get_hash(f"{settings.FAKE_LLM_SEED}_{json.dumps(messages, sort_keys=True)}")
+        words = random.Random(seed).choices(WORDS, k=self.tokens)
+        if not words:
+            return []
+        return [words[0]] + [f" {word}" for word in words[1:]]
+
+    def _plan(self):
+        """(ttft, seconds per token, index of the failing token or None) for one call."""
+        with _random_lock:
+            ttft_jitter = _random.uniform(-self.jitter, self.jitter)
+            rate_jitter = _random.uniform(-self.jitter, self.jitter)
+            fails = _random.random() < self.error_rate
+            fail_at = _random.randrange(max(self.tokens, 1)) if fails else None
+        ttft = max(self.ttft * (1 + ttft_jitter), 0)
+        rate = self.tokens_per_second * (1 + rate_jitter)
+        return ttft, (1 / rate if rate > 0 else 0), fail_at
+
+    def _report(self, messages, tokens):
+        self.reported_usage = {
+            "prompt_tokens": sum(len(message["content"].split()) for message in messages),
+            "generated_tokens": tokens,
+        }
+
+    def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
+        return "".join(self._raw_gen_stream(baseself, model, messages, stream=False, **kwargs))
+
+    def _raw_gen_stream(self, baseself, model, messages, stream=True, **kwargs):
+        ttft, per_token, fail_at = self._plan()
+        tokens = self.answer_tokens(messages)
+        time.sleep(ttft)
+        for i, token in enumerate(tokens):
+            if i == fail_at:
+                raise FakeLLMError(f"Injected failure after {i} tokens")
+            if i:
+                time.sleep(per_token)
+            yield token
+        self._report(messages, len(tokens))
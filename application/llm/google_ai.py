@@ -1,5 +1,24 @@
+import threading
+
 from application.llm.base import BaseLLM
 
+_configure_lock = threading.Lock()
+_configured_key = object()  # nothing configured yet
+
+
+def _configured_genai(api_key):
+    """genai keeps its client in module state; only reconfigure it when the key changes."""
+    global _configured_key
+    import google.generativeai as genai
+
+    if _configured_key != api_key:
+        with _configure_lock:
+            if _configured_key != api_key:
+                genai.configure(api_key=api_key)
+                _configured_key = api_key
+    return genai
+
+
 class GoogleLLM(BaseLLM):
 
     def __init__(self, api_key=None, user_api_key=None, *args, **kwargs):
@@ -25,8 +44,7 @@ class GoogleLLM(BaseLLM):
         stream=False,
         **kwargs
     ):  
-        import google.generativeai as genai
-        genai.configure(api_key=self.api_key)
+        genai = _configured_genai(self.api_key)
         model = genai.GenerativeModel(model, system_instruction=messages[0]["content"])
         response = model.generate_content(self._clean_messages_google(messages))
         return response.text
@@ -39,8 +57,7 @@ class GoogleLLM(BaseLLM):
         stream=True,
         **kwargs
     ):  
-        import google.generativeai as genai
-        genai.configure(api_key=self.api_key)
+        genai = _configured_genai(self.api_key)
         model = genai.GenerativeModel(model, system_instruction=messages[0]["content"])
         response = model.generate_content(self._clean_messages_google(messages), stream=True)
         for line in response:
@@ -1,14 +1,13 @@
 from application.llm.base import BaseLLM
+from application.llm.clients import openai_client
 
 
 
 class GroqLLM(BaseLLM):
 
     def __init__(self, api_key=None, user_api_key=None, *args, **kwargs):
-        from openai import OpenAI
-
         super().__init__(*args, **kwargs)
-        self.client = OpenAI(api_key=api_key, base_url="https://api.groq.com/openai/v1")
+        self.client = openai_client(api_key, "https://api.groq.com/openai/v1")
         self.api_key = api_key
         self.user_api_key = user_api_key
 
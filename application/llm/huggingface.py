@@ -1,4 +1,61 @@
+import threading
+
+from application.core.settings import settings
 from application.llm.base import BaseLLM
+from application.llm.clients import LLMClients, client_key
+
+
+def _torch_dtype():
+    import torch
+
+    if settings.HF_TORCH_DTYPE == "auto":
+        return "auto"
+    return getattr(torch, settings.HF_TORCH_DTYPE)
+
+
+def _load_pipeline(llm_name, q):
+    from langchain.llms import HuggingFacePipeline
+
+    if settings.HF_TORCH_THREADS:
+        import torch
+
+        # intra-op threads for CPU inference; applies to the whole process
+        torch.set_num_threads(settings.HF_TORCH_THREADS)
+
+    if q:
+        import torch
+        from transformers import (
+            AutoModelForCausalLM,
+            AutoTokenizer,
+            pipeline,
+            BitsAndBytesConfig,
+        )
+
+        tokenizer = AutoTokenizer.from_pretrained(llm_name)
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_use_double_quant=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16,
+        )
+        model = AutoModelForCausalLM.from_pretrained(
+            llm_name, quantization_config=bnb_config
+        )
+    else:
+        from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+        tokenizer = AutoTokenizer.from_pretrained(llm_name)
+        model = AutoModelForCausalLM.from_pretrained(llm_name, torch_dtype=_torch_dtype())
+
+    pipe = pipeline(
+        "text-generation",
+        model=model,
+        tokenizer=tokenizer,
+        max_new_tokens=settings.HF_MAX_NEW_TOKENS,
+        device_map="auto",
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    return HuggingFacePipeline(pipeline=pipe)
 
 
 class HuggingFaceLLM(BaseLLM):
@@ -12,57 +69,69 @@ class HuggingFaceLLM(BaseLLM):
         *args,
         **kwargs,
     ):
-        global hf
-
-        from langchain.llms import HuggingFacePipeline
-
-        if q:
-            import torch
-            from transformers import (
-                AutoModelForCausalLM,
-                AutoTokenizer,
-                pipeline,
-                BitsAndBytesConfig,
-            )
-
-            tokenizer = AutoTokenizer.from_pretrained(llm_name)
-            bnb_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_use_double_quant=True,
-                bnb_4bit_quant_type="nf4",
-                bnb_4bit_compute_dtype=torch.bfloat16,
-            )
-            model = AutoModelForCausalLM.from_pretrained(
-                llm_name, quantization_config=bnb_config
-            )
-        else:
-            from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-
-            tokenizer = AutoTokenizer.from_pretrained(llm_name)
-            model = AutoModelForCausalLM.from_pretrained(llm_name)
-
         super().__init__(*args, **kwargs)
         self.api_key = api_key
         self.user_api_key = user_api_key
-        pipe = pipeline(
-            "text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            max_new_tokens=2000,
-            device_map="auto",
-            eos_token_id=tokenizer.eos_token_id,
+        # weights are loaded once per process and model, not per request
+        self.hf = LLMClients.get_instance(
+            client_key("huggingface", None, llm_name, q),
+            lambda: _load_pipeline(llm_name, q),
         )
-        hf = HuggingFacePipeline(pipeline=pipe)
 
-    def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
+    def _prompt(self, messages):
         context = messages[0]["content"]
         user_question = messages[-1]["content"]
-        prompt = f"### Instruction \n {user_question} \n ### Context \n {context} \n ### Answer \n"
+        return f"### Instruction \n {user_question} \n ### Context \n {context} \n ### Answer \n"
 
-        result = hf(prompt)
+    def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
+        result = self.hf(self._prompt(messages))
 
         return result.content
 
     def _raw_gen_stream(self, baseself, model, messages, stream=True, **kwargs):
+        from transformers import (
+            StoppingCriteria,
+            StoppingCriteriaList,
+            TextIteratorStreamer,
+        )
+
+        pipe = self.hf.pipeline
+        tokenizer = pipe.tokenizer
+        inputs = tokenizer(self._prompt(messages), return_tensors="pt").to(pipe.model.device)
+        streamer = TextIteratorStreamer(
+            tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+            timeout=settings.HF_STREAM_TIMEOUT,
+        )
+        cancelled = threading.Event()
+        errors = []
+
+        class Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancelled.is_set()
+
+        def generate():
+            try:
+                pipe.model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    max_new_tokens=settings.HF_MAX_NEW_TOKENS,
+                    eos_token_id=tokenizer.eos_token_id,
+                    stopping_criteria=StoppingCriteriaList([Cancelled()]),
+                )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
 
-        raise NotImplementedError("HuggingFaceLLM Streaming is not implemented yet.")
+        # generate() feeds the streamer from its own thread
+        threading.Thread(target=generate, name="hf-generate", daemon=True).start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        finally:
+            # stops generation when the client goes away
+            cancelled.set()
+        if errors:
+            raise errors[0]
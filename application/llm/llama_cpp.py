@@ -1,27 +1,135 @@
-from application.llm.base import BaseLLM
-from application.core.settings import settings
+"""
+Local inference with llama.cpp.
+
+Each model file gets a LlamaPool of up to LLAMA_CPP_POOL_SIZE model
+instances, so that many requests are answered concurrently. Requests that
+find every instance busy wait in a bounded queue (LLAMA_CPP_MAX_QUEUE) for at
+most LLAMA_CPP_QUEUE_TIMEOUT seconds, then fail with LlamaPoolBusy.
+
+llama.cpp keeps the KV state of the tokens it evaluated last and only
+evaluates what follows the longest common prefix, so requests go to an idle
+instance that last served the same prompt prefix when there is one. With
+LLAMA_CPP_PREFIX_CACHE_BYTES set, each instance also keeps saved KV states
+in a RAM cache and restores the longest matching one. LLAMA_CPP_CONTEXT_FIRST
+puts the system prompt and context ahead of the question, so that prefix is
+shared by every question about the same sources.
+"""
 import threading
+import time
+from contextlib import contextmanager
+
+from application.core.settings import settings
+from application.llm.base import BaseLLM
+from application.llm.clients import LLMClients, client_key
+from application.utils import get_hash
+
+
+class LlamaPoolBusy(Exception):
+    """No llama.cpp instance became free in time, or the queue is full."""
+
 
-class LlamaSingleton:
-    _instances = {}
-    _lock = threading.Lock()  # Add a lock for thread synchronization
+class _Instance:
+    def __init__(self, llama):
+        self.llama = llama
+        self.prefix = None
 
-    @classmethod
-    def get_instance(cls, llm_name):
-        if llm_name not in cls._instances:
+
+class LlamaPool:
+    def __init__(self, model_path, size=None, max_queue=None):
+        self.model_path = model_path
+        self.size = size or settings.LLAMA_CPP_POOL_SIZE
+        self.max_queue = settings.LLAMA_CPP_MAX_QUEUE if max_queue is None else max_queue
+        self._idle = []
+        self._created = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def _create(self):
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            raise ImportError(
+                "Please install llama_cpp using pip install llama-cpp-python"
+            )
+        llama = Llama(
+            model_path=self.model_path,
+            n_ctx=settings.LLAMA_CPP_N_CTX,
+            n_threads=settings.LLAMA_CPP_N_THREADS,
+            verbose=False,
+        )
+        if settings.LLAMA_CPP_PREFIX_CACHE_BYTES:
+            from llama_cpp import LlamaRAMCache
+
+            llama.set_cache(LlamaRAMCache(capacity_bytes=settings.LLAMA_CPP_PREFIX_CACHE_BYTES))
+        return _Instance(llama)
+
+    def _take(self, prefix, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            queued = False
             try:
-                from llama_cpp import Llama
-            except ImportError:
-                raise ImportError(
-                    "Please install llama_cpp using pip install llama-cpp-python"
-                )
-            cls._instances[llm_name] = Llama(model_path=llm_name, n_ctx=2048)
-        return cls._instances[llm_name]
+                while True:
+                    if self._idle:
+                        for i, instance in enumerate(self._idle):
+                            if instance.prefix == prefix:
+                                return self._idle.pop(i)
+                        return self._idle.pop(0)
+                    if self._created < self.size:
+                        self._created += 1
+                        break
+                    if not queued:
+                        if self._waiting >= self.max_queue:
+                            raise LlamaPoolBusy("llama.cpp request queue is full")
+                        self._waiting += 1
+                        queued = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LlamaPoolBusy(f"No llama.cpp instance free after {timeout}s")
+                    self._cond.wait(remaining)
+            finally:
+                if queued:
+                    self._waiting -= 1
+        # a new instance is loaded outside the lock
+        try:
+            return self._create()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def _give_back(self, instance, prefix):
+        instance.prefix = prefix
+        with self._cond:
+            self._idle.append(instance)
+            self._cond.notify()
+
+    @contextmanager
+    def acquire(self, prefix=None, timeout=None):
+        """A llama.cpp model for the duration of one request."""
+        timeout = settings.LLAMA_CPP_QUEUE_TIMEOUT if timeout is None else timeout
+        instance = self._take(prefix, timeout)
+        try:
+            yield instance.llama
+        finally:
+            self._give_back(instance, prefix)
+
+
+def get_llama_pool(model_path):
+    return LLMClients.get_instance(
+        client_key("llama.cpp", None, model_path), lambda: LlamaPool(model_path)
+    )
+
 
-    @classmethod
-    def query_model(cls, llm, prompt, **kwargs):
-        with cls._lock:
-            return llm(prompt, **kwargs)
+def build_prompt(messages):
+    """Return (prompt, lead), lead being the part of the prompt shared by related requests."""
+    context = messages[0]["content"]
+    user_question = messages[-1]["content"]
+    if settings.LLAMA_CPP_CONTEXT_FIRST:
+        lead = f"### Context \n {context} \n"
+        return f"{lead}### Instruction \n {user_question} \n ### Answer \n", lead
+    lead = f"### Instruction \n {user_question} \n"
+    return f"{lead} ### Context \n {context} \n ### Answer \n", lead
 
 
 class LlamaCpp(BaseLLM):
@@ -36,20 +144,19 @@ class LlamaCpp(BaseLLM):
         super().__init__(*args, **kwargs)
         self.api_key = api_key
         self.user_api_key = user_api_key
-        self.llama = LlamaSingleton.get_instance(llm_name)
+        self.pool = get_llama_pool(llm_name)
 
     def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
-        context = messages[0]["content"]
-        user_question = messages[-1]["content"]
-        prompt = f"### Instruction \n {user_question} \n ### Context \n {context} \n ### Answer \n"
-        result = LlamaSingleton.query_model(self.llama, prompt, max_tokens=150, echo=False)
+        prompt, lead = build_prompt(messages)
+        with self.pool.acquire(prefix=get_hash(lead)) as llama:
+            result = llama(prompt, max_tokens=settings.LLAMA_CPP_MAX_TOKENS, echo=False)
         return result["choices"][0]["text"].split("### Answer \n")[-1]
 
     def _raw_gen_stream(self, baseself, model, messages, stream=True, **kwargs):
-        context = messages[0]["content"]
-        user_question = messages[-1]["content"]
-        prompt = f"### Instruction \n {user_question} \n ### Context \n {context} \n ### Answer \n"
-        result = LlamaSingleton.query_model(self.llama, prompt, max_tokens=150, echo=False, stream=stream)
-        for item in result:
-            for choice in item["choices"]:
-                yield choice["text"]
\ No newline at end of file
+        prompt, lead = build_prompt(messages)
+        # the instance stays taken until the stream is consumed or closed
+        with self.pool.acquire(prefix=get_hash(lead)) as llama:
+            result = llama(prompt, max_tokens=settings.LLAMA_CPP_MAX_TOKENS, echo=False, stream=stream)
+            for item in result:
+                for choice in item["choices"]:
+                    yield choice["text"]
@@ -1,31 +1,34 @@
-from application.llm.groq import GroqLLM
-from application.llm.openai import OpenAILLM, AzureOpenAILLM
-from application.llm.sagemaker import SagemakerAPILLM
-from application.llm.huggingface import HuggingFaceLLM
-from application.llm.llama_cpp import LlamaCpp
-from application.llm.anthropic import AnthropicLLM
-from application.llm.docsgpt_provider import DocsGPTAPILLM
-from application.llm.premai import PremAILLM
-from application.llm.google_ai import GoogleLLM
+from application.utils import import_string
 
 
 class LLMCreator:
+    # Implementations are imported on first use so that only the configured
+    # provider (and its SDK) is loaded.
     llms = {
-        "openai": OpenAILLM,
-        "azure_openai": AzureOpenAILLM,
-        "sagemaker": SagemakerAPILLM,
-        "huggingface": HuggingFaceLLM,
-        "llama.cpp": LlamaCpp,
-        "anthropic": AnthropicLLM,
-        "docsgpt": DocsGPTAPILLM,
-        "premai": PremAILLM,
-        "groq": GroqLLM,
-        "google": GoogleLLM
+        "openai": "application.llm.openai.OpenAILLM",
+        "azure_openai": "application.llm.openai.AzureOpenAILLM",
+        "sagemaker": "application.llm.sagemaker.SagemakerAPILLM",
+        "huggingface": "application.llm.huggingface.HuggingFaceLLM",
+        "llama.cpp": "application.llm.llama_cpp.LlamaCpp",
+        "anthropic": "application.llm.anthropic.AnthropicLLM",
+        "docsgpt": "application.llm.docsgpt_provider.DocsGPTAPILLM",
+        "premai": "application.llm.premai.PremAILLM",
+        "groq": "application.llm.groq.GroqLLM",
+        "google": "application.llm.google_ai.GoogleLLM",
+        "router": "application.llm.router.RoutingLLM",
+        "fake": "application.llm.fake.FakeLLM",
     }
 
     @classmethod
-    def create_llm(cls, type, api_key, user_api_key, *args, **kwargs):
+    def get_llm_class(cls, type):
         llm_class = cls.llms.get(type.lower())
         if not llm_class:
             raise ValueError(f"No LLM class found for type {type}")
+        if isinstance(llm_class, str):
+            llm_class = import_string(llm_class)
+        return llm_class
+
+    @classmethod
+    def create_llm(cls, type, api_key, user_api_key, *args, **kwargs):
+        llm_class = cls.get_llm_class(type)
         return llm_class(api_key, user_api_key, *args, **kwargs)
@@ -1,21 +1,16 @@
 from application.llm.base import BaseLLM
+from application.llm.clients import LLMClients, client_key, openai_client, http_limits
 from application.core.settings import settings
 
 
 
 class OpenAILLM(BaseLLM):
+    # ask for a final usage chunk on streams (stream_options.include_usage)
+    stream_usage = True
 
     def __init__(self, api_key=None, user_api_key=None, *args, **kwargs):
-        from openai import OpenAI
-
         super().__init__(*args, **kwargs)
-        if settings.OPENAI_BASE_URL:
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=settings.OPENAI_BASE_URL
-            )
-        else:
-            self.client = OpenAI(api_key=api_key)
+        self.client = openai_client(api_key, settings.OPENAI_BASE_URL)
         self.api_key = api_key
         self.user_api_key = user_api_key
 
@@ -31,6 +26,7 @@ class OpenAILLM(BaseLLM):
         response = self.client.chat.completions.create(
             model=model, messages=messages, stream=stream, **kwargs
         )
+        self._report_usage(response.usage)
 
         return response.choices[0].message.content
 
@@ -43,18 +39,30 @@ class OpenAILLM(BaseLLM):
         engine=settings.AZURE_DEPLOYMENT_NAME,
         **kwargs
     ):  
+        if self.stream_usage and settings.OPENAI_STREAM_USAGE:
+            kwargs.setdefault("stream_options", {"include_usage": True})
         response = self.client.chat.completions.create(
             model=model, messages=messages, stream=stream, **kwargs
         )
 
         for line in response:
-            # import sys
-            # print(line.choices[0].delta.content, file=sys.stderr)
-            if line.choices[0].delta.content is not None:
+            # the usage chunk comes last and has no choices
+            if getattr(line, "usage", None) is not None:
+                self._report_usage(line.usage)
+            if line.choices and line.choices[0].delta.content is not None:
                 yield line.choices[0].delta.content
 
+    def _report_usage(self, usage):
+        if usage is not None:
+            self.reported_usage = {
+                "prompt_tokens": usage.prompt_tokens,
+                "generated_tokens": usage.completion_tokens,
+            }
+
 
 class AzureOpenAILLM(OpenAILLM):
+    # include_usage needs a recent api-version; counted locally instead
+    stream_usage = False
 
     def __init__(
         self, openai_api_key, openai_api_base, openai_api_version, deployment_name
@@ -63,11 +71,22 @@ class AzureOpenAILLM(OpenAILLM):
         self.api_base = (settings.OPENAI_API_BASE,)
         self.api_version = (settings.OPENAI_API_VERSION,)
         self.deployment_name = (settings.AZURE_DEPLOYMENT_NAME,)
-        from openai import AzureOpenAI
+        from openai import AzureOpenAI, DefaultHttpxClient
 
-        self.client = AzureOpenAI(
-            api_key=openai_api_key,
-            api_version=settings.OPENAI_API_VERSION,
-            api_base=settings.OPENAI_API_BASE,
-            deployment_name=settings.AZURE_DEPLOYMENT_NAME,
+        self.client = LLMClients.get_instance(
+            client_key(
+                "azure_openai",
+                openai_api_key,
+                settings.OPENAI_API_BASE,
+                settings.OPENAI_API_VERSION,
+                settings.AZURE_DEPLOYMENT_NAME,
+            ),
+            lambda: AzureOpenAI(
+                api_key=openai_api_key,
+                api_version=settings.OPENAI_API_VERSION,
+                azure_endpoint=settings.OPENAI_API_BASE,
+                azure_deployment=settings.AZURE_DEPLOYMENT_NAME,
+                timeout=settings.LLM_HTTP_TIMEOUT,
+                http_client=DefaultHttpxClient(limits=http_limits()),
+            ),
         )
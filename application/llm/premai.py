@@ -1,4 +1,5 @@
 from application.llm.base import BaseLLM
+from application.llm.clients import LLMClients, client_key
 from application.core.settings import settings
 
 
@@ -8,7 +9,9 @@ class PremAILLM(BaseLLM):
         from premai import Prem
 
         super().__init__(*args, **kwargs)
-        self.client = Prem(api_key=api_key)
+        self.client = LLMClients.get_instance(
+            client_key("premai", api_key), lambda: Prem(api_key=api_key)
+        )
         self.api_key = api_key
         self.user_api_key = user_api_key
         self.project_id = settings.PREMAI_PROJECT_ID
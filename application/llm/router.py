@@ -0,0 +1,224 @@
+"""
+LLM provider that routes each call to the fastest healthy backend.
+
+Backends are configured in LLM_ROUTER_BACKENDS, e.g.
+
+    [{"llm": "openai", "model": "gpt-4o-mini"},
+     {"llm": "groq", "model": "llama-3.1-8b-instant", "api_key": "..."}]
+
+Per backend (and per process) the router keeps a rolling average of the
+time to first token and of tokens per second, and ranks backends by the
+expected time for an answer of LLM_ROUTER_EXPECTED_TOKENS tokens. A backend
+failing LLM_ROUTER_FAILURE_THRESHOLD times in a row is skipped for
+LLM_ROUTER_COOLDOWN seconds (circuit breaker); a call that fails before its
+first token moves on to the next backend.
+
+With LLM_ROUTER_HEDGE_AFTER set, a second backend is started when the first
+has not produced a token by then; the first backend to produce a token wins
+and the other is cancelled.
+
+The router calls the backends' raw methods, so caching and token usage are
+applied once, by the router itself.
+"""
+import logging
+import queue
+import threading
+import time
+
+from application.core.settings import settings
+from application.llm.base import BaseLLM
+
+logger = logging.getLogger(__name__)
+
+
+class BackendStats:
+    def __init__(self):
+        self.ttft = None
+        self.tokens_per_second = None
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def _average(self, current, sample):
+        if current is None:
+            return sample
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        return alpha * sample + (1 - alpha) * current
+
+    def record_first_token(self, seconds):
+        with self._lock:
+            self.ttft = self._average(self.ttft, seconds)
+
+    def record_success(self, tokens, seconds):
+        with self._lock:
+            self.failures = 0
+            self.open_until = 0.0
+            if tokens > 1 and seconds > 0:
+                self.tokens_per_second = self._average(self.tokens_per_second, tokens / seconds)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= settings.LLM_ROUTER_FAILURE_THRESHOLD:
+                self.open_until = time.monotonic() + settings.LLM_ROUTER_COOLDOWN
+
+    def available(self, now):
+        # once the cooldown is over the backend gets another try (half open)
+        return self.open_until <= now
+
+    def expected_seconds(self):
+        # backends without samples rank first, so every backend gets measured
+        if self.ttft is None:
+            return 0.0
+        seconds = self.ttft
+        if self.tokens_per_second:
+            seconds += settings.LLM_ROUTER_EXPECTED_TOKENS / self.tokens_per_second
+        return seconds
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_backend_stats(name):
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = BackendStats()
+        return stats
+
+
+class Backend:
+    def __init__(self, spec, api_key, user_api_key):
+        from application.llm.llm_creator import LLMCreator
+
+        if isinstance(spec, str):
+            spec = {"llm": spec}
+        self.model = spec.get("model")
+        self.name = spec.get("name") or f"{spec['llm']}:{self.model or 'default'}"
+        self.llm = LLMCreator.create_llm(
+            spec["llm"], api_key=spec.get("api_key", api_key), user_api_key=user_api_key
+        )
+        self.stats = get_backend_stats(self.name)
+
+
+class _Attempt:
+    def __init__(self, backend):
+        self.backend = backend
+        self.started = time.monotonic()
+        self.first_token = None
+        self.tokens = 0
+        self.cancel = threading.Event()
+
+
+class RoutingLLM(BaseLLM):
+
+    def __init__(self, api_key=None, user_api_key=None, backends=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_key = api_key
+        self.user_api_key = user_api_key
+        specs = backends if backends is not None else settings.LLM_ROUTER_BACKENDS
+        if not specs:
+            raise ValueError("LLM_ROUTER_BACKENDS is empty")
+        self.backends = [Backend(spec, api_key, user_api_key) for spec in specs]
+
+    def ranked_backends(self):
+        now = time.monotonic()
+        available = [b for b in self.backends if b.stats.available(now)]
+        # with every circuit open, still try them rather than failing outright
+        return sorted(available or self.backends, key=lambda b: b.stats.expected_seconds())
+
+    def _run(self, attempt, method, model, messages, kwargs, events):
+        llm = attempt.backend.llm
+        model = attempt.backend.model or model
+        chunks = None
+        try:
+            if method == "gen":
+                chunks = [llm._raw_gen(llm, model=model, messages=messages, stream=False, **kwargs)]
+            else:
+                chunks = llm._raw_gen_stream(llm, model=model, messages=messages, stream=True, **kwargs)
+            for chunk in chunks:
+                if attempt.cancel.is_set():
+                    return
+                events.put((attempt, "chunk", chunk))
+            events.put((attempt, "done", None))
+        except Exception as e:
+            events.put((attempt, "error", e))
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    def _route(self, method, model, messages, kwargs):
+        candidates = self.ranked_backends()
+        events = queue.Queue()
+        active = []
+        winner = None
+        hedge_after = settings.LLM_ROUTER_HEDGE_AFTER
+        hedged = False
+
+        def start_next():
+            if not candidates:
+                return False
+            attempt = _Attempt(candidates.pop(0))
+            active.append(attempt)
+            threading.Thread(
+                target=self._run,
+                args=(attempt, method, model, messages, kwargs, events),
+                name=f"llm-router-{attempt.backend.name}",
+                daemon=True,
+            ).start()
+            return True
+
+        start_next()
+        try:
+            while True:
+                timeout = None
+                if winner is None and hedge_after and not hedged and candidates:
+                    timeout = max(active[0].started + hedge_after - time.monotonic(), 0)
+                try:
+                    attempt, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    logger.info(f"No token from {active[0].backend.name} after {hedge_after}s, hedging")
+                    hedged = start_next()
+                    continue
+
+                if winner is None:
+                    if kind == "error":
+                        logger.warning(f"LLM backend {attempt.backend.name} failed: {value}")
+                        attempt.backend.stats.record_failure()
+                        active.remove(attempt)
+                        if not active and not start_next():
+                            raise value
+                        continue
+                    winner = attempt
+                    winner.first_token = time.monotonic()
+                    winner.backend.stats.record_first_token(winner.first_token - winner.started)
+                    for other in active:
+                        if other is not winner:
+                            other.cancel.set()
+                            # still waiting for its first token: at least this slow
+                            other.backend.stats.record_first_token(winner.first_token - other.started)
+                elif attempt is not winner:
+                    continue
+
+                if kind == "chunk":
+                    winner.tokens += 1
+                    yield value
+                elif kind == "done":
+                    winner.backend.stats.record_success(
+                        winner.tokens, time.monotonic() - winner.first_token
+                    )
+                    self.reported_usage = getattr(winner.backend.llm, "reported_usage", None)
+                    return
+                else:
+                    winner.backend.stats.record_failure()
+                    raise value
+        finally:
+            for attempt in active:
+                attempt.cancel.set()
+
+    def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
+        return "".join(self._route("gen", model, messages, kwargs))
+
+    def _raw_gen_stream(self, baseself, model, messages, stream=True, **kwargs):
+        yield from self._route("gen_stream", model, messages, kwargs)
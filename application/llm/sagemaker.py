@@ -1,4 +1,5 @@
 from application.llm.base import BaseLLM
+from application.llm.clients import LLMClients, client_key
 from application.core.settings import settings
 import json
 import io
@@ -62,12 +63,18 @@ class SagemakerAPILLM(BaseLLM):
 
     def __init__(self, api_key=None, user_api_key=None, *args, **kwargs):
         import boto3
-
-        runtime = boto3.client(
-            "runtime.sagemaker",
-            aws_access_key_id="xxx",
-            aws_secret_access_key="xxx",
-            region_name="us-west-2",
+        from botocore.config import Config
+
+        # boto3 clients are thread safe; one per process keeps its connection pool
+        runtime = LLMClients.get_instance(
+            client_key("sagemaker"),
+            lambda: boto3.client(
+                "runtime.sagemaker",
+                aws_access_key_id="xxx",
+                aws_secret_access_key="xxx",
+                region_name="us-west-2",
+                config=Config(max_pool_connections=settings.LLM_HTTP_MAX_CONNECTIONS),
+            ),
         )
 
         super().__init__(*args, **kwargs)
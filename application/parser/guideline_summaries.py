@@ -0,0 +1,97 @@
+"""
+Summary tree for guideline sources, built once at ingest.
+
+Consecutive chunks of each file are grouped into sections and summarized;
+files with several sections also get a document summary rolled up from the
+section summaries. The summaries are stored on the source document, each with
+"summary_level" set to "section" or "document" and the hashes of the chunks
+it covers, so the retriever can pick the summaries covering the chunks it
+found instead of summarizing guideline chunks on every request.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from application.core.settings import settings
+from application.llm.llm_creator import LLMCreator
+from application.utils import get_hash, num_tokens_from_string
+
+SECTION_PROMPT = (
+    "You are an assistant that reads sustainability/ESG reporting guidelines.\n"
+    "Please summarize the key points of this section of the guidelines, keeping "
+    "the requirements, metrics and definitions related to emissions reporting.\n\n"
+    "GUIDELINES:\n"
+)
+
+DOCUMENT_PROMPT = (
+    "You are an assistant that reads sustainability/ESG reporting guidelines.\n"
+    "Below are summaries of the sections of one guideline document. Combine them "
+    "into a summary of the whole document, keeping the key requirements related "
+    "to emissions reporting.\n\n"
+    "SECTION SUMMARIES:\n"
+)
+
+
+def _summarize(llm, model, prompt, text):
+    summary = llm.gen(
+        model=model,
+        messages=[{"role": "system", "content": prompt + text}],
+        max_tokens=settings.GUIDELINE_SUMMARY_MAX_TOKENS,
+    )
+    return summary.strip()
+
+
+def _summary(text, title, level, chunks):
+    return {
+        "title": title,
+        "text": text,
+        "summary_level": level,
+        "token_count": num_tokens_from_string(text),
+        "chunks": [get_hash(chunk.page_content) for chunk in chunks],
+    }
+
+
+def build_guideline_summaries(docs, llm=None, model=None):
+    """Return section and document summaries for the given guideline chunks."""
+    if llm is None:
+        llm = LLMCreator.create_llm(settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=None)
+    model = model or settings.MODEL_NAME or "gpt-4o-mini"
+    section_size = settings.GUIDELINE_SECTION_CHUNKS
+
+    # consecutive chunks of the same file, in ingest order
+    files = {}
+    for doc in docs:
+        files.setdefault(doc.metadata.get("title", ""), []).append(doc)
+    sections = []
+    for title, file_docs in files.items():
+        for start in range(0, len(file_docs), section_size):
+            sections.append((title, file_docs[start:start + section_size]))
+
+    with ThreadPoolExecutor(max_workers=settings.GUIDELINE_SUMMARY_WORKERS) as executor:
+        section_texts = list(
+            executor.map(
+                lambda section: _summarize(
+                    llm, model, SECTION_PROMPT, "\n".join(d.page_content for d in section[1])
+                ),
+                sections,
+            )
+        )
+
+        summaries = []
+        by_file = {}
+        for (title, section_docs), text in zip(sections, section_texts):
+            number = len(by_file.setdefault(title, [])) + 1
+            by_file[title].append(text)
+            summaries.append(
+                _summary(text, f"{title} - section {number} summary", "section", section_docs)
+            )
+
+        multi_section = {title: texts for title, texts in by_file.items() if len(texts) > 1}
+        document_texts = executor.map(
+            lambda texts: _summarize(llm, model, DOCUMENT_PROMPT, "\n\n".join(texts)),
+            multi_section.values(),
+        )
+        for title, text in zip(multi_section, document_texts):
+            summaries.append(_summary(text, f"{title} - summary", "document", files[title]))
+
+    logging.info(f"Built {len(summaries)} guideline summaries for {len(files)} files")
+    return summaries
@@ -12,12 +12,16 @@ from application.vectorstore.vector_creator import VectorCreator
 # from langchain_community.embeddings import CohereEmbeddings
 
 
+# Number of chunks embedded and added to the store per call
+EMBEDDING_BATCH_SIZE = 32
+
+
 @retry(tries=10, delay=60)
-def store_add_texts_with_retry(store, i, id):
+def store_add_texts_with_retry(store, batch, id):
     # add source_id to the metadata
-    i.metadata["source_id"] = str(id)
-    store.add_texts([i.page_content], metadatas=[i.metadata])
-    # store_pine.add_texts([i.page_content], metadatas=[i.metadata])
+    for i in batch:
+        i.metadata["source_id"] = str(id)
+    store.add_texts([i.page_content for i in batch], metadatas=[i.metadata for i in batch])
 
 
 def call_openai_api(docs, folder_name, id, task_status):
@@ -51,25 +55,25 @@ def call_openai_api(docs, folder_name, id, task_status):
     # hf = HuggingFaceEmbeddings(model_name=model_name)
     # store = FAISS.from_documents(docs_test, hf)
     s1 = len(docs)
-    for i in tqdm(
-        docs,
+    for start in tqdm(
+        range(0, s1, EMBEDDING_BATCH_SIZE),
         desc="Embedding riuDocs",
-        unit="docs",
-        total=len(docs),
+        unit="batches",
         bar_format="{l_bar}{bar}| Time Left: {remaining}",
     ):
+        batch = docs[start:start + EMBEDDING_BATCH_SIZE]
         try:
             task_status.update_state(
                 state="PROGRESS", meta={"current": int((c1 / s1) * 100)}
             )
-            store_add_texts_with_retry(store, i, id)
+            store_add_texts_with_retry(store, batch, id)
         except Exception as e:
             print(e)
-            print("Error on ", i)
+            print("Error on batch starting at ", start)
             print("Saving progress")
             print(f"stopped at {c1} out of {len(docs)}")
             store.save_local(f"{folder_name}")
             break
-        c1 += 1
+        c1 += len(batch)
     if settings.VECTOR_STORE == "faiss":
         store.save_local(f"{folder_name}")
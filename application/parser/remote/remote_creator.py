@@ -1,17 +1,13 @@
-from application.parser.remote.sitemap_loader import SitemapLoader
-from application.parser.remote.crawler_loader import CrawlerLoader
-from application.parser.remote.web_loader import WebLoader
-from application.parser.remote.reddit_loader import RedditPostsLoaderRemote
-from application.parser.remote.github_loader import GitHubLoader
+from application.utils import import_string
 
 
 class RemoteCreator:
     loaders = {
-        "url": WebLoader,
-        "sitemap": SitemapLoader,
-        "crawler": CrawlerLoader,
-        "reddit": RedditPostsLoaderRemote,
-        "github": GitHubLoader,
+        "url": "application.parser.remote.web_loader.WebLoader",
+        "sitemap": "application.parser.remote.sitemap_loader.SitemapLoader",
+        "crawler": "application.parser.remote.crawler_loader.CrawlerLoader",
+        "reddit": "application.parser.remote.reddit_loader.RedditPostsLoaderRemote",
+        "github": "application.parser.remote.github_loader.GitHubLoader",
     }
 
     @classmethod
@@ -19,4 +15,6 @@ class RemoteCreator:
         loader_class = cls.loaders.get(type.lower())
         if not loader_class:
             raise ValueError(f"No LLM class found for type {type}")
+        if isinstance(loader_class, str):
+            loader_class = import_string(loader_class)
         return loader_class(*args, **kwargs)
@@ -0,0 +1,33 @@
+"""
+Choose how many retrieved chunks to use from their similarity scores.
+
+The vector store is searched for the requested number of chunks, capped at
+RETRIEVAL_MAX_K, so adaptive k only ever lowers a request's k; chunks are kept
+in rank order while their score is at least RETRIEVAL_MIN_SCORE, stopping at
+the first drop between neighbours larger than RETRIEVAL_SCORE_GAP (the elbow
+after the clearly relevant chunks).
+"""
+from application.core.settings import settings
+
+
+def select_by_score(docs, min_score=None, max_k=None, gap=None):
+    """
+    Docs are ranked dicts with an optional "score". Docs without a score
+    cannot be judged and are kept up to max_k.
+    """
+    min_score = settings.RETRIEVAL_MIN_SCORE if min_score is None else min_score
+    max_k = settings.RETRIEVAL_MAX_K if max_k is None else max_k
+    gap = settings.RETRIEVAL_SCORE_GAP if gap is None else gap
+
+    selected = []
+    previous = None
+    for doc in docs[:max_k]:
+        score = doc.get("score")
+        if score is not None:
+            if score < min_score:
+                break
+            if previous is not None and previous - score > gap:
+                break
+            previous = score
+        selected.append(doc)
+    return selected
@@ -1,9 +1,73 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
 from application.retriever.base import BaseRetriever
 from application.core.settings import settings
 from application.vectorstore.vector_creator import VectorCreator
 from application.llm.llm_creator import LLMCreator
+from application.vectorstore.base import get_embeddings
+from application.retriever.adaptive_k import select_by_score
+from application.retriever.context_compressor import compress_docs
+from application.retriever.context_packer import (
+    context_budget,
+    estimate_tokens,
+    pack_docs,
+    pack_history,
+)
+from application.retriever.summary_cache import (
+    get_guideline_summary,
+    guideline_summary_key,
+    load_guideline_summaries,
+    select_guideline_summaries,
+    set_guideline_summary,
+)
+
+# Bounded pool shared by all requests for the independent retrieval stages
+_executor = ThreadPoolExecutor(
+    max_workers=settings.RETRIEVER_MAX_WORKERS, thread_name_prefix="retriever"
+)
+# The guideline summary is an LLM call; it gets its own pool so that slow
+# summaries never hold up the vector searches of other requests
+_summary_executor = ThreadPoolExecutor(
+    max_workers=settings.RETRIEVER_SUMMARY_WORKERS, thread_name_prefix="retriever-summary"
+)
+
+# System prompt for the final call: instruct the LLM to use summarized guidelines + primary docs
+SYSTEM_PROMPT = (
+    "You are a system that uses the summarized guidelines and the retrieved primary documents to answer the user's question.\n"
+    "Only use the 'Summarized_Guidelines' doc as the source for any guideline-related information.\n"
+    "Do not invent guidelines not present in 'Summarized_Guidelines'.\n\n"
+    "Below are the documents you have access to:\n"
+    "{summaries}"
+)
 
-from application.utils import num_tokens_from_string
+
+def _to_source_docs(docs_temp, scores=None):
+    docs = []
+    for position, i in enumerate(docs_temp):
+        doc = {
+            "title": i.metadata.get(
+                "title", i.metadata.get("post_title", i.page_content)
+            ).split("/")[-1],
+            "text": i.page_content,
+            "source": i.metadata.get("source", "local"),
+        }
+        # token count stored at ingest, used for context packing
+        if "token_count" in i.metadata:
+            doc["token_count"] = i.metadata["token_count"]
+        # similarity to the question, used for adaptive k
+        if scores is not None and scores[position] is not None:
+            doc["score"] = round(float(scores[position]), 4)
+        docs.append(doc)
+    return docs
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
 
 
 class ClassicRAG(BaseRetriever):
@@ -18,6 +82,8 @@ class ClassicRAG(BaseRetriever):
         token_limit=150,
         gpt_model="docsgpt",
         user_api_key=None,
+        history_summary=None,
+        cache_replay=None,
     ):
         self.question = question
         self.primary_vectorstore = source.get('active_docs', None)
@@ -36,7 +102,25 @@ class ClassicRAG(BaseRetriever):
                 self.gpt_model, settings.DEFAULT_MAX_HISTORY
             )
         )
-        self.user_api_key = user_api_key        
+        self.user_api_key = user_api_key
+        self.history_summary = history_summary
+        self.cache_replay = cache_replay
+        self.timings = {}
+        self.context_tokens = {}
+        self._retrieval = None
+        self._summary = None
+        self._query_vector = None
+        self.retrieved_k = None
+        self._retrieval_lock = threading.Lock()
+        self._query_vector_lock = threading.Lock()
+
+    def _get_query_vector(self):
+        # embedded once per request; the vector searches and the compression share it
+        with self._query_vector_lock:
+            if self._query_vector is None:
+                embeddings = get_embeddings(settings.EMBEDDINGS_NAME, settings.EMBEDDINGS_KEY)
+                self._query_vector = embeddings.embed_query(self.question)
+        return self._query_vector
 
     def _get_data_from_vectorstore(self, vectorstore, k):
         if k == 0 or not vectorstore:
@@ -44,44 +128,81 @@ class ClassicRAG(BaseRetriever):
         docsearch = VectorCreator.create_vectorstore(
             settings.VECTOR_STORE, vectorstore, settings.EMBEDDINGS_KEY
         )
-        docs_temp = docsearch.search(self.question, k=k)
-        docs = [
-            {
-                "title": i.metadata.get(
-                    "title", i.metadata.get("post_title", i.page_content)
-                ).split("/")[-1],
-                "text": i.page_content,
-                "source": i.metadata.get("source", "local"),
-            }
-            for i in docs_temp
-        ]
-        return docs
+        # the query vector is only computed up front when compression needs it too
+        vector = self._get_query_vector() if settings.CONTEXT_COMPRESSION_ENABLED else None
+        scored = docsearch.search_with_scores(self.question, k=k, vector=vector)
+        return _to_source_docs([doc for doc, _ in scored], [score for _, score in scored])
 
-    def _retrieve_guidelines(self):
+    def _search_batch(self, vectorstore, questions, k, vectors, with_scores=False):
+        if k == 0 or not vectorstore:
+            return [[] for _ in questions]
+        docsearch = VectorCreator.create_vectorstore(
+            settings.VECTOR_STORE, vectorstore, settings.EMBEDDINGS_KEY
+        )
+        if with_scores:
+            results = docsearch.search_batch_with_scores(questions, k=k, vectors=vectors)
+            return [
+                _to_source_docs([doc for doc, _ in scored], [score for _, score in scored])
+                for scored in results
+            ]
+        results = docsearch.search_batch(questions, k=k, vectors=vectors)
+        return [_to_source_docs(docs_temp) for docs_temp in results]
+
+    def _retrieve_guideline_docs(self):
         """
-        Retrieve the exact guidelines from the additional vector store.
+        Retrieve the exact guideline chunks from the additional vector store.
         """
         if not self.additional_vectorstore:
             print("Additional vector store not initialized.")
-            return ""
+            return []
 
-        guidelines_docs = self._get_data_from_vectorstore(self.additional_vectorstore, k=2)
+        chunks = self._get_data_from_vectorstore(self.additional_vectorstore, k=2)
+        guidelines_docs = chunks + self._stored_summaries(chunks)
 
         if not guidelines_docs:
             print("No guidelines found in the additional vector store.")
-            return ""
+        return guidelines_docs
 
-        guidelines_text = "\n".join(doc["text"] for doc in guidelines_docs)
-        return guidelines_text
+    def _stored_summaries(self, chunks):
+        """
+        Summaries built for the guide source at ingest, read from the source
+        rather than searched for, so they are used whatever the chunks' scores.
+        """
+        summaries = load_guideline_summaries(self.additional_vectorstore)
+        if not summaries:
+            return []
+        return select_guideline_summaries(summaries, chunks, settings.GUIDELINE_SUMMARY_DOCS)
 
-    def _summarize_guidelines(self, guidelines_text):
+    def _retrieve_guidelines(self):
+        """
+        Retrieve the exact guidelines from the additional vector store.
         """
-        First LLM call: Summarize the guidelines_text.
+        return "\n".join(doc["text"] for doc in self._retrieve_guideline_docs())
+
+    def _summarize_guidelines(self, guidelines_docs):
+        """
+        First LLM call: Summarize the retrieved guideline chunks.
         This ensures that all guideline-related info is prepared before checking primary docs.
+        Summaries are cached per guide source version, chunk set and model.
+        Guide sources summarized at ingest need no LLM call here.
         """
+        precomputed = [doc["text"] for doc in guidelines_docs if "summary_level" in doc]
+        if precomputed:
+            return "\n\n".join(precomputed)
+
+        guidelines_text = "\n".join(doc["text"] for doc in guidelines_docs)
         if not guidelines_text.strip():
             return "No guidelines available."
 
+        cache_key = guideline_summary_key(
+            self.additional_vectorstore,
+            [doc["text"] for doc in guidelines_docs],
+            self.gpt_model,
+        )
+        summary = get_guideline_summary(cache_key)
+        if summary is not None:
+            return summary
+
         # Prompt for summarizing guidelines
         summary_prompt = (
             "You are an assistant that reads sustainability/ESG reporting guidelines.\n"
@@ -93,7 +214,9 @@ class ClassicRAG(BaseRetriever):
             settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=self.user_api_key
         )
         summary = llm.gen(model=self.gpt_model, messages=[{"role":"system","content":summary_prompt}])
-        return summary.strip()
+        summary = summary.strip()
+        set_guideline_summary(cache_key, summary)
+        return summary
 
     def _retrieve_primary_docs(self):
         """
@@ -102,77 +225,222 @@ class ClassicRAG(BaseRetriever):
         if not self.primary_vectorstore:
             print("Primary vector store not initialized.")
             return []
-        primary_docs = self._get_data_from_vectorstore(self.primary_vectorstore, self.chunks)
+        if self.chunks and settings.RETRIEVAL_ADAPTIVE_K:
+            # fetch up to the requested chunks (capped at RETRIEVAL_MAX_K) and keep
+            # as many as their scores justify
+            max_k = min(self.chunks, settings.RETRIEVAL_MAX_K)
+            primary_docs = select_by_score(
+                self._get_data_from_vectorstore(self.primary_vectorstore, max_k), max_k=max_k
+            )
+        else:
+            primary_docs = self._get_data_from_vectorstore(self.primary_vectorstore, self.chunks)
+        self.retrieved_k = len(primary_docs)
         return primary_docs
 
+    def _compress_primary_docs(self, primary_docs):
+        """
+        Keep only the sentences of the primary docs closest to the question,
+        up to CONTEXT_COMPRESSION_TOKENS. The guideline summary is already
+        condensed and is left as is.
+        """
+        if not settings.CONTEXT_COMPRESSION_ENABLED:
+            return primary_docs
+        embeddings = get_embeddings(settings.EMBEDDINGS_NAME, settings.EMBEDDINGS_KEY)
+        return compress_docs(primary_docs, self._get_query_vector(), embeddings)
+
+    def _timed(self, stage, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timings[stage] = round(time.perf_counter() - start, 4)
+
+    def _start_retrieval(self):
+        """
+        Start the guideline and primary vector searches (in parallel) once per
+        instance. gen() and search() both read these results, so a request never
+        runs the same vector search twice.
+        """
+        with self._retrieval_lock:
+            if self._retrieval is None:
+                self._retrieval_start = time.perf_counter()
+                self._retrieval = {
+                    "guidelines": _executor.submit(
+                        self._timed, "guideline_retrieval", self._retrieve_guideline_docs
+                    ),
+                    "primary": _executor.submit(
+                        self._timed, "primary_retrieval", self._retrieve_primary_docs
+                    ),
+                }
+        return self._retrieval
+
+    def _start_summary(self, retrieval):
+        """
+        Summarize the guidelines once their retrieval is done. The summary is
+        chained to the retrieval future, so no thread waits for it.
+        """
+        with self._retrieval_lock:
+            if self._summary is None:
+                summary = self._summary = Future()
+
+                def summarize(guidelines):
+                    try:
+                        result = self._timed(
+                            "guideline_summary", self._summarize_guidelines, guidelines.result()
+                        )
+                    except Exception as e:
+                        summary.set_exception(e)
+                    else:
+                        summary.set_result(result)
+
+                retrieval["guidelines"].add_done_callback(
+                    lambda guidelines: _summary_executor.submit(summarize, guidelines)
+                )
+        return self._summary
+
+    def prime(self, guideline_docs, primary_docs, summary=None):
+        """
+        Use retrieval results computed elsewhere (e.g. for a whole batch of
+        questions) instead of searching the vector stores again.
+        """
+        with self._retrieval_lock:
+            self._retrieval_start = time.perf_counter()
+            self.retrieved_k = len(primary_docs)
+            self._retrieval = {
+                "guidelines": _completed(guideline_docs),
+                "primary": _completed(primary_docs),
+            }
+            if summary is not None:
+                self._summary = _completed(summary)
+
+    @classmethod
+    def create_batch(cls, questions, source, **kwargs):
+        """
+        Retrievers for a batch of questions against the same sources. The
+        questions are embedded once and all questions share one guideline
+        summary, built from the guideline chunks that rank best across the
+        batch. FAISS searches all questions in one call; other stores search
+        question by question, reusing the batch's embeddings.
+        """
+        retrievers = [cls(question, source, **kwargs) for question in questions]
+        if not retrievers:
+            return retrievers
+        first = retrievers[0]
+        vectors = get_embeddings(settings.EMBEDDINGS_NAME, settings.EMBEDDINGS_KEY).embed_documents(
+            list(questions)
+        )
+        if first.chunks and settings.RETRIEVAL_ADAPTIVE_K:
+            # same adaptive k as _retrieve_primary_docs, per question
+            max_k = min(first.chunks, settings.RETRIEVAL_MAX_K)
+            primary = [
+                select_by_score(docs, max_k=max_k)
+                for docs in first._search_batch(
+                    first.primary_vectorstore, questions, max_k, vectors, with_scores=True
+                )
+            ]
+        else:
+            primary = first._search_batch(first.primary_vectorstore, questions, first.chunks, vectors)
+        guidelines = first._search_batch(first.additional_vectorstore, questions, 2, vectors)
+
+        counts = Counter()
+        guideline_docs = {}
+        for docs in guidelines:
+            for doc in docs:
+                counts[doc["text"]] += 1
+                guideline_docs.setdefault(doc["text"], doc)
+        guideline_docs = [
+            guideline_docs[text]
+            for text, _ in counts.most_common(settings.BATCH_GUIDELINE_CHUNKS)
+        ]
+        guideline_docs += first._stored_summaries(guideline_docs)
+        summary = first._summarize_guidelines(guideline_docs)
+
+        for retriever, primary_docs in zip(retrievers, primary):
+            retriever.prime(guideline_docs, primary_docs, summary)
+        return retrievers
+
     def gen(self):
-        # Step 1: Retrieve guidelines
-        guidelines_text = self._retrieve_guidelines()
+        # Steps 1 and 3 are independent vector searches, so they run in parallel;
+        # Step 2 (guideline summary) starts as soon as step 1 is done and overlaps
+        # with the primary retrieval.
+        retrieval = self._start_retrieval()
+        summary_future = self._start_summary(retrieval)
 
-        # Step 2: Summarize the guidelines with the first LLM call
-        summarized_guidelines = self._summarize_guidelines(guidelines_text)
+        # Yield primary sources as soon as they are ready
+        primary_docs = retrieval["primary"].result()
+        for doc in primary_docs:
+            yield {"source": doc}
+        # overlaps with the guideline summary if that is still running
+        prompt_docs = self._timed("compression", self._compress_primary_docs, primary_docs)
 
-        # Step 3: Retrieve primary documents
-        primary_docs = self._retrieve_primary_docs()
+        summarized_guidelines = summary_future.result()
+        self.timings["retrieval_total"] = round(time.perf_counter() - self._retrieval_start, 4)
 
         # Combine summarized guidelines and primary docs
         # We now have a prepared guidelines summary and the primary data
-        docs = primary_docs.copy()
+        docs = []
         if summarized_guidelines:
-            docs.append({
+            summary_doc = {
                 "title": "Summarized_Guidelines",
                 "text": summarized_guidelines,
                 "source": "guidelines_summary"
-            })
-
-        # Yield sources before the second call
-        for doc in docs:
-            yield {"source": doc}
+            }
+            docs.append(summary_doc)
+            yield {"source": summary_doc}
+        docs.extend(prompt_docs)
 
         # Step 4: Prepare the second LLM call
-        # Join all docs
-        docs_together = "\n".join([f"Title: {doc['title']}\nText: {doc['text']}" for doc in docs])
+        # The summary and the best-ranked primary docs are packed into the model's
+        # context window first, recent history gets what is left (up to token_limit)
+        question = self.question + "\n\nUse the primary documents to determine actual emissions data if available."
+        budget = context_budget(self.gpt_model, SYSTEM_PROMPT, question)
+        docs, docs_tokens = pack_docs(docs, budget)
+        history_budget = min(self.token_limit, budget - docs_tokens)
 
-        # System prompt for second call: instruct the LLM to use summarized guidelines + primary docs
-        system_prompt = (
-            "You are a system that uses the summarized guidelines and the retrieved primary documents to answer the user's question.\n"
-            "Only use the 'Summarized_Guidelines' doc as the source for any guideline-related information.\n"
-            "Do not invent guidelines not present in 'Summarized_Guidelines'.\n\n"
-            "Below are the documents you have access to:\n"
-            "{summaries}"
-        )
+        # Turns covered by the conversation's rolling summary are replaced by it
+        chat_history = self.chat_history
+        summary_message = None
+        if self.history_summary and len(chat_history) >= self.history_summary["turns"]:
+            summary_message = "Summary of the earlier conversation:\n" + self.history_summary["text"]
+            history_budget -= estimate_tokens(summary_message)
+            chat_history = chat_history[self.history_summary["turns"]:]
+        history, history_tokens = pack_history(chat_history, max(history_budget, 0))
+        self.context_tokens = {"docs": docs_tokens, "history": history_tokens}
 
-        p_chat_combine = system_prompt.replace("{summaries}", docs_together)
+        # Join all docs
+        docs_together = "\n".join([f"Title: {doc['title']}\nText: {doc['text']}" for doc in docs])
 
-        messages_combine = [
-            {"role": "system", "content": p_chat_combine},
-            {"role": "user", "content": self.question + "\n\nUse the primary documents to determine actual emissions data if available."}
-        ]
+        p_chat_combine = SYSTEM_PROMPT.replace("{summaries}", docs_together)
 
-        # Add chat history if needed
-        if len(self.chat_history) > 1:
-            tokens_current_history = 0
-            for i in self.chat_history:
-                if "prompt" in i and "response" in i:
-                    tokens_batch = num_tokens_from_string(i["prompt"]) + num_tokens_from_string(i["response"])
-                    if tokens_current_history + tokens_batch < self.token_limit:
-                        tokens_current_history += tokens_batch
-                        messages_combine.append({"role": "user", "content": i["prompt"]})
-                        messages_combine.append({"role": "system", "content": i["response"]})
+        messages_combine = [{"role": "system", "content": p_chat_combine}]
+        if summary_message:
+            messages_combine.append({"role": "system", "content": summary_message})
+        for i in history:
+            messages_combine.append({"role": "user", "content": i["prompt"]})
+            messages_combine.append({"role": "system", "content": i["response"]})
+        messages_combine.append({"role": "user", "content": question})
 
         # Step 5: Final LLM call for the answer
         llm = LLMCreator.create_llm(
-            settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=self.user_api_key
+            settings.LLM_NAME,
+            api_key=settings.API_KEY,
+            user_api_key=self.user_api_key,
+            cache_replay=self.cache_replay,
         )
         completion = llm.gen_stream(model=self.gpt_model, messages=messages_combine)
         for line in completion:
             yield {"answer": str(line)}
 
     def search(self):
-        # Returns combined data for debugging or other purposes
-        guidelines_text = self._retrieve_guidelines()
-        primary_docs = self._retrieve_primary_docs()
-        combined_docs = primary_docs.copy()
+        # Returns combined data for debugging or other purposes.
+        # Reuses the retrieval started by gen(); docs are copied so callers can
+        # truncate them without touching the text sent to the LLM.
+        retrieval = self._start_retrieval()
+        guidelines_text = "\n".join(
+            doc["text"] for doc in retrieval["guidelines"].result() if "summary_level" not in doc
+        )
+        primary_docs = retrieval["primary"].result()
+        combined_docs = [dict(doc) for doc in primary_docs]
         if guidelines_text:
             combined_docs.append({
                 "title": "Guidelines_doc",
@@ -188,7 +456,10 @@ class ClassicRAG(BaseRetriever):
             "chat_history": self.chat_history,
             "prompt": self.prompt,
             "chunks": self.chunks,
+            "retrieved_k": self.retrieved_k,
             "token_limit": self.token_limit,
             "gpt_model": self.gpt_model,
-            "user_api_key": self.user_api_key
+            "user_api_key": self.user_api_key,
+            "timings": self.timings,
+            "context_tokens": self.context_tokens
         }
@@ -0,0 +1,92 @@
+"""
+Extractive compression of retrieved chunks before they are put in the prompt.
+
+Chunks are split into sentences, all sentences are embedded in one batch and
+scored against the question embedding. The best sentences (with their
+neighbours for context) are kept up to a token budget, in their original
+order; each compressed doc keeps its title and source.
+"""
+import re
+
+import numpy as np
+
+from application.core.settings import settings
+from application.retriever.context_packer import doc_tokens, estimate_tokens
+from application.vectorstore.base import as_float32_array
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+GAP = " ... "
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_SPLIT.split(text) if sentence.strip()]
+
+
+def _normalize_rows(vectors):
+    vectors = as_float32_array(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _join_kept(sentences, kept):
+    parts = []
+    previous = None
+    for i in sorted(kept):
+        if previous is not None:
+            parts.append(" " if i == previous + 1 else GAP)
+        parts.append(sentences[i])
+        previous = i
+    return "".join(parts)
+
+
+def compress_docs(docs, query_vector, embeddings, budget=None, window=None):
+    """
+    Return copies of docs reduced to the sentences most similar to the query,
+    using at most `budget` tokens in total. Sentences unrelated to the query
+    (similarity <= 0) are never kept. Docs already within the budget are
+    returned unchanged without embedding anything; docs with no sentence kept
+    are dropped.
+    """
+    budget = settings.CONTEXT_COMPRESSION_TOKENS if budget is None else budget
+    window = settings.CONTEXT_COMPRESSION_WINDOW if window is None else window
+    if not docs or sum(doc_tokens(doc) for doc in docs) <= budget:
+        return docs
+
+    doc_sentences = [split_sentences(doc["text"]) for doc in docs]
+    flat = [(d, i) for d, sentences in enumerate(doc_sentences) for i in range(len(sentences))]
+    if not flat:
+        return docs
+    vectors = _normalize_rows(
+        embeddings.embed_documents([doc_sentences[d][i] for d, i in flat])
+    )
+    query = _normalize_rows(np.reshape(query_vector, (1, -1)))[0]
+    scores = vectors @ query
+
+    kept = [set() for _ in docs]
+    used = 0
+    for position in np.argsort(-scores, kind="stable"):
+        if scores[position] <= 0:
+            break
+        d, i = flat[position]
+        # the sentence itself first, then its neighbours while they fit
+        for j in [i] + [n for k in range(1, window + 1) for n in (i - k, i + k)]:
+            if j < 0 or j >= len(doc_sentences[d]) or j in kept[d]:
+                continue
+            tokens = estimate_tokens(doc_sentences[d][j])
+            if used + tokens > budget:
+                if j == i:
+                    break
+                continue
+            kept[d].add(j)
+            used += tokens
+        if used >= budget:
+            break
+
+    compressed = []
+    for doc, sentences, doc_kept in zip(docs, doc_sentences, kept):
+        if not doc_kept:
+            continue
+        text = _join_kept(sentences, doc_kept)
+        compressed.append({**doc, "text": text, "token_count": estimate_tokens(text)})
+    return compressed
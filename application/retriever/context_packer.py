@@ -0,0 +1,70 @@
+"""
+Fit retrieved chunks and chat history into a model's context window.
+
+Token counts come from the chunk metadata (computed at ingest) and from the
+counts stored with each conversation query, so packing never calls the
+tokenizer; text without a stored count is estimated from its length.
+"""
+from application.core.settings import settings
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def doc_tokens(doc):
+    token_count = doc.get("token_count")
+    if token_count is None:
+        return estimate_tokens(doc["text"])
+    return int(token_count)
+
+
+def query_tokens(query):
+    prompt_tokens = query.get("prompt_tokens")
+    response_tokens = query.get("response_tokens")
+    if prompt_tokens is None:
+        prompt_tokens = estimate_tokens(query["prompt"])
+    if response_tokens is None:
+        response_tokens = estimate_tokens(query["response"])
+    return int(prompt_tokens) + int(response_tokens)
+
+
+def context_budget(model, *texts):
+    """Tokens left for chunks and history once the fixed prompt parts and the answer are reserved."""
+    limit = int(settings.MODEL_TOKEN_LIMITS.get(model, settings.DEFAULT_CONTEXT_LIMIT))
+    used = sum(estimate_tokens(text) for text in texts)
+    return max(limit - settings.RESPONSE_TOKEN_RESERVE - used, 0)
+
+
+def pack_docs(docs, budget):
+    """
+    Keep docs in rank order while they fit in the budget; a doc that does not
+    fit is skipped so smaller lower-ranked ones can still be used.
+    Returns the packed docs and the tokens they use.
+    """
+    packed = []
+    used = 0
+    for doc in docs:
+        tokens = doc_tokens(doc)
+        if used + tokens <= budget:
+            packed.append(doc)
+            used += tokens
+    return packed, used
+
+
+def pack_history(chat_history, budget):
+    """Most recent prompt/response pairs that fit in the budget, oldest first."""
+    packed = []
+    used = 0
+    for query in reversed(chat_history):
+        if not isinstance(query, dict) or "prompt" not in query or "response" not in query:
+            continue
+        tokens = query_tokens(query)
+        if used + tokens > budget:
+            break
+        packed.append(query)
+        used += tokens
+    packed.reverse()
+    return packed, used
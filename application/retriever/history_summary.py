@@ -0,0 +1,72 @@
+"""
+Rolling summary of long conversations.
+
+The most recent HISTORY_RECENT_TURNS turns are sent to the LLM verbatim; older
+turns are folded into a running summary stored on the conversation as
+{"text": ..., "turns": <number of queries covered>}. Folding runs in the
+background after a turn is saved, so a request only reads the summary.
+"""
+from bson.objectid import ObjectId
+
+from application.core.mongo_db import MongoDB
+from application.core.settings import settings
+from application.llm.llm_creator import LLMCreator
+
+mongo = MongoDB.get_client()
+db = mongo["docsgpt"]
+conversations_collection = db["conversations"]
+
+# A prompt of its own: the chat answer prompts ask for short answers, which
+# would squeeze the summary
+SUMMARY_SYSTEM_PROMPT = (
+    "You summarise a conversation between a user and an assistant about sustainability "
+    "and ESG reporting, so that the summary can replace the conversation as context for "
+    "later questions.\n"
+    "Keep the user's goals, companies, figures, reporting frameworks and conclusions; "
+    "drop greetings and repetition. Respond ONLY with the summary."
+)
+
+
+def _fold(llm, model, summary_text, queries):
+    context = ""
+    if summary_text:
+        context += f"Summary of the conversation so far:\n{summary_text}\n\n"
+    context += "\n\n".join(f"User: {q['prompt']}\nAI: {q['response']}" for q in queries)
+    messages = [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": context},
+    ]
+    return llm.gen(model=model, messages=messages, max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS).strip()
+
+
+def update_history_summary(conversation_id, model, user_api_key=None):
+    """Fold the turns that left the recent window into the conversation summary."""
+    doc = conversations_collection.find_one(
+        {"_id": ObjectId(conversation_id)},
+        {"queries.prompt": 1, "queries.response": 1, "summary": 1},
+    )
+    if not doc:
+        return None
+    queries = doc.get("queries", [])
+    summary = doc.get("summary")
+    covered = summary["turns"] if summary else 0
+    fold_until = len(queries) - settings.HISTORY_RECENT_TURNS
+    if fold_until <= covered:
+        return summary
+
+    llm = LLMCreator.create_llm(
+        settings.LLM_NAME, api_key=settings.API_KEY, user_api_key=user_api_key
+    )
+    text = summary["text"] if summary else ""
+    step = settings.HISTORY_SUMMARY_BATCH_TURNS
+    for start in range(covered, fold_until, step):
+        text = _fold(llm, model, text, queries[start:min(start + step, fold_until)])
+
+    new_summary = {"text": text, "turns": fold_until}
+    # only written if no other worker updated the summary in the meantime
+    current = {"summary.turns": covered} if summary else {"summary": {"$exists": False}}
+    conversations_collection.update_one(
+        {"_id": ObjectId(conversation_id), **current},
+        {"$set": {"summary": new_summary}},
+    )
+    return new_summary
@@ -1,16 +1,22 @@
-from application.retriever.classic_rag import ClassicRAG
-
+from application.utils import import_string
 
 
 class RetrieverCreator:
     retrievers = {
-        'classic': ClassicRAG,
-        'default': ClassicRAG
+        'classic': "application.retriever.classic_rag.ClassicRAG",
+        'default': "application.retriever.classic_rag.ClassicRAG"
     }
 
     @classmethod
-    def create_retriever(cls, type, *args, **kwargs):
+    def get_retriever_class(cls, type):
         retiever_class = cls.retrievers.get(type.lower())
         if not retiever_class:
             raise ValueError(f"No retievers class found for type {type}")
-        return retiever_class(*args, **kwargs)
\ No newline at end of file
+        if isinstance(retiever_class, str):
+            retiever_class = import_string(retiever_class)
+        return retiever_class
+
+    @classmethod
+    def create_retriever(cls, type, *args, **kwargs):
+        retiever_class = cls.get_retriever_class(type)
+        return retiever_class(*args, **kwargs)
@@ -0,0 +1,194 @@
+import json
+import logging
+import time
+
+import numpy as np
+import redis
+
+from application.cache import LocalCache, get_redis_instance, get_source_version
+from application.core.settings import settings
+from application.retriever.base import BaseRetriever
+from application.utils import get_hash
+from application.vectorstore.base import as_float32_array, get_embeddings
+
+logger = logging.getLogger(__name__)
+
+# In-process copy of each scope's index so a lookup does not fetch every
+# stored vector from Redis; dropped whenever this process stores an answer.
+_local_indexes = LocalCache(maxsize=256, ttl=settings.SEMANTIC_CACHE_LOCAL_TTL)
+
+# Drops the oldest entries beyond ARGV[1] from both keys of a scope at once
+_TRIM_SCRIPT = """
+local excess = redis.call('LLEN', KEYS[2]) - tonumber(ARGV[1])
+if excess <= 0 then
+    return 0
+end
+local blob = redis.call('GETRANGE', KEYS[1], excess * tonumber(ARGV[2]), -1)
+redis.call('SET', KEYS[1], blob, 'EX', ARGV[3])
+redis.call('LTRIM', KEYS[2], excess, -1)
+return excess
+"""
+
+
+def semantic_cache_scope(source, prompt_id, model, chunks):
+    """
+    Answers are only reused for the same sources, prompt, model and chunk
+    count. Source versions are part of the scope, so re-indexing a source
+    invalidates them.
+    """
+    active_docs = source.get("active_docs")
+    guide_docs = source.get("guide_docs")
+    combined = json.dumps(
+        [
+            active_docs,
+            get_source_version(active_docs),
+            guide_docs,
+            get_source_version(guide_docs),
+            prompt_id,
+            model,
+            chunks,
+            settings.EMBEDDINGS_NAME,
+        ],
+        default=str,
+    )
+    return f"semantic_cache:{get_hash(combined)}"
+
+
+def _normalize(vector):
+    vector = as_float32_array(vector).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Per-request handle on the semantic answer cache. Each scope is a small
+    vector index in Redis: the normalized question embeddings concatenated in
+    one float32 blob, plus a list with the matching answers and sources.
+    """
+
+    def __init__(self, source, prompt_id, model, chunks):
+        self.scope = semantic_cache_scope(source, prompt_id, model, chunks)
+        self.vectors_key = f"{self.scope}:vectors"
+        self.entries_key = f"{self.scope}:entries"
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD
+        self._question = None
+        self._question_vector = None
+
+    def _embed(self, question):
+        if self._question != question:
+            embeddings = get_embeddings(settings.EMBEDDINGS_NAME, settings.EMBEDDINGS_KEY)
+            self._question_vector = _normalize(embeddings.embed_query(question))
+            self._question = question
+        return self._question_vector
+
+    def _load_index(self, redis_client):
+        index = _local_indexes.get(self.scope)
+        if index is not None:
+            return index
+        pipe = redis_client.pipeline()
+        pipe.get(self.vectors_key)
+        pipe.lrange(self.entries_key, 0, -1)
+        blob, raw_entries = pipe.execute()
+        entries = [json.loads(entry) for entry in raw_entries]
+        if not blob or not entries:
+            index = (None, [])
+        else:
+            vectors = np.frombuffer(blob, dtype=np.float32).reshape(len(entries), -1)
+            index = (vectors, entries)
+        _local_indexes.set(self.scope, index)
+        return index
+
+    def lookup(self, question):
+        """Return the cached entry for a near-duplicate question, or None."""
+        redis_client = get_redis_instance()
+        if not redis_client:
+            return None
+        try:
+            vectors, entries = self._load_index(redis_client)
+            if vectors is None:
+                return None
+            query = self._embed(question)
+            if vectors.shape[1] != query.shape[0]:
+                return None
+            scores = vectors @ query
+            oldest = time.time() - settings.SEMANTIC_CACHE_TTL
+            for position in np.argsort(scores)[::-1]:
+                if scores[position] < self.threshold:
+                    break
+                entry = dict(entries[position])
+                if entry["ts"] >= oldest:
+                    entry["score"] = float(scores[position])
+                    return entry
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+        except Exception as e:
+            logger.error(f"Semantic cache lookup failed: {e}")
+        return None
+
+    def store(self, question, answer, sources, search_docs):
+        if not answer.strip():
+            return
+        redis_client = get_redis_instance()
+        if not redis_client:
+            return
+        try:
+            vector = self._embed(question)
+            entry = json.dumps(
+                {
+                    "question": question,
+                    "answer": answer,
+                    "sources": sources,
+                    "search": search_docs,
+                    "ts": time.time(),
+                },
+                default=str,
+            )
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.append(self.vectors_key, vector.tobytes())
+            pipe.rpush(self.entries_key, entry)
+            pipe.expire(self.vectors_key, settings.SEMANTIC_CACHE_TTL)
+            pipe.expire(self.entries_key, settings.SEMANTIC_CACHE_TTL)
+            _, count, _, _ = pipe.execute()
+            if count > settings.SEMANTIC_CACHE_MAX_ENTRIES:
+                self._trim(redis_client, vector.nbytes)
+            _local_indexes.delete(self.scope)
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+        except Exception as e:
+            logger.error(f"Semantic cache store failed: {e}")
+
+    def _trim(self, redis_client, row_bytes):
+        # One script, so a concurrent store() cannot append between reading the
+        # vectors and writing them back, which would misalign rows and entries
+        redis_client.register_script(_TRIM_SCRIPT)(
+            keys=[self.vectors_key, self.entries_key],
+            args=[settings.SEMANTIC_CACHE_MAX_ENTRIES, row_bytes, settings.SEMANTIC_CACHE_TTL],
+        )
+
+
+class CachedAnswerRetriever(BaseRetriever):
+    """Replays a semantic cache hit through the regular retriever interface."""
+
+    def __init__(self, question, entry, params=None):
+        self.question = question
+        self.entry = entry
+        self.params = params or {}
+
+    def gen(self):
+        for doc in self.entry["sources"]:
+            yield {"source": dict(doc)}
+        yield {"answer": self.entry["answer"]}
+
+    def search(self):
+        return [dict(doc) for doc in self.entry["search"]]
+
+    def get_params(self):
+        return {
+            **self.params,
+            "question": self.question,
+            "semantic_cache": {
+                "question": self.entry["question"],
+                "score": self.entry.get("score"),
+            },
+        }
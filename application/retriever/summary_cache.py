@@ -0,0 +1,99 @@
+import json
+import logging
+
+import redis
+from bson.objectid import ObjectId
+
+from application.cache import LocalCache, cached_metadata, get_redis_instance, get_source_version
+from application.core.mongo_db import MongoDB
+from application.core.settings import settings
+from application.utils import get_hash
+
+logger = logging.getLogger(__name__)
+
+mongo = MongoDB.get_client()
+db = mongo["docsgpt"]
+sources_collection = db["sources"]
+
+# In-process front for the Redis cache; entries are keyed by source version so
+# they become unreachable as soon as the guide source is re-uploaded or synced.
+_local_summaries = LocalCache(
+    maxsize=settings.GUIDELINE_SUMMARY_CACHE_SIZE,
+    ttl=settings.GUIDELINE_SUMMARY_LOCAL_TTL,
+)
+
+
+def guideline_summary_key(source_id, chunk_texts, model):
+    chunk_ids = sorted(get_hash(text) for text in chunk_texts)
+    version = get_source_version(source_id)
+    combined = json.dumps([source_id, version, chunk_ids, model])
+    return f"guideline_summary:{get_hash(combined)}"
+
+
+def get_guideline_summary(key):
+    summary = _local_summaries.get(key)
+    if summary is not None:
+        return summary
+    redis_client = get_redis_instance()
+    if redis_client:
+        try:
+            cached = redis_client.get(key)
+            if cached:
+                summary = cached.decode("utf-8")
+                _local_summaries.set(key, summary)
+                return summary
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+    return None
+
+
+def set_guideline_summary(key, summary):
+    _local_summaries.set(key, summary)
+    redis_client = get_redis_instance()
+    if redis_client:
+        try:
+            redis_client.set(key, summary, ex=settings.GUIDELINE_SUMMARY_CACHE_TTL)
+        except redis.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+
+
+def load_guideline_summaries(source_id):
+    """The summaries stored on a guide source at ingest ([] if it has none)."""
+    if not source_id or not ObjectId.is_valid(source_id):
+        return []
+
+    def load():
+        doc = sources_collection.find_one({"_id": ObjectId(source_id)}, {"guideline_summaries": 1})
+        return (doc or {}).get("guideline_summaries") or []
+
+    return cached_metadata("guideline_summaries", source_id, load)
+
+
+def select_guideline_summaries(summaries, chunks, limit):
+    """
+    Pick up to limit stored summaries for the retrieved guideline chunks:
+    the section summaries covering the best-ranked chunks first, then their
+    document summaries. If none covers them, document summaries come first.
+    """
+    ranks = {}
+    for rank, doc in enumerate(chunks):
+        ranks.setdefault(get_hash(doc["text"]), rank)
+    covering = []
+    for summary in summaries:
+        rank = min((ranks[chunk] for chunk in summary["chunks"] if chunk in ranks), default=None)
+        if rank is not None:
+            covering.append((summary["summary_level"] != "section", rank, summary))
+    if covering:
+        selected = [summary for *_, summary in sorted(covering, key=lambda item: item[:2])]
+    else:
+        selected = sorted(summaries, key=lambda summary: summary["summary_level"] != "document")
+    return [
+        {
+            "title": summary["title"],
+            "text": summary["text"],
+            "source": "guidelines",
+            "summary_level": summary["summary_level"],
+            "token_count": summary["token_count"],
+        }
+        for summary in selected[:limit]
+    ]
@@ -0,0 +1,266 @@
+"""
+Single-flight coalescing of identical in-flight LLM calls.
+
+The LLM cache is only written once an answer is complete, so identical
+questions arriving together all miss it. Calls with the same cache key are
+coalesced instead: the first one (the leader) calls the provider and every
+concurrent caller receives the same chunks as they are produced.
+
+- In a process, callers subscribe to one shared Flight.
+- Across workers, the leader takes a Redis lock for the key and appends the
+  chunks to a Redis stream; a worker that finds the lock taken reads the
+  stream instead of calling the provider. If the leader fails or stops
+  publishing (its lock is deleted or expires) before the first chunk, the
+  follower calls the provider itself.
+
+A flight is produced on its own thread and answers every subscriber, so it
+outlives the client that started it. Once no subscriber in this process is
+left, the producer stops and closes the provider call (releasing a local
+model and cancelling its generation). Nothing is cached for such a flight,
+as the cache is only written for a client that read the whole answer. Other
+workers following it call the provider themselves, or fail if they already
+received part of the answer.
+"""
+import logging
+import threading
+import time
+
+import redis
+
+from application.cache import get_redis_instance, llm_cache_key
+from application.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class LeaderLost(Exception):
+    """The worker leading a flight stopped publishing."""
+
+
+class FlightAbandoned(Exception):
+    """Every subscriber left the flight before it was done."""
+
+
+class Flight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._cond = threading.Condition()
+
+    def join(self):
+        """Count a new subscriber; False if the flight was already abandoned."""
+        with self._cond:
+            if self.abandoned:
+                return False
+            self.subscribers += 1
+            return True
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """All chunks of the flight, from the first one, as they arrive (after join())."""
+        position = 0
+        try:
+            while True:
+                with self._cond:
+                    while position >= len(self.chunks) and not self.done:
+                        self._cond.wait()
+                    chunks = self.chunks[position:]
+                    position = len(self.chunks)
+                    done, error = self.done, self.error
+                yield from chunks
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                if not self.subscribers and not self.done:
+                    self.abandoned = True
+
+
+def _join_flight(key):
+    """Join the flight for the key in this process; returns (flight, is_leader)."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None and flight.join():
+            return flight, False
+        flight = _flights[key] = Flight()
+        flight.join()
+        return flight, True
+
+
+def _leave_flight(key, flight):
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+
+
+class RedisFlight:
+    """The cross-worker side of a flight: a lock plus a stream of chunks."""
+
+    def __init__(self, redis_client, key):
+        self.redis = redis_client
+        self.lock_key = f"single_flight:{key}:lock"
+        self.stream_key = f"single_flight:{key}:stream"
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def try_lead(self):
+        return bool(
+            self.redis.set(self.lock_key, 1, nx=True, ex=settings.LLM_SINGLE_FLIGHT_LOCK_TTL)
+        )
+
+    def publish(self, chunk):
+        # chunks are sent in small frames rather than one XADD per token
+        self._buffer.append(chunk)
+        if time.monotonic() - self._last_flush >= settings.LLM_SINGLE_FLIGHT_FLUSH_INTERVAL:
+            self._flush()
+
+    def _flush(self, final=None):
+        pipe = self.redis.pipeline()
+        if self._buffer:
+            pipe.xadd(self.stream_key, {"c": "".join(self._buffer)})
+            self._buffer = []
+        if final is not None:
+            pipe.xadd(self.stream_key, final)
+            # keep the finished flight briefly for workers that just missed it
+            ttl = settings.LLM_SINGLE_FLIGHT_DONE_TTL
+        else:
+            ttl = settings.LLM_SINGLE_FLIGHT_LOCK_TTL
+        pipe.expire(self.stream_key, ttl)
+        pipe.expire(self.lock_key, ttl)
+        pipe.execute()
+        self._last_flush = time.monotonic()
+
+    def finish(self, error=None):
+        if error is None:
+            self._flush(final={"d": 1})
+            return
+        # a failed flight is dropped rather than kept for DONE_TTL: followers
+        # that have no chunk yet find the lock gone and call the provider
+        # themselves, and the next request leads a new flight
+        self.redis.delete(self.stream_key, self.lock_key)
+
+    def follow(self):
+        last_id = "0-0"
+        while True:
+            response = self.redis.xread({self.stream_key: last_id}, block=1000, count=100)
+            if not response:
+                if not self.redis.exists(self.lock_key):
+                    raise LeaderLost()
+                continue
+            for entry_id, fields in response[0][1]:
+                last_id = entry_id
+                if b"c" in fields:
+                    yield fields[b"c"].decode("utf-8")
+                else:
+                    return
+
+
+def _chunks(call, redis_flight, leading):
+    """The chunks of a flight this process leads: from the provider or from another worker."""
+    if redis_flight is None or leading:
+        yield from call()
+        return
+    started = False
+    try:
+        for chunk in redis_flight.follow():
+            started = True
+            yield chunk
+    except LeaderLost:
+        if started:
+            raise
+        logger.warning("Single-flight leader in another worker was lost, calling the LLM")
+        yield from call()
+
+
+def _produce(key, flight, chunks, redis_flight, leading):
+    publishing = redis_flight is not None and leading
+    error = None
+    try:
+        for chunk in chunks:
+            if flight.abandoned:
+                # closing the generator closes the provider call
+                chunks.close()
+                error = FlightAbandoned()
+                break
+            flight.publish(chunk)
+            if publishing:
+                try:
+                    redis_flight.publish(chunk)
+                except redis.RedisError as e:
+                    # other workers see the lock expire; this process carries on
+                    logger.error(f"Redis connection error: {e}")
+                    publishing = False
+    except Exception as e:
+        error = e
+    try:
+        if publishing:
+            redis_flight.finish(error)
+    except redis.RedisError as e:
+        logger.error(f"Redis connection error: {e}")
+    finally:
+        flight.finish(error)
+        _leave_flight(key, flight)
+
+
+def _start(key, call):
+    """Join or lead the flight for key; returns the flight (leaders start producing it)."""
+    flight, leader = _join_flight(key)
+    if leader:
+        redis_flight, leading = None, True
+        redis_client = get_redis_instance()
+        if redis_client:
+            try:
+                redis_flight = RedisFlight(redis_client, key)
+                leading = redis_flight.try_lead()
+            except redis.RedisError as e:
+                logger.error(f"Redis connection error: {e}")
+                redis_flight, leading = None, True
+        threading.Thread(
+            target=_produce,
+            args=(key, flight, _chunks(call, redis_flight, leading), redis_flight, leading),
+            name="single-flight",
+            daemon=True,
+        ).start()
+    return flight
+
+
+def gen_single_flight(func):
+    def wrapper(self, model, messages, *args, **kwargs):
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            return func(self, model, messages, *args, **kwargs)
+        key = llm_cache_key("gen", self, model, messages, kwargs)
+        flight = _start(key, lambda: [func(self, model, messages, *args, **kwargs)])
+        return "".join(flight.subscribe())
+
+    return wrapper
+
+
+def stream_single_flight(func):
+    def wrapper(self, model, messages, stream, *args, **kwargs):
+        if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+            yield from func(self, model, messages, stream, *args, **kwargs)
+            return
+        key = llm_cache_key("stream", self, model, messages, kwargs)
+        flight = _start(key, lambda: func(self, model, messages, stream, *args, **kwargs))
+        yield from flight.subscribe()
+
+    return wrapper
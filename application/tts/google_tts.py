@@ -1,6 +1,5 @@
 import io
 import base64
-from gtts import gTTS
 from application.tts.base import BaseTTS
 
 
@@ -10,6 +9,8 @@ class GoogleTTS(BaseTTS):
 
 
     def text_to_speech(self, text):
+        from gtts import gTTS
+
         lang = "en"
         audio_fp = io.BytesIO()
         tts = gTTS(text=text, lang=lang, slow=False)
@@ -2,31 +2,50 @@ import sys
 from datetime import datetime
 from application.core.mongo_db import MongoDB
 from application.utils import num_tokens_from_string
+from application.write_behind import writer
 
 mongo = MongoDB.get_client()
 db = mongo["docsgpt"]
 usage_collection = db["token_usage"]
 
 
-def update_token_usage(user_api_key, token_usage):
+def _count_usage(llm, messages, output, reported, timestamp):
+    # Runs on the writer thread: provider-reported counts when the provider
+    # gave them, otherwise one tokenizer pass over the prompt and the output.
+    usage = dict(reported or {})
+    if usage.get("prompt_tokens") is None:
+        usage["prompt_tokens"] = num_tokens_from_string(
+            "\n".join(message["content"] for message in messages)
+        )
+    if usage.get("generated_tokens") is None:
+        usage["generated_tokens"] = num_tokens_from_string(output or "")
+    llm.token_usage["prompt_tokens"] += usage["prompt_tokens"]
+    llm.token_usage["generated_tokens"] += usage["generated_tokens"]
+    writer.insert(
+        usage_collection,
+        {
+            "api_key": llm.user_api_key,
+            "prompt_tokens": usage["prompt_tokens"],
+            "generated_tokens": usage["generated_tokens"],
+            "timestamp": timestamp,
+        },
+    )
+
+
+def record_token_usage(llm, messages, output):
+    """Queue the usage of one LLM call; nothing is counted or written on the caller's thread."""
     if "pytest" in sys.modules:
         return
-    usage_data = {
-        "api_key": user_api_key,
-        "prompt_tokens": token_usage["prompt_tokens"],
-        "generated_tokens": token_usage["generated_tokens"],
-        "timestamp": datetime.now(),
-    }
-    usage_collection.insert_one(usage_data)
+    reported = getattr(llm, "reported_usage", None)
+    writer.call(_count_usage, llm, messages, output, reported, datetime.now())
 
 
 def gen_token_usage(func):
     def wrapper(self, model, messages, stream, **kwargs):
-        for message in messages:
-            self.token_usage["prompt_tokens"] += num_tokens_from_string(message["content"])
+        # providers that report usage set self.reported_usage during the call
+        self.reported_usage = None
         result = func(self, model, messages, stream, **kwargs)
-        self.token_usage["generated_tokens"] += num_tokens_from_string(result)
-        update_token_usage(self.user_api_key, self.token_usage)
+        record_token_usage(self, messages, result)
         return result
 
     return wrapper
@@ -34,15 +53,14 @@ def gen_token_usage(func):
 
 def stream_token_usage(func):
     def wrapper(self, model, messages, stream, **kwargs):
-        for message in messages:
-            self.token_usage["prompt_tokens"] += num_tokens_from_string(message["content"])
-        batch = []
-        result = func(self, model, messages, stream, **kwargs)
-        for r in result:
-            batch.append(r)
-            yield r
-        for line in batch:
-            self.token_usage["generated_tokens"] += num_tokens_from_string(line)
-        update_token_usage(self.user_api_key, self.token_usage)
+        self.reported_usage = None
+        output = []
+        try:
+            for r in func(self, model, messages, stream, **kwargs):
+                output.append(r)
+                yield r
+        finally:
+            # also recorded when the client disconnects mid-stream
+            record_token_usage(self, messages, "".join(output))
 
     return wrapper
@@ -1,5 +1,6 @@
 import tiktoken
 import hashlib
+import importlib
 from flask import jsonify, make_response
 
 
@@ -19,7 +20,18 @@ def num_tokens_from_string(string: str) -> int:
     return num_tokens
 
 
+def add_token_counts(docs):
+    """Store each chunk's token count in its metadata so it is counted only once, at ingest."""
+    for doc in docs:
+        # chunks split from one file share a metadata dict, so give each its own
+        doc.metadata = {**doc.metadata, "token_count": num_tokens_from_string(doc.page_content)}
+    return docs
+
+
 def count_tokens_docs(docs):
+    if docs and all("token_count" in doc.metadata for doc in docs):
+        return sum(doc.metadata["token_count"] for doc in docs)
+
     docs_content = ""
     for doc in docs:
         docs_content += doc.page_content
@@ -46,3 +58,9 @@ def check_required_fields(data, required_fields):
 def get_hash(data):
     return hashlib.md5(data.encode()).hexdigest()
 
+
+
+def import_string(dotted_path):
+    """Import a class or attribute given its dotted path, e.g. "package.module.Class"."""
+    module_path, attr_name = dotted_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_path), attr_name)
@@ -1,19 +1,28 @@
 from abc import ABC, abstractmethod
 import os
-from sentence_transformers import SentenceTransformer
-from langchain_openai import OpenAIEmbeddings
+import numpy as np
+import requests
 from application.core.settings import settings
 
 class EmbeddingsWrapper:
     def __init__(self, model_name, *args, **kwargs):
+        from sentence_transformers import SentenceTransformer
+
         self.model = SentenceTransformer(model_name, config_kwargs={'allow_dangerous_deserialization': True}, *args, **kwargs)
         self.dimension = self.model.get_sentence_embedding_dimension()
 
+    # Embeddings are returned as contiguous, unit-length float32 arrays and
+    # passed as-is to the vector stores; only backends whose client needs
+    # lists convert them.
     def embed_query(self, query: str):
-        return self.model.encode(query).tolist()
-    
+        return as_float32_array(
+            self.model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+        )
+
     def embed_documents(self, documents: list):
-        return self.model.encode(documents).tolist()
+        return as_float32_array(
+            self.model.encode(documents, convert_to_numpy=True, normalize_embeddings=True)
+        )
     
     def __call__(self, text):
         if isinstance(text, str):
@@ -24,6 +33,102 @@ class EmbeddingsWrapper:
             raise ValueError("Input must be a string or a list of strings")
 
 
+class RemoteEmbeddingsWrapper:
+    """
+    Drop-in replacement for EmbeddingsWrapper that talks to a shared
+    embeddings server (see application/vectorstore/embeddings_server.py)
+    instead of loading the model into every process.
+    """
+
+    def __init__(self, server_url, batch_size=None, timeout=None):
+        self.server_url = server_url.rstrip("/")
+        self.batch_size = batch_size or settings.EMBEDDINGS_SERVER_BATCH_SIZE
+        self.timeout = timeout or settings.EMBEDDINGS_SERVER_TIMEOUT
+        self.session = requests.Session()
+        self._dimension = None
+
+    @property
+    def dimension(self):
+        if self._dimension is None:
+            response = self.session.get(f"{self.server_url}/health", timeout=self.timeout)
+            response.raise_for_status()
+            self._dimension = response.json()["dimension"]
+        return self._dimension
+
+    def _embed(self, texts):
+        response = self.session.post(
+            f"{self.server_url}/embed",
+            json={"texts": texts},
+            headers={"Accept": "application/octet-stream"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        rows, dimension = map(int, response.headers["X-Embeddings-Shape"].split(","))
+        vectors = np.frombuffer(response.content, dtype=np.float32).reshape(rows, dimension)
+        # normalizing also copies the read-only buffer into a writeable array
+        return normalize_embeddings(vectors)
+
+    def embed_query(self, query: str):
+        return self._embed([query])[0]
+
+    def embed_documents(self, documents: list):
+        batches = [
+            self._embed(documents[i:i + self.batch_size])
+            for i in range(0, len(documents), self.batch_size)
+        ]
+        if len(batches) == 1:
+            return batches[0]
+        return np.concatenate(batches) if batches else np.empty((0, self.dimension), dtype=np.float32)
+
+    def __call__(self, text):
+        if isinstance(text, str):
+            return self.embed_query(text)
+        elif isinstance(text, list):
+            return self.embed_documents(text)
+        else:
+            raise ValueError("Input must be a string or a list of strings")
+
+
+def as_float32_array(vectors):
+    """Return embeddings as a contiguous, writeable float32 array, copying only if needed."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    # arrays over a bytes buffer (np.frombuffer) are read-only, and FAISS
+    # normalizes in place
+    return vectors if vectors.flags.writeable else vectors.copy()
+
+
+def normalize_embeddings(vectors):
+    """Scale each row to unit length, as l2_to_cosine and the index metrics expect."""
+    vectors = as_float32_array(vectors)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def cosine_similarity(query_vector, vectors):
+    """Cosine similarity between one query vector and each row of vectors."""
+    query_vector = as_float32_array(query_vector).reshape(-1)
+    vectors = as_float32_array(vectors).reshape(-1, query_vector.shape[0])
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+    norms[norms == 0] = 1
+    return (vectors @ query_vector) / norms
+
+
+def l2_to_cosine(squared_distance):
+    """Cosine similarity of two unit vectors from their squared L2 distance."""
+    return 1 - squared_distance / 2
+
+
+def to_list(vector):
+    """Convert an embedding to a plain list for clients that cannot take arrays."""
+    return vector.tolist() if isinstance(vector, np.ndarray) else vector
+
+
+def _openai_embeddings(*args, **kwargs):
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(*args, **kwargs)
+
 
 class EmbeddingsSingleton:
     _instances = {}
@@ -39,10 +144,11 @@ class EmbeddingsSingleton:
     @staticmethod
     def _create_instance(embeddings_name, *args, **kwargs):
         embeddings_factory = {
-            "openai_text-embedding-ada-002": OpenAIEmbeddings,
+            "openai_text-embedding-ada-002": _openai_embeddings,
             "huggingface_sentence-transformers/all-mpnet-base-v2": lambda: EmbeddingsWrapper("sentence-transformers/all-mpnet-base-v2"),
             "huggingface_sentence-transformers-all-mpnet-base-v2": lambda: EmbeddingsWrapper("sentence-transformers/all-mpnet-base-v2"),
             "huggingface_hkunlp/instructor-large": lambda: EmbeddingsWrapper("hkunlp/instructor-large"),
+            "remote": RemoteEmbeddingsWrapper,
         }
 
         if embeddings_name in embeddings_factory:
@@ -58,32 +164,76 @@ class BaseVectorStore(ABC):
     def search(self, *args, **kwargs):
         pass
 
+    def search_batch(self, queries, k=2, vectors=None):
+        """
+        Search several queries at once, returning one list of documents per query.
+        Stores that can search many vectors in one call override this and use
+        `vectors` (the queries already embedded) when given.
+        """
+        return [self.search(query, k=k) for query in queries]
+
+    def search_with_scores(self, question, k=2, vector=None):
+        """
+        Search and return (document, score) pairs, best first. The score is the
+        cosine similarity between the question and the chunk, whatever the
+        backend's own metric (distances are converted assuming normalized
+        embeddings). `vector` is the question already embedded, if available.
+        Stores that cannot report a score return None for it.
+        """
+        return [(doc, None) for doc in self.search(question, k=k)]
+
+    def search_batch_with_scores(self, queries, k=2, vectors=None):
+        """
+        search_with_scores for several queries, one list of (document, score)
+        pairs per query. By default each query is searched on its own; stores
+        that can search many vectors in one call override this.
+        """
+        vectors = vectors if vectors is not None else [None] * len(queries)
+        return [
+            self.search_with_scores(query, k=k, vector=vector)
+            for query, vector in zip(queries, vectors)
+        ]
+
     def is_azure_configured(self):
-        return settings.OPENAI_API_BASE and settings.OPENAI_API_VERSION and settings.AZURE_DEPLOYMENT_NAME
+        return is_azure_configured()
 
     def _get_embeddings(self, embeddings_name, embeddings_key=None):
-        if embeddings_name == "openai_text-embedding-ada-002":
-            if self.is_azure_configured():
-                os.environ["OPENAI_API_TYPE"] = "azure"
-                embedding_instance = EmbeddingsSingleton.get_instance(
-                    embeddings_name,
-                    model=settings.AZURE_EMBEDDINGS_DEPLOYMENT_NAME
-                )
-            else:
-                embedding_instance = EmbeddingsSingleton.get_instance(
-                    embeddings_name,
-                    openai_api_key=embeddings_key
-                )
-        elif embeddings_name == "huggingface_sentence-transformers/all-mpnet-base-v2":
-            if os.path.exists("./model/all-mpnet-base-v2"):
-                embedding_instance = EmbeddingsSingleton.get_instance(
-                    embeddings_name="./model/all-mpnet-base-v2",
-                )
-            else:
-                embedding_instance = EmbeddingsSingleton.get_instance(
-                    embeddings_name,
-                )
+        return get_embeddings(embeddings_name, embeddings_key)
+
+
+def is_azure_configured():
+    return settings.OPENAI_API_BASE and settings.OPENAI_API_VERSION and settings.AZURE_DEPLOYMENT_NAME
+
+
+def get_embeddings(embeddings_name, embeddings_key=None):
+    if embeddings_name == "openai_text-embedding-ada-002":
+        if is_azure_configured():
+            os.environ["OPENAI_API_TYPE"] = "azure"
+            embedding_instance = EmbeddingsSingleton.get_instance(
+                embeddings_name,
+                model=settings.AZURE_EMBEDDINGS_DEPLOYMENT_NAME
+            )
         else:
-            embedding_instance = EmbeddingsSingleton.get_instance(embeddings_name)
+            embedding_instance = EmbeddingsSingleton.get_instance(
+                embeddings_name,
+                openai_api_key=embeddings_key
+            )
+    elif settings.EMBEDDINGS_SERVER_URL:
+        embedding_instance = EmbeddingsSingleton.get_instance(
+            "remote",
+            server_url=settings.EMBEDDINGS_SERVER_URL
+        )
+    else:
+        embedding_instance = get_local_embeddings(embeddings_name)
+
+    return embedding_instance
 
-        return embedding_instance
\ No newline at end of file
+
+def get_local_embeddings(embeddings_name):
+    """Load the embeddings model into the current process."""
+    if embeddings_name == "huggingface_sentence-transformers/all-mpnet-base-v2":
+        if os.path.exists("./model/all-mpnet-base-v2"):
+            return EmbeddingsSingleton.get_instance(
+                embeddings_name="./model/all-mpnet-base-v2",
+            )
+    return EmbeddingsSingleton.get_instance(embeddings_name)
\ No newline at end of file
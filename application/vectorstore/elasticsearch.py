@@ -1,4 +1,4 @@
-from application.vectorstore.base import BaseVectorStore
+from application.vectorstore.base import BaseVectorStore, cosine_similarity, to_list
 from application.core.settings import settings
 from application.vectorstore.document_class import Document
 import elasticsearch
@@ -80,6 +80,27 @@ class ElasticsearchStore(BaseVectorStore):
     def search(self, question, k=2, index_name=settings.ELASTIC_INDEX, *args, **kwargs):
         embeddings = self._get_embeddings(settings.EMBEDDINGS_NAME, self.embeddings_key)
         vector = embeddings.embed_query(question)
+        # create Documents objects from the results page_content ['_source']['text'], metadata ['_source']['metadata']
+        doc_list = []
+        for hit in self._search_hits(question, vector, k):
+            
+            doc_list.append(Document(page_content = hit['_source']['text'], metadata = hit['_source']['metadata']))
+        return doc_list
+
+    def search_with_scores(self, question, k=2, vector=None):
+        if vector is None:
+            embeddings = self._get_embeddings(settings.EMBEDDINGS_NAME, self.embeddings_key)
+            vector = embeddings.embed_query(question)
+        hits = self._search_hits(question, vector, k)
+        # the hybrid (rrf) _score is rank based, so compare the stored vectors instead
+        scores = cosine_similarity(vector, [hit['_source']['vector'] for hit in hits]).tolist() if hits else []
+        return [
+            (Document(page_content=hit['_source']['text'], metadata=hit['_source']['metadata']), score)
+            for hit, score in zip(hits, scores)
+        ]
+
+    def _search_hits(self, question, vector, k):
+        vector = to_list(vector)
         knn = {
             "filter": [{"match": {"metadata.source_id.keyword": self.source_id}}],
             "field": "vector",
@@ -106,12 +127,7 @@ class ElasticsearchStore(BaseVectorStore):
             "rank": {"rrf": {}},
         }
         resp = self.docsearch.search(index=self.index_name, query=full_query['query'], size=k, knn=full_query['knn'])
-        # create Documents objects from the results page_content ['_source']['text'], metadata ['_source']['metadata']
-        doc_list = []
-        for hit in resp['hits']['hits']:
-            
-            doc_list.append(Document(page_content = hit['_source']['text'], metadata = hit['_source']['metadata']))
-        return doc_list
+        return resp['hits']['hits']
 
     def _create_index_if_not_exists(
             self, index_name, dims_length
@@ -0,0 +1,168 @@
+"""
+Shared local embeddings server.
+
+Every gunicorn worker and Celery child otherwise loads its own copy of the
+SentenceTransformer model. Run this once per host/pod and point the other
+processes at it with EMBEDDINGS_SERVER_URL:
+
+    python -m application.vectorstore.embeddings_server --port 7092
+
+Requests coming from different processes are encoded together in batches.
+"""
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from application.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingsBatcher:
+    """Collects texts from concurrent requests and encodes them in one call."""
+
+    def __init__(self, embeddings, max_batch=None, max_wait_ms=None):
+        self.embeddings = embeddings
+        self.max_batch = max_batch or settings.EMBEDDINGS_SERVER_MAX_BATCH
+        self.max_wait = (
+            max_wait_ms if max_wait_ms is not None else settings.EMBEDDINGS_SERVER_MAX_WAIT_MS
+        ) / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def dimension(self):
+        return self.embeddings.dimension
+
+    def submit(self, texts):
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                vectors = np.ascontiguousarray(
+                    self.embeddings.embed_documents(texts), dtype=np.float32
+                )
+            except Exception as e:
+                logger.error(f"Embedding batch failed: {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for item_texts, future in pending:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+def make_handler(batcher, timeout=None):
+    timeout = timeout or settings.EMBEDDINGS_SERVER_TIMEOUT
+
+    class EmbeddingsRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(200, {"status": "ok", "dimension": batcher.dimension})
+
+        def do_POST(self):
+            if self.path != "/embed":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                texts = json.loads(self.rfile.read(length))["texts"]
+                if not isinstance(texts, list):
+                    raise ValueError("texts must be a list of strings")
+            except (ValueError, KeyError) as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            if not texts:
+                self._send_json(400, {"error": "texts must not be empty"})
+                return
+            try:
+                vectors = batcher.submit(texts).result(timeout=timeout)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            if self.headers.get("Accept") == "application/octet-stream":
+                self._send_array(vectors)
+            else:
+                self._send_json(200, {"embeddings": vectors.tolist()})
+
+        def _send_array(self, vectors):
+            # Raw float32 rows; the client maps them with np.frombuffer without parsing.
+            body = np.ascontiguousarray(vectors).tobytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("X-Embeddings-Shape", f"{vectors.shape[0]},{vectors.shape[1]}")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return EmbeddingsRequestHandler
+
+
+def create_server(embeddings, host="127.0.0.1", port=7092):
+    batcher = EmbeddingsBatcher(embeddings)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    from application.vectorstore.base import get_local_embeddings
+
+    parser = argparse.ArgumentParser(description="Shared embeddings server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7092)
+    parser.add_argument("--embeddings-name", default=settings.EMBEDDINGS_NAME)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    embeddings = get_local_embeddings(args.embeddings_name)
+    server = create_server(embeddings, args.host, args.port)
+    logger.info(f"Embeddings server listening on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
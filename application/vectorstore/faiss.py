@@ -1,7 +1,12 @@
+import os
+import uuid
+
 from langchain_community.vectorstores import FAISS
-from application.vectorstore.base import BaseVectorStore
+from langchain_core.documents import Document
+import numpy as np
+
+from application.vectorstore.base import BaseVectorStore, as_float32_array, cosine_similarity
 from application.core.settings import settings
-import os
 
 def get_vectorstore(path: str) -> str:
     if path:
@@ -15,6 +20,7 @@ class FaissStore(BaseVectorStore):
         super().__init__()
         self.path = get_vectorstore(source_id)
         embeddings = self._get_embeddings(settings.EMBEDDINGS_NAME, embeddings_key)
+        self.embeddings = embeddings
 
         try:
             if docs_init:
@@ -29,8 +35,67 @@ class FaissStore(BaseVectorStore):
     def search(self, *args, **kwargs):
         return self.docsearch.similarity_search(*args, **kwargs)
 
-    def add_texts(self, *args, **kwargs):
-        return self.docsearch.add_texts(*args, **kwargs)
+    def _search_vectors(self, vectors, k, with_scores=False):
+        vectors = as_float32_array(vectors)
+        if self.docsearch._normalize_L2:
+            import faiss
+
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        _, indices = self.docsearch.index.search(vectors, k)
+        results = []
+        for vector, row in zip(vectors, indices):
+            ids = [int(i) for i in row if i != -1]
+            docs = [
+                self.docsearch.docstore.search(self.docsearch.index_to_docstore_id[i])
+                for i in ids
+            ]
+            if with_scores:
+                # exact cosine from the stored vectors, independent of the index metric
+                stored = np.vstack([self.docsearch.index.reconstruct(i) for i in ids]) if ids else []
+                docs = list(zip(docs, cosine_similarity(vector, stored).tolist() if ids else []))
+            results.append(docs)
+        return results
+
+    def search_batch(self, queries, k=2, vectors=None):
+        # One index.search over all query vectors instead of a search per query
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(list(queries))
+        return self._search_vectors(vectors, k)
+
+    def search_batch_with_scores(self, queries, k=2, vectors=None):
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(list(queries))
+        return self._search_vectors(vectors, k, with_scores=True)
+
+    def search_with_scores(self, question, k=2, vector=None):
+        if vector is None:
+            vector = self.embeddings.embed_query(question)
+        return self._search_vectors([vector], k, with_scores=True)[0]
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        # Embeds the whole batch in one call and hands the float32 matrix straight
+        # to index.add (FAISS.add_texts would embed text by text and copy via np.array).
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = as_float32_array(self.embeddings.embed_documents(texts))
+        if self.docsearch._normalize_L2:
+            import faiss
+
+            faiss.normalize_L2(vectors)
+        self.docsearch.index.add(vectors)
+
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self.docsearch.docstore.add(
+            {id_: Document(page_content=t, metadata=m) for id_, t, m in zip(ids, texts, metadatas)}
+        )
+        starting_len = len(self.docsearch.index_to_docstore_id)
+        self.docsearch.index_to_docstore_id.update(
+            {starting_len + j: id_ for j, id_ in enumerate(ids)}
+        )
+        return ids
 
     def save_local(self, *args, **kwargs):
         return self.docsearch.save_local(*args, **kwargs)
@@ -1,6 +1,7 @@
 from typing import List, Optional
 import importlib
-from application.vectorstore.base import BaseVectorStore
+from application.vectorstore.base import BaseVectorStore, as_float32_array, l2_to_cosine
+from application.vectorstore.document_class import Document
 from application.core.settings import settings
 
 class LanceDBVectorStore(BaseVectorStore):
@@ -66,19 +67,25 @@ class LanceDBVectorStore(BaseVectorStore):
 
     def add_texts(self, texts: List[str], metadatas: Optional[List[dict]] = None, source_id: str = None):
         """Add texts with metadata and their embeddings to the LanceDB table."""
-        embeddings = self._get_embeddings(settings.EMBEDDINGS_NAME, self.embeddings_key).embed_documents(texts)
-        vectors = []
-        for embedding, text, metadata in zip(embeddings, texts, metadatas or [{}] * len(texts)):
+        embeddings = as_float32_array(
+            self._get_embeddings(settings.EMBEDDINGS_NAME, self.embeddings_key).embed_documents(texts)
+        )
+        metadata_structs = []
+        for metadata in metadatas or [{} for _ in texts]:
             if source_id:
                 metadata["source_id"] = source_id
-            metadata_struct = [{"key": k, "value": str(v)} for k, v in metadata.items()]
-            vectors.append({
-                "vector": embedding,
-                "text": text,
-                "metadata": metadata_struct
-            })
+            metadata_structs.append([{"key": k, "value": str(v)} for k, v in metadata.items()])
+        # Build the vector column straight from the float32 buffer instead of per-row lists.
+        vector_column = self.pa.FixedSizeListArray.from_arrays(
+            self.pa.array(embeddings.reshape(-1)), embeddings.shape[1]
+        )
+        table = self.pa.table({
+            "vector": vector_column,
+            "text": self.pa.array(texts, type=self.pa.string()),
+            "metadata": self.pa.array(metadata_structs),
+        })
         self.ensure_table_exists()
-        self.docsearch.add(vectors)
+        self.docsearch.add(table)
 
     def search(self, query: str, k: int = 2, *args, **kwargs):
         """Search LanceDB for the top k most similar vectors."""
@@ -87,6 +94,21 @@ class LanceDBVectorStore(BaseVectorStore):
         results = self.docsearch.search(query_embedding).limit(k).to_list()
         return [(result["_distance"], result["text"], result["metadata"]) for result in results]
 
+    def search_with_scores(self, query: str, k: int = 2, vector=None):
+        """Search LanceDB, returning Documents with cosine similarity scores."""
+        self.ensure_table_exists()
+        if vector is None:
+            vector = self._get_embeddings(settings.EMBEDDINGS_NAME, self.embeddings_key).embed_query(query)
+        results = self.docsearch.search(vector).limit(k).to_list()
+        scored = []
+        for result in results:
+            metadata = result["metadata"] or {}
+            if isinstance(metadata, list):
+                metadata = {m["key"]: m["value"] for m in metadata}
+            # _distance is the squared L2 distance
+            scored.append((Document(result["text"], metadata), l2_to_cosine(result["_distance"])))
+        return scored
+
     def delete_index(self):
         """Delete the entire LanceDB index (table)."""
         if self.table:
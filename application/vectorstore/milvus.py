@@ -3,7 +3,7 @@ from uuid import uuid4
 
 
 from application.core.settings import settings
-from application.vectorstore.base import BaseVectorStore
+from application.vectorstore.base import BaseVectorStore, l2_to_cosine, to_list
 
 
 class MilvusStore(BaseVectorStore):
@@ -26,6 +26,21 @@ class MilvusStore(BaseVectorStore):
         expr = f"source_id == '{self._source_id}'"
         return self._docsearch.similarity_search(query=question, k=k, expr=expr, *args, **kwargs)
 
+    def search_with_scores(self, question, k=2, vector=None):
+        expr = f"source_id == '{self._source_id}'"
+        if vector is None:
+            results = self._docsearch.similarity_search_with_score(query=question, k=k, expr=expr)
+        else:
+            results = self._docsearch.similarity_search_with_score_by_vector(
+                embedding=to_list(vector), k=k, expr=expr
+            )
+        index_params = getattr(self._docsearch, "index_params", None)
+        metric = index_params.get("metric_type", "L2") if isinstance(index_params, dict) else "L2"
+        if metric == "L2":
+            # Milvus reports squared L2 distances
+            return [(doc, l2_to_cosine(distance)) for doc, distance in results]
+        return results
+
     def add_texts(self, texts: List[str], metadatas: Optional[List[dict]], *args, **kwargs):
         ids = [str(uuid4()) for _ in range(len(texts))]
 
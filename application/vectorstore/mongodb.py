@@ -1,5 +1,5 @@
 from application.core.settings import settings
-from application.vectorstore.base import BaseVectorStore
+from application.vectorstore.base import BaseVectorStore, to_list
 from application.vectorstore.document_class import Document
 
 
@@ -35,7 +35,16 @@ class MongoDBVectorStore(BaseVectorStore):
         self._collection = self._database[collection]
 
     def search(self, question, k=2, *args, **kwargs):
-        query_vector = self._embedding.embed_query(question)
+        return [doc for doc, _ in self._search(self._embedding.embed_query(question), k)]
+
+    def search_with_scores(self, question, k=2, vector=None):
+        if vector is None:
+            vector = self._embedding.embed_query(question)
+        # Atlas reports cosine scores as (1 + cosine) / 2
+        return [(doc, 2 * score - 1) for doc, score in self._search(vector, k)]
+
+    def _search(self, query_vector, k):
+        query_vector = to_list(query_vector)
 
         pipeline = [
             {
@@ -47,7 +56,8 @@ class MongoDBVectorStore(BaseVectorStore):
                     "index": self._index_name,
                     "filter": {"source_id": {"$eq": self._source_id}},
                 }
-            }
+            },
+            {"$set": {"_score": {"$meta": "vectorSearchScore"}}},
         ]
 
         cursor = self._collection.aggregate(pipeline)
@@ -58,8 +68,9 @@ class MongoDBVectorStore(BaseVectorStore):
             doc.pop("_id")
             doc.pop(self._text_key)
             doc.pop(self._embedding_key)
+            score = doc.pop("_score")
             metadata = doc
-            results.append(Document(text, metadata))
+            results.append((Document(text, metadata), score))
         return results
 
     def _insert_texts(self, texts, metadatas):
@@ -68,7 +79,7 @@ class MongoDBVectorStore(BaseVectorStore):
         embeddings = self._embedding.embed_documents(texts)
 
         to_insert = [
-            {self._text_key: t, self._embedding_key: embedding, **m}
+            {self._text_key: t, self._embedding_key: to_list(embedding), **m}
             for t, m, embedding in zip(texts, metadatas, embeddings)
         ]
 
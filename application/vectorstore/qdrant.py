@@ -1,5 +1,5 @@
 from langchain_community.vectorstores.qdrant import Qdrant
-from application.vectorstore.base import BaseVectorStore
+from application.vectorstore.base import BaseVectorStore, l2_to_cosine, to_list
 from application.core.settings import settings
 from qdrant_client import models
 
@@ -35,6 +35,17 @@ class QdrantStore(BaseVectorStore):
     def search(self, *args, **kwargs):
         return self._docsearch.similarity_search(filter=self._filter, *args, **kwargs)
 
+    def search_with_scores(self, question, k=2, vector=None):
+        if vector is None:
+            results = self._docsearch.similarity_search_with_score(question, k=k, filter=self._filter)
+        else:
+            results = self._docsearch.similarity_search_with_score_by_vector(
+                to_list(vector), k=k, filter=self._filter
+            )
+        if settings.QDRANT_DISTANCE_FUNC == "Euclid":
+            return [(doc, l2_to_cosine(distance ** 2)) for doc, distance in results]
+        return results
+
     def add_texts(self, *args, **kwargs):
         return self._docsearch.add_texts(*args, **kwargs)
 
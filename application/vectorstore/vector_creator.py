@@ -1,22 +1,27 @@
-from application.vectorstore.faiss import FaissStore
-from application.vectorstore.elasticsearch import ElasticsearchStore
-from application.vectorstore.milvus import MilvusStore
-from application.vectorstore.mongodb import MongoDBVectorStore
-from application.vectorstore.qdrant import QdrantStore
+from application.utils import import_string
 
 
 class VectorCreator:
+    # Implementations are imported on first use so that only the configured
+    # vector store (and its client library) is loaded.
     vectorstores = {
-        "faiss": FaissStore,
-        "elasticsearch": ElasticsearchStore,
-        "mongodb": MongoDBVectorStore,
-        "qdrant": QdrantStore,
-        "milvus": MilvusStore,
+        "faiss": "application.vectorstore.faiss.FaissStore",
+        "elasticsearch": "application.vectorstore.elasticsearch.ElasticsearchStore",
+        "mongodb": "application.vectorstore.mongodb.MongoDBVectorStore",
+        "qdrant": "application.vectorstore.qdrant.QdrantStore",
+        "milvus": "application.vectorstore.milvus.MilvusStore",
     }
 
     @classmethod
-    def create_vectorstore(cls, type, *args, **kwargs):
+    def get_vectorstore_class(cls, type):
         vectorstore_class = cls.vectorstores.get(type.lower())
         if not vectorstore_class:
             raise ValueError(f"No vectorstore class found for type {type}")
+        if isinstance(vectorstore_class, str):
+            vectorstore_class = import_string(vectorstore_class)
+        return vectorstore_class
+
+    @classmethod
+    def create_vectorstore(cls, type, *args, **kwargs):
+        vectorstore_class = cls.get_vectorstore_class(type)
         return vectorstore_class(*args, **kwargs)
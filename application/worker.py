@@ -1,3 +1,4 @@
+import json
 import logging
 import os
 import shutil
@@ -12,11 +13,12 @@ from bson.objectid import ObjectId
 from application.core.mongo_db import MongoDB
 from application.core.settings import settings
 from application.parser.file.bulk import SimpleDirectoryReader
+from application.parser.guideline_summaries import build_guideline_summaries
 from application.parser.open_ai_func import call_openai_api
 from application.parser.remote.remote_creator import RemoteCreator
 from application.parser.schema.base import Document
 from application.parser.token_func import group_split
-from application.utils import count_tokens_docs
+from application.utils import add_token_counts, count_tokens_docs
 
 mongo = MongoDB.get_client()
 db = mongo["docsgpt"]
@@ -102,6 +104,18 @@ def upload_index(full_path, file_data):
             for file in files.values():
                 file.close()
 
+def prepare_chunks(docs, doc_type):
+    """
+    Work done once per source at ingest (uploads, remote sources and syncs)
+    rather than per request. Returns the guideline summaries to store on the
+    source.
+    """
+    add_token_counts(docs)
+    if doc_type == "guide":
+        # summarized once here instead of on every request that uses the guide
+        return build_guideline_summaries(docs)
+    return []
+
 # Define the main function for ingesting and processing documents.
 def ingest_worker(
     self, directory, formats, name_job, filename, user, doc_type, retriever="classic"
@@ -161,10 +175,12 @@ def ingest_worker(
     )
 
     docs = [Document.to_langchain_format(raw_doc) for raw_doc in raw_docs]
+    summaries = prepare_chunks(docs, doc_type)
+    # the source's own text; the summaries are derived from it
+    tokens = count_tokens_docs(docs)
     id = ObjectId()
 
     call_openai_api(docs, full_path, id, self)
-    tokens = count_tokens_docs(docs)
     self.update_state(state="PROGRESS", meta={"current": 100})
 
     if sample:
@@ -178,6 +194,8 @@ def ingest_worker(
         "doc_type": doc_type,  # New field to indicate the document type
         "type": "local",
     })
+    if summaries:
+        file_data["guideline_summaries"] = json.dumps(summaries)
     upload_index(full_path, file_data)
 
     # delete local
@@ -203,6 +221,7 @@ def remote_worker(
     sync_frequency="never",
     operation_mode="upload",
     doc_id=None,
+    doc_type="user",
 ):
     token_check = True
     full_path = os.path.join(directory, user, name_job)
@@ -224,6 +243,7 @@ def remote_worker(
         max_tokens=MAX_TOKENS,
         token_check=token_check,
     )
+    summaries = prepare_chunks(docs, doc_type)
     tokens = count_tokens_docs(docs)
     if operation_mode == "upload":
         id = ObjectId()
@@ -244,7 +264,10 @@ def remote_worker(
         "type": loader,
         "remote_data": source_data,
         "sync_frequency": sync_frequency,
+        "doc_type": doc_type,
     }
+    if summaries:
+        file_data["guideline_summaries"] = json.dumps(summaries)
     upload_index(full_path, file_data)
 
     shutil.rmtree(full_path)
@@ -261,6 +284,7 @@ def sync(
     retriever,
     doc_id=None,
     directory="temp",
+    doc_type="user",
 ):
     try:
         remote_worker(
@@ -274,6 +298,7 @@ def sync(
             sync_frequency,
             "sync",
             doc_id,
+            doc_type,
         )
     except Exception as e:
         logging.error(f"Error during sync: {e}")
@@ -291,8 +316,10 @@ def sync_worker(self, frequency):
             source_data = doc.get("remote_data")
             retriever = doc.get("retriever")
             doc_id = str(doc.get("_id"))
+            doc_type = doc.get("doc_type") or "user"
             resp = sync(
-                self, source_data, name, user, source_type, frequency, retriever, doc_id
+                self, source_data, name, user, source_type, frequency, retriever, doc_id,
+                doc_type=doc_type,
             )
             sync_counts["total_sync_count"] += 1
             sync_counts[
@@ -0,0 +1,131 @@
+"""
+Write-behind persistence for work that does not need to finish before a
+response is sent (conversation writes, user logs, titles).
+
+Writes go to a bounded queue drained by one thread per process. Inserts are
+grouped per collection into insert_many calls; other writes run in the order
+they were queued. If the queue is full the write runs inline instead of
+being dropped.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from application.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    def __init__(self, maxsize=None, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else settings.WRITE_BEHIND_FLUSH_INTERVAL
+        )
+        self._queue = queue.Queue(maxsize=maxsize or settings.WRITE_BEHIND_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        # started lazily so each (forked) worker process gets its own writer
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def _put(self, item):
+        self._ensure_started()
+        try:
+            self._queue.put(item, timeout=settings.WRITE_BEHIND_PUT_TIMEOUT)
+        except queue.Full:
+            logger.warning("Write-behind queue is full, writing inline")
+            self._write([item])
+
+    def insert(self, collection, document):
+        """Queue a document for a batched insert_many into collection."""
+        self._put(("insert", collection, document))
+
+    def call(self, func, *args, **kwargs):
+        """Queue any other write; calls run in the order they were queued."""
+        self._put(("call", func, (args, kwargs)))
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _write(self, items):
+        inserts = {}
+        for kind, target, payload in items:
+            if kind == "insert":
+                inserts.setdefault(id(target), (target, []))[1].append(payload)
+                continue
+            args, kwargs = payload
+            try:
+                target(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Write-behind call {getattr(target, '__name__', target)} failed: {e}", exc_info=True)
+        for collection, documents in inserts.values():
+            try:
+                collection.insert_many(documents, ordered=False)
+            except Exception as e:
+                logger.error(f"Write-behind insert into {collection.name} failed: {e}", exc_info=True)
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                self._write(items)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been written."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout if timeout else None
+        while self._queue.unfinished_tasks:
+            if deadline and time.monotonic() > deadline:
+                logger.warning("Write-behind flush timed out")
+                return
+            time.sleep(0.01)
+
+
+writer = BatchWriter()
+
+# Slower background work (e.g. LLM calls for conversation titles) runs here so
+# it does not hold up the writer thread.
+_background = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix="background"
+)
+
+
+def _run_logged(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background task {getattr(func, '__name__', func)} failed: {e}", exc_info=True)
+
+
+def run_in_background(func, *args, **kwargs):
+    return _background.submit(_run_logged, func, *args, **kwargs)
+
+
+@atexit.register
+def _flush_on_exit():
+    _background.shutdown(wait=True)
+    writer.flush(timeout=settings.WRITE_BEHIND_FLUSH_TIMEOUT)
@@ -0,0 +1,169 @@
+"""
+Benchmark how many concurrent SSE streams a backend holds.
+
+Compare gunicorn worker classes on a simulated /stream endpoint (each stream
+waits on a fake LLM that emits a token every --token-delay seconds):
+
+    python scripts/bench_stream.py --compare --concurrency 200
+
+Or load a running backend (e.g. started with LLM_NAME pointing at a local or
+fake provider):
+
+    python scripts/bench_stream.py --url http://localhost:7091/stream --concurrency 200
+
+Reports time to first event, total stream time and failures per run.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIMULATED_TOKENS = int(os.getenv("BENCH_TOKENS", 20))
+SIMULATED_TOKEN_DELAY = float(os.getenv("BENCH_TOKEN_DELAY", 0.05))
+
+
+def simulated_app(environ, start_response):
+    """WSGI app standing in for /stream: blocks on I/O like a real LLM call."""
+    start_response(
+        "200 OK",
+        [("Content-Type", "text/event-stream"), ("Cache-Control", "no-cache")],
+    )
+
+    def events():
+        for i in range(SIMULATED_TOKENS):
+            time.sleep(SIMULATED_TOKEN_DELAY)
+            yield f"data: {json.dumps({'answer': f'token{i} '})}\n\n".encode()
+        yield f"data: {json.dumps({'type': 'end'})}\n\n".encode()
+
+    return events()
+
+
+def run_stream(url, payload, timeout):
+    start = time.perf_counter()
+    first_event = None
+    try:
+        with requests.post(url, json=payload, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+                if b'"type": "end"' in line or b'"type": "error"' in line:
+                    break
+    except requests.RequestException as e:
+        return {"ok": False, "error": type(e).__name__}
+    return {"ok": True, "first_event": first_event or 0.0, "total": time.perf_counter() - start}
+
+
+def run_load(url, payload, concurrency, timeout):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: run_stream(url, payload, timeout), range(concurrency)))
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    summary = {"concurrency": concurrency, "ok": len(ok), "failed": len(results) - len(ok), "wall": wall}
+    if ok:
+        first_events = sorted(r["first_event"] for r in ok)
+        totals = sorted(r["total"] for r in ok)
+        summary.update(
+            {
+                "first_event_p50": statistics.median(first_events),
+                "first_event_p95": first_events[int(len(first_events) * 0.95) - 1],
+                "total_p50": statistics.median(totals),
+                "total_p95": totals[int(len(totals) * 0.95) - 1],
+            }
+        )
+    return summary
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def start_gunicorn(worker_class, workers, port):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class, GUNICORN_WORKERS=str(workers))
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "-c", os.path.join(ROOT, "application", "gunicorn.conf.py"),
+            "--bind", f"127.0.0.1:{port}",
+            "--log-level", "warning",
+            "scripts.bench_stream:simulated_app",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    wait_for_port(port)
+    return process
+
+
+def print_summary(label, summary):
+    line = f"{label:<10}{summary['concurrency']:>8}{summary['ok']:>6}{summary['failed']:>8}{summary['wall']:>9.2f}"
+    if summary["ok"]:
+        line += (
+            f"{summary['first_event_p50']:>10.2f}{summary['first_event_p95']:>10.2f}"
+            f"{summary['total_p50']:>10.2f}{summary['total_p95']:>10.2f}"
+        )
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="stream endpoint of a running backend")
+    parser.add_argument("--compare", action="store_true", help="compare gunicorn worker classes on a simulated endpoint")
+    parser.add_argument("--worker-classes", default="sync,gthread,gevent")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--question", default="What are the scope 1 emissions?")
+    parser.add_argument("--active-docs", default="default")
+    args = parser.parse_args()
+
+    if not args.url and not args.compare:
+        parser.error("pass --url or --compare")
+
+    print(f"{'mode':<10}{'streams':>8}{'ok':>6}{'failed':>8}{'wall s':>9}"
+          f"{'ttfe p50':>10}{'ttfe p95':>10}{'total p50':>10}{'total p95':>10}")
+
+    if args.url:
+        payload = {"question": args.question, "history": "[]", "active_docs": args.active_docs, "guide_docs": None}
+        print_summary("url", run_load(args.url, payload, args.concurrency, args.timeout))
+        return
+
+    for worker_class in args.worker_classes.split(","):
+        port = free_port()
+        process = start_gunicorn(worker_class, args.workers, port)
+        try:
+            summary = run_load(f"http://127.0.0.1:{port}/stream", {}, args.concurrency, args.timeout)
+        finally:
+            process.terminate()
+            process.wait()
+        print_summary(worker_class, summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Report which modules dominate import (cold start) time.
+
+Usage:
+    python scripts/import_time_report.py [module] [--top N]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+prints the slowest top-level packages (cumulative time) and modules (self time).
+"""
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def collect_import_times(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(result.returncode)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="application.app")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = collect_import_times(args.module)
+    total_us = max(cumulative for _, _, cumulative in rows)
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.strip().split(".")[0]] += self_us
+
+    print(f"Total import time of {args.module}: {total_us / 1e6:.2f}s\n")
+    print(f"{'package':<40}{'self total (ms)':>18}")
+    for package, self_us in sorted(packages.items(), key=lambda i: i[1], reverse=True)[: args.top]:
+        print(f"{package:<40}{self_us / 1000:>18.1f}")
+
+    print(f"\n{'module':<60}{'self (ms)':>12}{'cumulative (ms)':>18}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"{name.strip():<60}{self_us / 1000:>12.1f}{cumulative_us / 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from application.llm.fake import FakeLLM, FakeLLMError
+from application.llm.llm_creator import LLMCreator
+
+MESSAGES = [{"role": "system", "content": "context"}, {"role": "user", "content": "question"}]
+
+
+def make_llm(**kwargs):
+    options = {"ttft": 0, "tokens_per_second": 0, "jitter": 0, "error_rate": 0, "tokens": 20}
+    options.update(kwargs)
+    return FakeLLM(**options)
+
+
+def test_registered_in_llm_creator():
+    assert isinstance(LLMCreator.create_llm("fake", None, None), FakeLLM)
+
+
+def test_answer_is_deterministic_per_prompt():
+    llm = make_llm()
+    first = list(llm._raw_gen_stream(llm, "model", MESSAGES))
+    assert len(first) == 20
+    assert list(llm._raw_gen_stream(llm, "model", MESSAGES)) == first
+    assert llm._raw_gen(llm, "model", MESSAGES) == "".join(first)
+    other = [{"role": "user", "content": "another question"}]
+    assert list(llm._raw_gen_stream(llm, "model", other)) != first
+    assert llm.reported_usage == {"prompt_tokens": 2, "generated_tokens": 20}
+
+
+def test_timing_follows_ttft_and_rate():
+    llm = make_llm(ttft=0.05, tokens_per_second=200, tokens=11)
+    start = time.monotonic()
+    stream = llm._raw_gen_stream(llm, "model", MESSAGES)
+    next(stream)
+    assert time.monotonic() - start >= 0.05
+    list(stream)
+    assert time.monotonic() - start >= 0.05 + 10 / 200
+
+
+def test_error_rate_injects_failures():
+    llm = make_llm(error_rate=1)
+    with pytest.raises(FakeLLMError):
+        list(llm._raw_gen_stream(llm, "model", MESSAGES))
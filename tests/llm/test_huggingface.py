@@ -0,0 +1,52 @@
+import queue
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.llm.huggingface import HuggingFaceLLM
+
+
+class FakeStreamer:
+    def __init__(self, tokenizer, **kwargs):
+        self.queue = queue.Queue()
+
+    def put_text(self, text):
+        self.queue.put(text)
+
+    def end(self):
+        self.queue.put(None)
+
+    def __iter__(self):
+        while (text := self.queue.get(timeout=5)) is not None:
+            yield text
+
+
+def make_llm(generate):
+    pipeline = MagicMock()
+    pipeline.model.generate.side_effect = generate
+    with patch("application.llm.huggingface.LLMClients.get_instance", return_value=MagicMock(pipeline=pipeline)):
+        return HuggingFaceLLM()
+
+
+MESSAGES = [{"content": "context"}, {"content": "question"}]
+
+
+@patch("transformers.TextIteratorStreamer", FakeStreamer)
+def test_stream_yields_tokens_as_generated():
+    def generate(**kwargs):
+        for text in ["Hello", "", " world"]:
+            kwargs["streamer"].put_text(text)
+        kwargs["streamer"].end()
+
+    llm = make_llm(generate)
+    assert list(llm._raw_gen_stream(llm, "model", MESSAGES)) == ["Hello", " world"]
+
+
+@patch("transformers.TextIteratorStreamer", FakeStreamer)
+def test_stream_raises_generation_errors():
+    def generate(**kwargs):
+        raise RuntimeError("out of memory")
+
+    llm = make_llm(generate)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        list(llm._raw_gen_stream(llm, "model", MESSAGES))
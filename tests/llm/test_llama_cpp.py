@@ -0,0 +1,59 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.llm.llama_cpp import LlamaPool, LlamaPoolBusy, _Instance, build_prompt
+
+
+def make_pool(size, max_queue=1):
+    pool = LlamaPool("model.gguf", size=size, max_queue=max_queue)
+    pool._create = MagicMock(side_effect=lambda: _Instance(MagicMock()))
+    return pool
+
+
+def test_pool_serves_requests_concurrently_up_to_its_size():
+    pool = make_pool(size=2)
+    with pool.acquire(timeout=0) as first, pool.acquire(timeout=0) as second:
+        assert first is not second
+    assert pool._create.call_count == 2
+
+
+def test_pool_times_out_and_refuses_when_queue_is_full():
+    pool = make_pool(size=1, max_queue=1)
+    with pool.acquire():
+        with pytest.raises(LlamaPoolBusy):
+            with pool.acquire(timeout=0.05):
+                pass
+
+        def wait_in_queue():
+            with pytest.raises(LlamaPoolBusy):
+                pool._take(None, 0.5)
+
+        waiting = threading.Thread(target=wait_in_queue)
+        waiting.start()
+        while pool._waiting == 0:
+            pass
+        with pytest.raises(LlamaPoolBusy, match="queue is full"):
+            pool._take(None, 0.5)
+        waiting.join()
+
+
+def test_pool_prefers_instance_with_same_prefix():
+    pool = make_pool(size=2)
+    with pool.acquire(prefix="a") as a, pool.acquire(prefix="b") as b:
+        pass
+    with pool.acquire(prefix="b") as again:
+        assert again is b
+    with pool.acquire(prefix="a") as again:
+        assert again is a
+
+
+def test_build_prompt_context_first_puts_shared_prefix_ahead():
+    messages = [{"content": "context"}, {"content": "question"}]
+    prompt, lead = build_prompt(messages)
+    assert prompt == "### Instruction \n question \n ### Context \n context \n ### Answer \n"
+
+    with patch("application.llm.llama_cpp.settings.LLAMA_CPP_CONTEXT_FIRST", True):
+        prompt, lead = build_prompt(messages)
+    assert prompt.startswith(lead) and lead == "### Context \n context \n"
@@ -0,0 +1,27 @@
+import pytest
+
+from application.llm.llm_creator import LLMCreator
+from application.retriever.retriever_creator import RetrieverCreator
+from application.vectorstore.vector_creator import VectorCreator
+
+
+def test_llm_class_resolved_lazily():
+    from application.llm.openai import OpenAILLM
+
+    assert isinstance(LLMCreator.llms["openai"], str)
+    assert LLMCreator.get_llm_class("OpenAI") is OpenAILLM
+
+
+def test_unknown_llm_type_raises():
+    with pytest.raises(ValueError):
+        LLMCreator.create_llm("does-not-exist", None, None)
+
+
+def test_vectorstore_and_retriever_registries_resolve():
+    from application.retriever.classic_rag import ClassicRAG
+    from application.vectorstore.faiss import FaissStore
+
+    assert VectorCreator.get_vectorstore_class("faiss") is FaissStore
+    assert RetrieverCreator.get_retriever_class("classic") is ClassicRAG
+    with pytest.raises(ValueError):
+        VectorCreator.get_vectorstore_class("does-not-exist")
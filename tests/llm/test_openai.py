@@ -9,3 +9,8 @@ class TestOpenAILLM(unittest.TestCase):
 
     def test_init(self):
         self.assertEqual(self.llm.api_key, self.api_key)
+
+    def test_client_shared_per_api_key(self):
+        other = OpenAILLM(self.api_key, user_api_key="another user")
+        self.assertIs(other.client, self.llm.client)
+        self.assertIsNot(OpenAILLM("other_api_key").client, self.llm.client)
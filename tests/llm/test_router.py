@@ -0,0 +1,84 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from application.llm.base import BaseLLM
+from application.llm.llm_creator import LLMCreator
+from application.llm.router import RoutingLLM, get_backend_stats
+
+
+class FakeBackendLLM(BaseLLM):
+    """Local stand-in for a provider: fixed time to first token, then fast tokens."""
+
+    ttft = {}
+    failing = set()
+
+    def __init__(self, api_key=None, user_api_key=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_key = api_key
+        self.user_api_key = user_api_key
+
+    def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
+        return "".join(self._raw_gen_stream(baseself, model, messages, **kwargs))
+
+    def _raw_gen_stream(self, baseself, model, messages, stream=True, **kwargs):
+        if model in self.failing:
+            raise ConnectionError(f"{model} is down")
+        time.sleep(self.ttft.get(model, 0))
+        for token in ["from ", model]:
+            yield token
+
+
+@pytest.fixture(autouse=True)
+def fake_backends():
+    with patch.dict(LLMCreator.llms, {"fake-backend": FakeBackendLLM}):
+        yield
+    FakeBackendLLM.ttft.clear()
+    FakeBackendLLM.failing.clear()
+
+
+def make_router(*models):
+    return RoutingLLM(backends=[{"llm": "fake-backend", "model": model} for model in models])
+
+
+def stream(router):
+    return "".join(router._raw_gen_stream(router, "ignored", [{"role": "user", "content": "q"}]))
+
+
+def test_routes_to_fastest_backend():
+    FakeBackendLLM.ttft.update({"slow-a": 0.2, "fast-a": 0.0})
+    router = make_router("slow-a", "fast-a")
+    get_backend_stats("fake-backend:slow-a").record_first_token(0.2)
+    get_backend_stats("fake-backend:fast-a").record_first_token(0.01)
+
+    assert [b.model for b in router.ranked_backends()] == ["fast-a", "slow-a"]
+    assert stream(router) == "from fast-a"
+
+
+def test_hedges_after_ttft_deadline_and_cancels_loser():
+    FakeBackendLLM.ttft.update({"stuck-b": 1.0, "quick-b": 0.0})
+    router = make_router("stuck-b", "quick-b")
+
+    start = time.monotonic()
+    with patch("application.llm.router.settings.LLM_ROUTER_HEDGE_AFTER", 0.05):
+        assert stream(router) == "from quick-b"
+    assert time.monotonic() - start < 0.5
+    # the stuck backend is charged at least the time it kept the caller waiting
+    assert get_backend_stats("fake-backend:stuck-b").ttft >= 0.05
+
+
+def test_fails_over_and_opens_circuit():
+    FakeBackendLLM.failing.add("down-c")
+    router = make_router("down-c", "up-c")
+    stats = get_backend_stats("fake-backend:down-c")
+
+    with patch("application.llm.router.settings.LLM_ROUTER_FAILURE_THRESHOLD", 2):
+        assert stream(router) == "from up-c"
+        assert stats.available(time.monotonic())
+        # rank the failing backend first again to hit it a second time
+        with patch.object(RoutingLLM, "ranked_backends", lambda self: list(self.backends)):
+            assert stream(router) == "from up-c"
+
+    assert not stats.available(time.monotonic())
+    assert [b.model for b in router.ranked_backends()] == ["up-c"]
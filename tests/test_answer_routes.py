@@ -0,0 +1,99 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from bson.objectid import ObjectId
+
+from application.api.answer import routes
+from application.app import app
+from application.retriever.context_packer import query_tokens
+
+CONVERSATION_ID = str(ObjectId())
+STORED_QUERIES = [
+    {"prompt": "What is scope 1?", "response": "Direct emissions.", "prompt_tokens": 7, "response_tokens": 3},
+]
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def create_retriever():
+    retriever = MagicMock()
+    retriever.gen.return_value = iter([{"answer": "Scope 2 is indirect."}])
+    retriever.search.return_value = []
+    with patch.object(routes.RetrieverCreator, "create_retriever", return_value=retriever) as create:
+        yield create
+
+
+@patch.object(routes, "save_conversation", return_value=ObjectId(CONVERSATION_ID))
+@patch.object(routes.conversations_collection, "find_one", return_value={"queries": STORED_QUERIES})
+def test_stream_history_uses_stored_token_counts(mock_find_one, mock_save, client, create_retriever):
+    history = [{"prompt": "What is scope 1?", "response": "Direct emissions."}]
+    response = client.post(
+        "/stream",
+        json={"question": "And scope 2?", "history": json.dumps(history), "conversation_id": CONVERSATION_ID},
+    )
+    response.get_data()
+
+    chat_history = create_retriever.call_args.kwargs["chat_history"]
+    assert chat_history == [{**history[0], "prompt_tokens": 7, "response_tokens": 3}]
+    assert query_tokens(chat_history[0]) == 10
+
+
+@patch.object(routes, "save_conversation", return_value=ObjectId(CONVERSATION_ID))
+@patch.object(routes.conversations_collection, "find_one")
+def test_summary_read_with_the_history_lookup(mock_find_one, mock_save, client, create_retriever):
+    summary = {"text": "earlier summary", "turns": 4}
+    mock_find_one.return_value = {"queries": STORED_QUERIES, "summary": summary}
+    history = [{"prompt": "What is scope 1?", "response": "Direct emissions."}]
+    response = client.post(
+        "/stream",
+        json={"question": "And scope 2?", "history": history, "conversation_id": CONVERSATION_ID},
+    )
+    response.get_data()
+
+    mock_find_one.assert_called_once()
+    assert mock_find_one.call_args.args[1]["summary"] == 1
+    assert create_retriever.call_args.kwargs["history_summary"] == summary
+
+
+@patch.object(routes, "save_conversation", return_value=ObjectId(CONVERSATION_ID))
+@patch.object(routes.conversations_collection, "find_one", return_value={"queries": STORED_QUERIES})
+def test_answer_history_without_stored_query_is_unchanged(mock_find_one, mock_save, client, create_retriever):
+    history = [{"prompt": "Edited question", "response": "Other answer."}]
+    response = client.post(
+        "/api/answer",
+        json={"question": "And scope 2?", "history": history, "conversation_id": CONVERSATION_ID},
+    )
+
+    assert response.status_code == 200
+    assert create_retriever.call_args.kwargs["chat_history"] == history
+
+
+@pytest.mark.parametrize("concurrency", [0, -1, "many"])
+def test_batch_rejects_invalid_concurrency(client, concurrency):
+    response = client.post("/api/answer/batch", json={"questions": ["What is scope 1?"], "concurrency": concurrency})
+
+    assert response.status_code == 400
+
+
+@patch.object(routes, "num_tokens_from_string", return_value=1)
+@patch.object(routes, "conversations_collection")
+def test_append_query_never_creates_a_conversation(mock_collection, mock_tokens):
+    routes._append_query(ObjectId(CONVERSATION_ID), {"prompt": "question", "response": "answer"})
+
+    assert mock_collection.update_one.call_args.kwargs.get("upsert", False) is False
+    mock_collection.insert_one.assert_not_called()
+
+
+@patch.object(routes, "run_in_background")
+@patch.object(routes, "writer")
+def test_new_conversation_is_inserted(mock_writer, mock_run_in_background):
+    conversation_id = routes.save_conversation(None, "question", "answer", [])
+
+    func, queued_id, query = mock_writer.call.call_args.args
+    assert func is routes._create_conversation and queued_id == conversation_id
+    assert query["prompt"] == "question"
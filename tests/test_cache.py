@@ -1,5 +1,7 @@
 import unittest
 import json
+
+import pytest
 from unittest.mock import patch, MagicMock
 from application.cache import gen_cache_key, stream_cache, gen_cache
 from application.utils import get_hash
@@ -129,3 +131,125 @@ def test_stream_cache_miss(mock_make_redis):
     
 
 
+
+
+def test_local_cache_lru_and_ttl():
+    from application.cache import LocalCache
+
+    cache = LocalCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    with patch('application.cache.time.monotonic', return_value=0):
+        cache.set("d", 4, ttl=10)
+    with patch('application.cache.time.monotonic', return_value=11):
+        assert cache.get("d") is None
+
+
+@patch('application.cache.get_redis_instance')
+def test_guideline_summary_key_changes_with_source_version(mock_make_redis):
+    from application.retriever.summary_cache import guideline_summary_key
+
+    mock_redis_instance = MagicMock()
+    mock_make_redis.return_value = mock_redis_instance
+
+    mock_redis_instance.get.return_value = b"1"
+    key_v1 = guideline_summary_key("guide", ["chunk a", "chunk b"], "gpt-4o-mini")
+    assert key_v1 == guideline_summary_key("guide", ["chunk b", "chunk a"], "gpt-4o-mini")
+
+    mock_redis_instance.get.return_value = b"2"
+    assert guideline_summary_key("guide", ["chunk a", "chunk b"], "gpt-4o-mini") != key_v1
+
+
+@patch('application.cache._start_invalidation_listener')
+@patch('application.cache.get_redis_instance')
+def test_cached_metadata_read_through_and_invalidation(mock_make_redis, mock_listener):
+    from application.cache import cached_metadata, invalidate_metadata, METADATA_INVALIDATION_CHANNEL
+
+    mock_redis_instance = MagicMock()
+    mock_make_redis.return_value = mock_redis_instance
+    loader = MagicMock(side_effect=["first", "second"])
+
+    assert cached_metadata("prompt", "p1", loader) == "first"
+    assert cached_metadata("prompt", "p1", loader) == "first"
+    assert loader.call_count == 1
+
+    invalidate_metadata("prompt", "p1")
+    mock_redis_instance.publish.assert_called_once_with(METADATA_INVALIDATION_CHANNEL, "prompt:p1")
+    assert cached_metadata("prompt", "p1", loader) == "second"
+
+
+@patch('application.cache.get_redis_instance')
+def test_llm_cache_key_covers_provider_model_and_params(mock_make_redis):
+    from application.cache import llm_cache_key
+
+    class ProviderA:
+        pass
+
+    class ProviderB:
+        pass
+
+    messages = [{'role': 'user', 'content': 'question'}]
+    key = llm_cache_key("gen", ProviderA(), "model-a", messages, {"stream": False, "temperature": 0})
+    assert key.startswith("llm_cache:gen:")
+    assert key == llm_cache_key("gen", ProviderA(), "model-a", messages, {"temperature": 0})
+    assert key != llm_cache_key("gen", ProviderB(), "model-a", messages, {"temperature": 0})
+    assert key != llm_cache_key("gen", ProviderA(), "model-b", messages, {"temperature": 0})
+    assert key != llm_cache_key("gen", ProviderA(), "model-a", messages, {"temperature": 1})
+    assert key != llm_cache_key("stream", ProviderA(), "model-a", messages, {"temperature": 0})
+
+
+@patch('application.cache.get_redis_instance')
+def test_stream_cache_compresses_and_serves_from_local_tier(mock_make_redis):
+    from application.cache import ZSTD_MAGIC, llm_cache_metrics
+
+    mock_redis_instance = MagicMock()
+    mock_make_redis.return_value = mock_redis_instance
+    mock_redis_instance.get.return_value = None
+    calls = []
+
+    @stream_cache
+    def mock_function(self, model, messages, stream):
+        calls.append(1)
+        yield from ["chunk "] * 200
+
+    messages = [{'role': 'user', 'content': 'compress me'}]
+    with patch('application.cache.time.sleep'), patch(
+        'application.cache.settings.LLM_CACHE_METRICS_FLUSH_INTERVAL', 3600
+    ):
+        assert list(mock_function(None, "test_docgpt", messages, stream=True)) == ["chunk "] * 200
+        replayed = list(mock_function(None, "test_docgpt", messages, stream=True))
+    assert "".join(replayed) == "chunk " * 200
+
+    assert len(calls) == 1
+    stored = mock_redis_instance.set.call_args[0][1]
+    assert stored.startswith(ZSTD_MAGIC)
+    assert len(stored) < len(json.dumps(["chunk "] * 200))
+    mock_redis_instance.get.assert_called_once()  # the second call is a local hit
+    assert llm_cache_metrics._counts["stream_local_hits"] >= 1
+
+
+def test_replay_chunks_modes():
+    from application.cache import replay_chunks
+
+    chunks = [f"t{i} " for i in range(20)]
+    assert list(replay_chunks(chunks, "instant")) == chunks
+
+    with patch('application.cache.settings.LLM_CACHE_REPLAY_FRAMES', 4):
+        frames = list(replay_chunks(chunks, "coalesced"))
+    assert len(frames) == 4
+    assert "".join(frames) == "".join(chunks)
+
+    with patch('application.cache.settings.LLM_CACHE_REPLAY_DURATION', 0.5), patch(
+        'application.cache.time.sleep'
+    ) as mock_sleep:
+        frames = list(replay_chunks(chunks, "paced"))
+    assert len(frames) == 10  # one frame per 0.05 s
+    assert "".join(frames) == "".join(chunks)
+    assert mock_sleep.call_count == 9
+    assert sum(call.args[0] for call in mock_sleep.call_args_list) == pytest.approx(0.45)
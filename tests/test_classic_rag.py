@@ -0,0 +1,243 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.retriever.classic_rag import ClassicRAG
+from application.retriever.summary_cache import select_guideline_summaries
+from application.utils import get_hash
+
+
+def fake_vectorstore_data(self, vectorstore, k):
+    return [
+        {"title": f"{vectorstore}-{i}", "text": f"{vectorstore} text {i}", "source": vectorstore}
+        for i in range(k)
+    ]
+
+
+@pytest.fixture
+def llm():
+    llm = MagicMock()
+    llm.gen.return_value = "guideline summary"
+    llm.gen_stream.return_value = iter(["an", "swer"])
+    with patch.object(ClassicRAG, "_get_data_from_vectorstore", fake_vectorstore_data), patch(
+        "application.retriever.classic_rag.LLMCreator.create_llm", return_value=llm
+    ), patch("application.retriever.classic_rag.get_guideline_summary", return_value=None), patch(
+        "application.retriever.classic_rag.set_guideline_summary"
+    ):
+        yield llm
+
+
+def make_retriever(**kwargs):
+    return ClassicRAG(
+        question="What are scope 1 emissions?",
+        source={"active_docs": "primary", "guide_docs": "guide"},
+        chunks=2,
+        gpt_model="gpt-4o-mini",
+        **kwargs,
+    )
+
+
+def test_gen_yields_primary_sources_then_summary_then_answer(llm):
+    retriever = make_retriever()
+    lines = list(retriever.gen())
+
+    sources = [line["source"] for line in lines if "source" in line]
+    assert [doc["title"] for doc in sources] == ["primary-0", "primary-1", "Summarized_Guidelines"]
+    assert sources[-1]["text"] == "guideline summary"
+    assert "".join(line["answer"] for line in lines if "answer" in line) == "answer"
+
+    timings = retriever.get_params()["timings"]
+    for stage in ["guideline_retrieval", "primary_retrieval", "guideline_summary", "retrieval_total"]:
+        assert stage in timings
+
+
+def test_guideline_summary_runs_outside_the_retrieval_pool(llm):
+    threads = []
+
+    def gen(**kwargs):
+        threads.append(threading.current_thread().name)
+        return "guideline summary"
+
+    llm.gen.side_effect = gen
+    list(make_retriever().gen())
+
+    assert len(threads) == 1 and threads[0].startswith("retriever-summary")
+
+
+def test_guideline_summary_error_reaches_gen(llm):
+    llm.gen.side_effect = RuntimeError("provider down")
+    with pytest.raises(RuntimeError, match="provider down"):
+        list(make_retriever().gen())
+
+
+def test_search_reuses_retrieval_from_gen(llm):
+    retriever = make_retriever()
+    with patch.object(
+        ClassicRAG, "_get_data_from_vectorstore", side_effect=fake_vectorstore_data, autospec=True
+    ) as mock_search:
+        list(retriever.gen())
+        docs = retriever.search()
+
+    assert mock_search.call_count == 2  # one guideline search and one primary search
+    assert [doc["title"] for doc in docs] == ["primary-0", "primary-1", "Guidelines_doc"]
+
+    # callers truncating the returned docs must not affect the retrieved ones
+    docs[0]["text"] = "truncated"
+    assert retriever.search()[0]["text"] == "primary text 0"
+
+
+def test_gen_packs_recent_history_before_question(llm):
+    history = [
+        {"prompt": "old question", "response": "old answer", "prompt_tokens": 100, "response_tokens": 100},
+        {"prompt": "last question", "response": "last answer", "prompt_tokens": 10, "response_tokens": 10},
+    ]
+    retriever = make_retriever(chat_history=history, token_limit=50)
+    list(retriever.gen())
+
+    messages = llm.gen_stream.call_args.kwargs["messages"]
+    assert [message["content"] for message in messages[1:3]] == ["last question", "last answer"]
+    assert messages[-1]["content"].startswith("What are scope 1 emissions?")
+    assert retriever.get_params()["context_tokens"]["history"] == 20
+
+
+def test_create_batch_searches_once_and_shares_guideline_summary(llm):
+    questions = ["first question", "second question", "third question"]
+
+    def fake_search_batch(self, vectorstore, questions, k, vectors, with_scores=False):
+        return [fake_vectorstore_data(self, f"{vectorstore}-{question}", k) for question in questions]
+
+    embeddings = MagicMock()
+    with patch.object(
+        ClassicRAG, "_search_batch", side_effect=fake_search_batch, autospec=True
+    ) as mock_search, patch("application.retriever.classic_rag.get_embeddings", return_value=embeddings):
+        retrievers = ClassicRAG.create_batch(
+            questions, {"active_docs": "primary", "guide_docs": "guide"}, chunks=2, gpt_model="gpt-4o-mini"
+        )
+        answers = [list(retriever.gen()) for retriever in retrievers]
+
+    embeddings.embed_documents.assert_called_once_with(questions)
+    assert mock_search.call_count == 2  # one search per source for the whole batch
+    assert llm.gen.call_count == 1  # one guideline summary for the whole batch
+    first_sources = [line["source"]["title"] for line in answers[0] if "source" in line]
+    assert first_sources == ["primary-first question-0", "primary-first question-1", "Summarized_Guidelines"]
+
+
+def test_gen_replaces_summarized_turns_with_summary(llm):
+    history = [{"prompt": f"question {i}", "response": f"answer {i}"} for i in range(6)]
+    retriever = make_retriever(
+        chat_history=history, token_limit=1000, history_summary={"text": "earlier summary", "turns": 4}
+    )
+    list(retriever.gen())
+
+    contents = [message["content"] for message in llm.gen_stream.call_args.kwargs["messages"]]
+    assert contents[1] == "Summary of the earlier conversation:\nearlier summary"
+    assert contents[2:6] == ["question 4", "answer 4", "question 5", "answer 5"]
+
+
+def stored_summary(title, level, chunk_texts):
+    return {
+        "title": title,
+        "text": f"{title} text",
+        "summary_level": level,
+        "token_count": 10,
+        "chunks": [get_hash(text) for text in chunk_texts],
+    }
+
+
+def test_gen_uses_guideline_summaries_stored_at_ingest(llm):
+    # the search only returns raw chunks, which outrank any summary
+    stored = [
+        stored_summary("other section", "section", ["guide text 9"]),
+        stored_summary("guide document", "document", ["guide text 0", "guide text 1", "guide text 9"]),
+        stored_summary("second section", "section", ["guide text 1"]),
+        stored_summary("first section", "section", ["guide text 0"]),
+    ]
+    retriever = make_retriever()
+    with patch(
+        "application.retriever.classic_rag.load_guideline_summaries", return_value=stored
+    ) as load:
+        lines = list(retriever.gen())
+        search_docs = retriever.search()
+
+    load.assert_called_once_with("guide")
+    summary = [line["source"] for line in lines if "source" in line][-1]
+    assert summary["text"] == "first section text\n\nsecond section text"
+    llm.gen.assert_not_called()
+    assert "section text" not in search_docs[-1]["text"]
+
+
+def test_select_guideline_summaries_without_covered_chunks():
+    stored = [
+        stored_summary("a section", "section", ["x"]),
+        stored_summary("a document", "document", ["x"]),
+    ]
+    selected = select_guideline_summaries(stored, [{"text": "unrelated"}], limit=1)
+    assert [doc["title"] for doc in selected] == ["a document"]
+    assert selected[0]["summary_level"] == "document"
+
+
+def test_adaptive_k_follows_scores(llm):
+    scores = [0.82, 0.8, 0.77, 0.52, 0.5, 0.3]
+
+    def scored_vectorstore_data(self, vectorstore, k):
+        docs = fake_vectorstore_data(self, vectorstore, k)
+        for doc, score in zip(docs, scores):
+            doc["score"] = score
+        return docs[:len(scores)]
+
+    retriever = make_retriever()
+    retriever.chunks = 5
+    with patch.object(ClassicRAG, "_get_data_from_vectorstore", scored_vectorstore_data), patch(
+        "application.retriever.classic_rag.settings.RETRIEVAL_ADAPTIVE_K", True
+    ), patch("application.retriever.adaptive_k.settings.RETRIEVAL_SCORE_GAP", 0.1):
+        docs = retriever.search()
+
+    # the 0.77 -> 0.52 drop is the elbow
+    assert [doc["title"] for doc in docs[:-1]] == ["primary-0", "primary-1", "primary-2"]
+    assert retriever.get_params()["retrieved_k"] == 3
+
+
+def test_adaptive_k_never_exceeds_requested_chunks(llm):
+    searched = []
+
+    def scored_vectorstore_data(self, vectorstore, k):
+        searched.append((vectorstore, k))
+        docs = fake_vectorstore_data(self, vectorstore, k)
+        for doc in docs:
+            doc["score"] = 0.9
+        return docs
+
+    retriever = make_retriever()
+    with patch.object(ClassicRAG, "_get_data_from_vectorstore", scored_vectorstore_data), patch(
+        "application.retriever.classic_rag.settings.RETRIEVAL_ADAPTIVE_K", True
+    ):
+        retriever.search()
+
+    assert ("primary", 2) in searched
+    assert retriever.get_params()["retrieved_k"] == 2
+
+
+def test_create_batch_applies_adaptive_k_per_question(llm):
+    def scored(name, scores):
+        return [(SimpleNamespace(page_content=f"{name} {i}", metadata={"title": f"{name}-{i}"}), score)
+                for i, score in enumerate(scores)]
+
+    docsearch = MagicMock()
+    docsearch.search_batch_with_scores.return_value = [
+        scored("first", [0.9, 0.88, 0.5]),
+        scored("second", [0.9, 0.85, 0.84, 0.83]),
+    ]
+    docsearch.search_batch.return_value = [[], []]
+    with patch("application.retriever.classic_rag.VectorCreator.create_vectorstore", return_value=docsearch), patch(
+        "application.retriever.classic_rag.get_embeddings"
+    ), patch("application.retriever.classic_rag.settings.RETRIEVAL_ADAPTIVE_K", True), patch(
+        "application.retriever.adaptive_k.settings.RETRIEVAL_SCORE_GAP", 0.1
+    ):
+        retrievers = ClassicRAG.create_batch(
+            ["first question", "second question"], {"active_docs": "primary"}, chunks=5, gpt_model="gpt-4o-mini"
+        )
+
+    assert docsearch.search_batch_with_scores.call_args.kwargs["k"] == 5
+    assert [r.get_params()["retrieved_k"] for r in retrievers] == [2, 4]
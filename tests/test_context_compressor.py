@@ -0,0 +1,49 @@
+import numpy as np
+
+from application.retriever.context_compressor import compress_docs, split_sentences
+
+
+class KeywordEmbeddings:
+    """Embeds text as keyword counts, so similarity follows shared keywords."""
+
+    keywords = ["scope", "emissions", "water", "board"]
+
+    def embed_documents(self, texts):
+        return np.array(
+            [[text.lower().count(word) for word in self.keywords] for text in texts],
+            dtype=np.float32,
+        )
+
+
+def test_split_sentences():
+    assert split_sentences("One. Two? Three!\n\nFour") == ["One.", "Two?", "Three!", "Four"]
+
+
+def test_compress_docs_keeps_best_sentences_with_context():
+    docs = [
+        {
+            "title": "report.pdf",
+            "source": "local",
+            "text": "The board met twice. Scope 1 emissions were 120 tCO2e. "
+                    "Water use fell by 3%. The board approved the budget.",
+        },
+        {"title": "water.pdf", "source": "local", "text": "Water use was 40 ML. Water is recycled."},
+    ]
+    query = KeywordEmbeddings().embed_documents(["scope emissions"])[0]
+
+    compressed = compress_docs(docs, query, KeywordEmbeddings(), budget=22, window=1)
+
+    assert compressed == [
+        {
+            "title": "report.pdf",
+            "source": "local",
+            "text": "The board met twice. Scope 1 emissions were 120 tCO2e. Water use fell by 3%.",
+            "token_count": 20,
+        }
+    ]
+    assert docs[0]["text"].endswith("budget.")
+
+
+def test_compress_docs_skips_docs_within_budget():
+    docs = [{"title": "a", "text": "Short text.", "source": "local"}]
+    assert compress_docs(docs, np.ones(4), None, budget=100) is docs
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from application.retriever.context_packer import context_budget, pack_docs, pack_history
+
+
+def test_pack_docs_uses_stored_token_counts_in_rank_order():
+    docs = [
+        {"title": "a", "text": "x" * 400, "token_count": 60},
+        {"title": "b", "text": "short", "token_count": 50},
+        {"title": "c", "text": "short", "token_count": 30},
+    ]
+    packed, used = pack_docs(docs, budget=100)
+    assert [doc["title"] for doc in packed] == ["a", "c"]
+    assert used == 90
+
+
+def test_pack_history_keeps_most_recent_queries():
+    history = [
+        {"prompt": "first", "response": "one", "prompt_tokens": 10, "response_tokens": 10},
+        {"prompt": "second", "response": "two", "prompt_tokens": 10, "response_tokens": 10},
+        {"prompt": "third", "response": "three", "prompt_tokens": 10, "response_tokens": 10},
+    ]
+    packed, used = pack_history(history, budget=45)
+    assert [query["prompt"] for query in packed] == ["second", "third"]
+    assert used == 40
+
+
+def test_context_budget_reserves_answer_and_prompt_tokens():
+    with patch("application.retriever.context_packer.settings") as settings:
+        settings.MODEL_TOKEN_LIMITS = {"small-model": 2000}
+        settings.DEFAULT_CONTEXT_LIMIT = 8192
+        settings.RESPONSE_TOKEN_RESERVE = 1000
+        assert context_budget("small-model", "x" * 396) == 900
+        assert context_budget("unknown-model") == 7192
@@ -0,0 +1,56 @@
+import threading
+
+import numpy as np
+import pytest
+
+from application.vectorstore.base import RemoteEmbeddingsWrapper
+from application.vectorstore.embeddings_server import EmbeddingsBatcher, create_server
+
+
+class FakeEmbeddings:
+    dimension = 2
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def server():
+    embeddings = FakeEmbeddings()
+    server = create_server(embeddings, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, embeddings
+    server.shutdown()
+    server.server_close()
+
+
+def test_remote_embeddings_roundtrip(server):
+    http_server, _ = server
+    host, port = http_server.server_address
+    client = RemoteEmbeddingsWrapper(f"http://{host}:{port}", batch_size=2)
+
+    assert client.dimension == 2
+    query = client.embed_query("abc")
+    assert query.dtype == np.float32
+    assert query.flags.writeable
+    assert query.tolist() == pytest.approx([3 / np.sqrt(10), 1 / np.sqrt(10)])
+    documents = client.embed_documents(["a", "bb", "ccc"])
+    assert documents.shape == (3, 2)
+    assert np.linalg.norm(documents, axis=1) == pytest.approx([1.0, 1.0, 1.0])
+
+
+def test_batcher_combines_concurrent_requests():
+    embeddings = FakeEmbeddings()
+    batcher = EmbeddingsBatcher(embeddings, max_batch=10, max_wait_ms=200)
+
+    first = batcher.submit(["a"])
+    second = batcher.submit(["bb", "ccc"])
+
+    assert first.result(timeout=5).tolist() == [[1.0, 1.0]]
+    assert second.result(timeout=5).tolist() == [[2.0, 1.0], [3.0, 1.0]]
+    assert embeddings.calls == [["a", "bb", "ccc"]]
@@ -0,0 +1,61 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from langchain.docstore.document import Document
+
+from application.parser.guideline_summaries import build_guideline_summaries
+from application.utils import get_hash
+
+
+@patch("application.parser.guideline_summaries.num_tokens_from_string", side_effect=len)
+def test_builds_section_and_document_summaries(mock_tokens):
+    docs = [Document(page_content=f"ghg chunk {i}", metadata={"title": "ghg.pdf"}) for i in range(3)]
+    docs.append(Document(page_content="water chunk", metadata={"title": "water.pdf"}))
+    llm = MagicMock()
+    llm.gen.side_effect = lambda model, messages, max_tokens: f"summary of {messages[0]['content'][-11:]}"
+
+    with patch("application.parser.guideline_summaries.settings.GUIDELINE_SECTION_CHUNKS", 2):
+        summaries = build_guideline_summaries(docs, llm=llm, model="gpt-4o-mini")
+
+    levels = [(summary["title"], summary["summary_level"]) for summary in summaries]
+    assert levels == [
+        ("ghg.pdf - section 1 summary", "section"),
+        ("ghg.pdf - section 2 summary", "section"),
+        ("water.pdf - section 1 summary", "section"),
+        ("ghg.pdf - summary", "document"),  # only files with several sections are rolled up
+    ]
+    assert summaries[1]["text"] == "summary of ghg chunk 2"
+    assert summaries[1]["chunks"] == [get_hash("ghg chunk 2")]
+    assert len(summaries[3]["chunks"]) == 3
+    assert all(summary["token_count"] == len(summary["text"]) for summary in summaries)
+
+
+def test_remote_and_synced_guides_get_summaries(tmp_path, monkeypatch):
+    from application import worker
+
+    monkeypatch.chdir(tmp_path)  # remote_worker works in ./temp
+
+    docs = [Document(page_content="guide text", metadata={"title": "guide.md", "token_count": 3})]
+    summary = {"title": "guide.md - summary", "text": "summary", "summary_level": "document", "token_count": 5}
+    task = MagicMock()
+    with patch.object(worker, "sources_collection") as sources, patch.object(
+        worker, "RemoteCreator"
+    ), patch.object(worker, "group_split", return_value=docs), patch.object(
+        worker, "add_token_counts"
+    ), patch.object(
+        worker, "build_guideline_summaries", return_value=[summary]
+    ) as build, patch.object(worker, "call_openai_api") as call_openai_api, patch.object(
+        worker, "upload_index"
+    ) as upload_index:
+        sources.find.return_value = [
+            {"_id": "6530a3a0f1c2b3a4d5e6f708", "sync_frequency": "daily", "doc_type": "guide",
+             "name": "guide", "user": "local", "type": "url", "remote_data": "https://example.com"}
+        ]
+        assert worker.sync_worker(task, "daily")["sync_success"] == 1
+
+    build.assert_called_once_with(docs)
+    assert call_openai_api.call_args.args[0] == docs  # summaries are stored, not indexed
+    assert json.loads(upload_index.call_args.args[1]["guideline_summaries"]) == [summary]
+    assert upload_index.call_args.args[1]["doc_type"] == "guide"
+    # the source's size excludes the summaries derived from it
+    assert upload_index.call_args.args[1]["tokens"] == 3
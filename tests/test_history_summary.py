@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from bson.objectid import ObjectId
+
+from application.retriever import history_summary
+
+
+def make_queries(n):
+    return [{"prompt": f"question {i}", "response": f"answer {i}"} for i in range(n)]
+
+
+@patch.object(history_summary, "LLMCreator")
+@patch.object(history_summary, "conversations_collection")
+def test_update_folds_turns_outside_recent_window(mock_collection, mock_llm_creator):
+    conversation_id = str(ObjectId())
+    mock_collection.find_one.return_value = {
+        "queries": make_queries(7),
+        "summary": {"text": "earlier summary", "turns": 1},
+    }
+    llm = mock_llm_creator.create_llm.return_value
+    llm.gen.return_value = " new summary "
+
+    with patch.object(history_summary.settings, "HISTORY_RECENT_TURNS", 4):
+        summary = history_summary.update_history_summary(conversation_id, "gpt-4o-mini")
+
+    assert summary == {"text": "new summary", "turns": 3}
+    messages = llm.gen.call_args.kwargs["messages"]
+    assert messages[0] == {"role": "system", "content": history_summary.SUMMARY_SYSTEM_PROMPT}
+    assert messages[1]["role"] == "user"
+    context = messages[1]["content"]
+    assert context.startswith("Summary of the conversation so far:\nearlier summary")
+    assert "question 1" in context and "question 2" in context
+    assert "question 0" not in context and "question 3" not in context
+    mock_collection.update_one.assert_called_once_with(
+        {"_id": ObjectId(conversation_id), "summary.turns": 1},
+        {"$set": {"summary": summary}},
+    )
+
+
+@patch.object(history_summary, "LLMCreator")
+@patch.object(history_summary, "conversations_collection")
+def test_update_skips_short_conversations(mock_collection, mock_llm_creator):
+    mock_collection.find_one.return_value = {"queries": make_queries(3)}
+
+    with patch.object(history_summary.settings, "HISTORY_RECENT_TURNS", 4):
+        assert history_summary.update_history_summary(str(ObjectId()), "gpt-4o-mini") is None
+
+    mock_llm_creator.create_llm.assert_not_called()
+    mock_collection.update_one.assert_not_called()
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from application.retriever import semantic_cache as semantic_cache_module
+from application.retriever.semantic_cache import CachedAnswerRetriever, SemanticCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+        self.results = []
+
+    def pipeline(self, transaction=True):
+        self.results = []
+        return self
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+    def get(self, key):
+        self.results.append(self.values.get(key))
+
+    def append(self, key, value):
+        self.values[key] = self.values.get(key, b"") + value
+        self.results.append(len(self.values[key]))
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value.encode("utf-8"))
+        self.results.append(len(self.lists[key]))
+
+    def lrange(self, key, start, end):
+        self.results.append(list(self.lists.get(key, [])))
+
+    def expire(self, key, ttl):
+        self.results.append(True)
+
+    def register_script(self, script):
+        # the trim script, applied to the fake's data
+        def trim(keys, args):
+            vectors_key, entries_key = keys
+            max_entries, row_bytes, _ = args
+            excess = len(self.lists.get(entries_key, [])) - max_entries
+            if excess > 0:
+                self.values[vectors_key] = self.values[vectors_key][excess * row_bytes:]
+                self.lists[entries_key] = self.lists[entries_key][excess:]
+            return max(excess, 0)
+
+        return trim
+
+
+class FakeEmbeddings:
+    vectors = {
+        "What are scope 1 emissions?": [1.0, 0.0, 0.0],
+        "what are scope 1 emissions": [0.99, 0.05, 0.0],
+        "How is water usage reported?": [0.0, 1.0, 0.0],
+    }
+
+    def embed_query(self, text):
+        return np.array(self.vectors[text], dtype=np.float32)
+
+
+@pytest.fixture
+def fake_redis():
+    fake_redis = FakeRedis()
+    semantic_cache_module._local_indexes.clear()
+    with patch.object(semantic_cache_module, "get_redis_instance", return_value=fake_redis), patch.object(
+        semantic_cache_module, "get_source_version", return_value=0
+    ), patch.object(semantic_cache_module, "get_embeddings", return_value=FakeEmbeddings()):
+        yield fake_redis
+
+
+def make_cache(active_docs="primary"):
+    return SemanticCache({"active_docs": active_docs, "guide_docs": "guide"}, "default", "gpt-4o-mini", 2)
+
+
+def test_near_duplicate_question_replays_answer(fake_redis):
+    sources = [{"title": "doc", "text": "scope 1 text", "source": "primary"}]
+    make_cache().store("What are scope 1 emissions?", "Direct emissions.", sources, sources)
+
+    entry = make_cache().lookup("what are scope 1 emissions")
+    assert entry["answer"] == "Direct emissions."
+    assert entry["score"] > 0.95
+
+    retriever = CachedAnswerRetriever("what are scope 1 emissions", entry)
+    assert list(retriever.gen()) == [{"source": sources[0]}, {"answer": "Direct emissions."}]
+
+    assert make_cache().lookup("How is water usage reported?") is None
+    assert make_cache(active_docs="other").lookup("what are scope 1 emissions") is None
+
+
+def test_expired_entries_are_not_replayed(fake_redis):
+    make_cache().store("What are scope 1 emissions?", "Direct emissions.", [], [])
+
+    with patch.object(semantic_cache_module.settings, "SEMANTIC_CACHE_TTL", -1):
+        assert make_cache().lookup("What are scope 1 emissions?") is None
+
+
+def test_trim_keeps_vectors_and_entries_aligned(fake_redis):
+    with patch.object(semantic_cache_module.settings, "SEMANTIC_CACHE_MAX_ENTRIES", 2):
+        make_cache().store("What are scope 1 emissions?", "Direct emissions.", [], [])
+        make_cache().store("How is water usage reported?", "In cubic metres.", [], [])
+        make_cache().store("what are scope 1 emissions", "Scope 1 again.", [], [])
+
+    cache = make_cache()
+    assert len(fake_redis.lists[cache.entries_key]) == 2
+    assert len(fake_redis.values[cache.vectors_key]) == 2 * 3 * 4
+    assert cache.lookup("How is water usage reported?")["answer"] == "In cubic metres."
+    assert cache.lookup("what are scope 1 emissions")["answer"] == "Scope 1 again."
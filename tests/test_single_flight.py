@@ -0,0 +1,215 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.single_flight import gen_single_flight, stream_single_flight
+
+MESSAGES = [{"role": "user", "content": "question"}]
+
+
+class FakeLLM:
+    pass
+
+
+@patch("application.single_flight.get_redis_instance", return_value=None)
+def test_concurrent_streams_share_one_provider_call(mock_redis):
+    release = threading.Event()
+    calls = []
+
+    @stream_single_flight
+    def raw_stream(self, model, messages, stream):
+        calls.append(model)
+        release.wait(5)
+        yield from ["a", "b", "c"]
+
+    results = []
+
+    def consume():
+        results.append("".join(raw_stream(FakeLLM(), "model", MESSAGES, True)))
+
+    threads = [threading.Thread(target=consume) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ["model"]
+    assert results == ["abc", "abc", "abc"]
+
+
+@patch("application.single_flight.get_redis_instance", return_value=None)
+def test_provider_is_closed_when_every_subscriber_leaves(mock_redis):
+    next_chunk = threading.Event()
+    closed = threading.Event()
+    produced = []
+
+    @stream_single_flight
+    def raw_stream(self, model, messages, stream):
+        try:
+            for chunk in ["a", "b", "c", "d"]:
+                produced.append(chunk)
+                yield chunk
+                next_chunk.wait(5)
+        finally:
+            closed.set()
+
+    stream = raw_stream(FakeLLM(), "model", MESSAGES, True)
+    assert next(stream) == "a"
+    stream.close()  # the client disconnects
+    next_chunk.set()
+
+    assert closed.wait(5)
+    assert produced == ["a", "b"]
+
+
+@patch("application.single_flight.get_redis_instance", return_value=None)
+def test_leader_error_reaches_followers(mock_redis):
+    release = threading.Event()
+
+    @gen_single_flight
+    def raw_gen(self, model, messages, stream=False):
+        release.wait(5)
+        raise RuntimeError("provider down")
+
+    errors = []
+
+    def call():
+        try:
+            raw_gen(FakeLLM(), "model", MESSAGES, stream=False)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["provider down", "provider down"]
+
+
+@patch("application.single_flight.get_redis_instance")
+def test_follows_flight_led_by_another_worker(mock_get_redis):
+    redis_client = MagicMock()
+    redis_client.set.return_value = False  # the lock is held elsewhere
+    redis_client.xread.return_value = [
+        (b"stream", [(b"1-0", {b"c": b"Hello "}), (b"2-0", {b"c": b"world"}), (b"3-0", {b"d": b"1"})])
+    ]
+    mock_get_redis.return_value = redis_client
+    raw = MagicMock()
+
+    @stream_single_flight
+    def raw_stream(self, model, messages, stream):
+        raw()
+        yield "own answer"
+
+    assert list(raw_stream(FakeLLM(), "model", MESSAGES, True)) == ["Hello ", "world"]
+    raw.assert_not_called()
+
+
+@patch("application.single_flight.get_redis_instance")
+def test_calls_provider_when_remote_leader_is_lost(mock_get_redis):
+    redis_client = MagicMock()
+    redis_client.set.return_value = False
+    redis_client.xread.return_value = []
+    redis_client.exists.return_value = False  # lock expired without any chunk
+    mock_get_redis.return_value = redis_client
+
+    @gen_single_flight
+    def raw_gen(self, model, messages, stream=False):
+        return "own answer"
+
+    assert raw_gen(FakeLLM(), "model", MESSAGES, stream=False) == "own answer"
+
+
+@patch("application.single_flight.get_redis_instance")
+def test_leader_publishes_for_other_workers(mock_get_redis):
+    redis_client = MagicMock()
+    redis_client.set.return_value = True
+    pipe = redis_client.pipeline.return_value
+    mock_get_redis.return_value = redis_client
+
+    @stream_single_flight
+    def raw_stream(self, model, messages, stream):
+        yield from ["a", "b"]
+
+    assert list(raw_stream(FakeLLM(), "model", MESSAGES, True)) == ["a", "b"]
+    published = [c.args[1] for c in pipe.xadd.call_args_list]
+    assert "".join(p.get("c", "") for p in published) == "ab"
+    assert published[-1] == {"d": 1}
+
+
+class SharedRedis:
+    """The Redis calls RedisFlight makes, shared by the simulated workers."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def exists(self, key):
+        return key in self.data
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def xadd(self, key, fields):
+        stream = self.data.setdefault(key, [])
+        stream.append((f"{len(stream) + 1}-0".encode(), {k.encode(): str(v).encode() for k, v in fields.items()}))
+
+    def expire(self, key, ttl):
+        pass
+
+    def pipeline(self):
+        redis_client = self
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return getattr(redis_client, name)
+
+            def execute(self):
+                pass
+
+        return Pipeline()
+
+    def xread(self, streams, block=None, count=None):
+        ((key, last_id),) = streams.items()
+        entries = [entry for entry in self.data.get(key, []) if entry[0] > str(last_id).encode()]
+        return [(key.encode(), entries)] if entries else []
+
+
+def test_leader_error_is_not_served_to_other_workers():
+    shared = SharedRedis()
+    fail = [True]
+
+    @gen_single_flight
+    def raw_gen(self, model, messages, stream=False):
+        if fail[0]:
+            raise RuntimeError("provider down")
+        return "answer"
+
+    with patch("application.single_flight.get_redis_instance", return_value=shared):
+        with pytest.raises(RuntimeError, match="provider down"):
+            raw_gen(FakeLLM(), "model", MESSAGES, stream=False)
+        assert shared.data == {}  # neither the lock nor the stream outlives the error
+
+        # the same question on another worker leads a new flight
+        fail[0] = False
+        assert raw_gen(FakeLLM(), "model", MESSAGES, stream=False) == "answer"
+
+
+def test_disabled_calls_through():
+    with patch("application.single_flight.settings.LLM_SINGLE_FLIGHT_ENABLED", False):
+        @gen_single_flight
+        def raw_gen(self, model, messages, stream=False):
+            return threading.current_thread().name
+
+        assert raw_gen(FakeLLM(), "model", MESSAGES, stream=False) == threading.current_thread().name
@@ -0,0 +1,115 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from application.cache import _llm_local_cache
+from application.llm.base import BaseLLM
+from application.usage import _count_usage, stream_token_usage
+
+
+class FakeLLM:
+    user_api_key = "key"
+
+    def __init__(self):
+        self.token_usage = {"prompt_tokens": 0, "generated_tokens": 0}
+
+
+@patch("application.usage.writer")
+@patch("application.usage.num_tokens_from_string")
+def test_count_usage_prefers_provider_reported_usage(mock_tokens, mock_writer):
+    llm = FakeLLM()
+    messages = [{"role": "system", "content": "context"}, {"role": "user", "content": "question"}]
+
+    _count_usage(llm, messages, "answer", {"prompt_tokens": 12, "generated_tokens": 3}, None)
+
+    mock_tokens.assert_not_called()
+    record = mock_writer.insert.call_args[0][1]
+    assert (record["prompt_tokens"], record["generated_tokens"]) == (12, 3)
+    assert llm.token_usage == {"prompt_tokens": 12, "generated_tokens": 3}
+
+
+@patch("application.usage.writer")
+@patch("application.usage.num_tokens_from_string", side_effect=len)
+def test_count_usage_falls_back_to_one_count_each(mock_tokens, mock_writer):
+    llm = FakeLLM()
+    messages = [{"role": "system", "content": "context"}, {"role": "user", "content": "question"}]
+
+    _count_usage(llm, messages, "an answer", None, None)
+
+    assert mock_tokens.call_count == 2
+    record = mock_writer.insert.call_args[0][1]
+    assert (record["prompt_tokens"], record["generated_tokens"]) == (len("context\nquestion"), 9)
+
+
+@patch("application.usage.record_token_usage")
+def test_stream_usage_recorded_when_client_disconnects(mock_record):
+    @stream_token_usage
+    def raw_stream(self, model, messages, stream):
+        yield from ["a", "b", "c"]
+
+    llm = MagicMock()
+    stream = raw_stream(llm, "model", [], True)
+    assert next(stream) == "a"
+    mock_record.assert_not_called()  # nothing counted while streaming
+    stream.close()
+
+    mock_record.assert_called_once_with(llm, [], "a")
+
+
+class ProviderLLM(BaseLLM):
+    user_api_key = "key"
+
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+        self.calls = 0
+
+    def _raw_gen(self, baseself, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        self.release.wait(5)
+        return "answer"
+
+    def _raw_gen_stream(self, baseself, model, messages, stream=True, **kwargs):
+        self.calls += 1
+        self.release.wait(5)
+        yield from ["an", "swer"]
+
+
+@pytest.fixture
+def local_only():
+    _llm_local_cache.clear()
+    with patch("application.cache.get_redis_instance", return_value=None), patch(
+        "application.single_flight.get_redis_instance", return_value=None
+    ), patch("application.usage.record_token_usage") as mock_record:
+        yield mock_record
+    _llm_local_cache.clear()
+
+
+@pytest.mark.parametrize("method", ["gen", "gen_stream"])
+def test_usage_recorded_once_per_provider_call(local_only, method):
+    release = threading.Event()
+    llm = ProviderLLM(release)
+    messages = [{"role": "user", "content": f"usage question for {method}"}]
+    results = []
+
+    def ask():
+        result = getattr(llm, method)(model="model", messages=messages)
+        results.append(result if method == "gen" else "".join(result))
+
+    # a leader and a single-flight follower, then a cache hit
+    threads = [threading.Thread(target=ask) for _ in range(2)]
+    threads[0].start()
+    while not llm.calls:
+        time.sleep(0.01)
+    threads[1].start()
+    time.sleep(0.1)  # the follower joins the flight while the provider call is pending
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    ask()
+
+    assert results == ["answer"] * 3
+    assert llm.calls == 1
+    local_only.assert_called_once_with(llm, messages, "answer")
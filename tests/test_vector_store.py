@@ -3,6 +3,9 @@ Tests regarding the vector store class, including checking
 compatibility between different transformers and local vector
 stores (index.faiss)
 """
+from unittest.mock import patch
+
+import numpy as np
 import pytest
 from application.vectorstore.faiss import FaissStore
 from application.core.settings import settings
@@ -39,3 +42,71 @@ def test_init_local_faiss_store_huggingface():
     with pytest.raises(ValueError) as exc_info:
         FaissStore("", None)
     assert "Embedding dimension mismatch" in str(exc_info.value)
+
+
+class FakeEmbeddings:
+    dimension = 3
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+    def __call__(self, text):
+        return self.embed_query(text)
+
+
+def test_faiss_add_texts_uses_float32_batch():
+    from langchain.docstore.document import Document
+
+    with patch.object(FaissStore, "_get_embeddings", return_value=FakeEmbeddings()):
+        store = FaissStore("", None, docs_init=[Document(page_content="a")])
+        ids = store.add_texts(["bbbb", "cccccccc"], metadatas=[{"n": 1}, {"n": 2}])
+
+    assert len(ids) == 2
+    assert store.docsearch.index.ntotal == 3
+    results = store.search("cccccccc", k=1)
+    assert results[0].page_content == "cccccccc"
+    assert results[0].metadata == {"n": 2}
+
+
+def test_faiss_search_batch_matches_single_searches():
+    from langchain.docstore.document import Document
+
+    with patch.object(FaissStore, "_get_embeddings", return_value=FakeEmbeddings()):
+        store = FaissStore("", None, docs_init=[Document(page_content="a")])
+        store.add_texts(["bbbb", "cccccccc"])
+        queries = ["bbb", "ccccccc"]
+        results = store.search_batch(queries, k=2)
+
+    assert [[doc.page_content for doc in docs] for docs in results] == [
+        [doc.page_content for doc in store.search(query, k=2)] for query in queries
+    ]
+
+
+def test_faiss_search_with_scores_returns_cosine_similarity():
+    from langchain.docstore.document import Document
+
+    with patch.object(FaissStore, "_get_embeddings", return_value=FakeEmbeddings()):
+        store = FaissStore("", None, docs_init=[Document(page_content="a")])
+        store.add_texts(["bbbb", "cccccccc"])
+        results = store.search_with_scores("ccccccc", k=3)
+
+    assert [doc.page_content for doc, _ in results] == ["cccccccc", "bbbb", "a"]
+    expected = [
+        float(np.dot([7, 1], [n, 1]) / (np.linalg.norm([7, 1]) * np.linalg.norm([n, 1])))
+        for n in (8, 4, 1)
+    ]
+    assert [score for _, score in results] == pytest.approx(expected, rel=1e-5)
+
+
+
+def test_as_float32_array_copies_read_only_buffers():
+    from application.vectorstore.base import as_float32_array
+
+    buffer = np.frombuffer(np.ones(3, dtype=np.float32).tobytes(), dtype=np.float32)
+    assert not buffer.flags.writeable
+    assert as_float32_array(buffer).flags.writeable
+    writeable = np.ones(3, dtype=np.float32)
+    assert as_float32_array(writeable) is writeable
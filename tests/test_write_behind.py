@@ -0,0 +1,29 @@
+from unittest.mock import MagicMock
+
+from application.write_behind import BatchWriter
+
+
+def test_writer_batches_inserts_and_keeps_call_order():
+    collection = MagicMock()
+    calls = []
+    writer = BatchWriter(maxsize=100, batch_size=10, flush_interval=0.5)
+
+    writer.call(calls.append, "create")
+    writer.insert(collection, {"n": 1})
+    writer.insert(collection, {"n": 2})
+    writer.call(calls.append, "rename")
+    writer.flush(timeout=5)
+
+    assert calls == ["create", "rename"]
+    collection.insert_many.assert_called_once_with([{"n": 1}, {"n": 2}], ordered=False)
+
+
+def test_writer_writes_inline_when_queue_is_full():
+    collection = MagicMock()
+    writer = BatchWriter(maxsize=1, batch_size=10, flush_interval=0)
+    writer._ensure_started = lambda: None  # no writer thread, so the queue stays full
+
+    writer.insert(collection, {"n": 1})
+    writer.insert(collection, {"n": 2})
+
+    collection.insert_many.assert_called_once_with([{"n": 2}], ordered=False)